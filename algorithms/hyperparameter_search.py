@@ -0,0 +1,227 @@
+import json
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+from sklearn.metrics import r2_score
+from threadpoolctl import threadpool_limits
+
+from configuration.settings import (TUNE_SPACES, TUNE_CANDIDATES, TUNE_HALVING_FACTOR, TUNE_MIN_ROWS,
+                                    TUNE_VALIDATION_SIZE, TUNE_TIME_BUDGET, TUNED_PARAMS_PATH, RANDOM_STATE)
+from datasets.training_data import TrainingData
+from algorithms.train_model import (MODEL_TITLES, TransportModelTrainer, build_model, model_params,
+                                   load_tuned_params)
+
+# Данные рабочего процесса: подключаются из общей памяти при запуске, а не передаются с каждой задачей
+_worker = {}
+
+def _init_worker(handle):
+    """Инициализация рабочего процесса: перемешанная обучающая часть и валидация из общей памяти"""
+    data = TrainingData.attach(handle)
+    _worker.update(X_fit=data.X_train, y_fit=data.y_train, X_val=data.X_test, y_val=data.y_test)
+
+def _evaluate_candidate(task):
+    """R² кандидата на валидации после обучения на первых rows строках (model_key, index, params, rows)"""
+    model_key, index, params, rows = task
+    start_time = time.perf_counter()
+    # Внутри пула каждый кандидат обучается в один поток (включая OpenMP Hist Gradient Boosting),
+    # параллельны сами кандидаты
+    model = build_model(model_key, n_jobs=1, params=params)
+    with threadpool_limits(limits=1, user_api='openmp'):
+        model.fit(_worker['X_fit'][:rows], _worker['y_fit'][:rows])
+    score = r2_score(_worker['y_val'], model.predict(_worker['X_val']))
+    return model_key, index, float(score), time.perf_counter() - start_time
+
+def sample_candidates(model_key, space, n_candidates, rng):
+    """Текущие параметры модели и случайные различные сочетания значений из пространства"""
+    base = model_params(model_key)
+    candidates = [base]
+    seen = {json.dumps(base, sort_keys=True)}
+    n_combinations = math.prod(len(values) for values in space.values())
+
+    while len(candidates) < min(n_candidates, n_combinations):
+        params = dict(base)
+        for name, values in space.items():
+            # Значение берется по индексу: в списке могут быть None и строки
+            params[name] = values[rng.integers(len(values))]
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+def halving_schedule(n_candidates, n_rows, factor=TUNE_HALVING_FACTOR, min_rows=TUNE_MIN_ROWS):
+    """Раунды successive halving: [(кандидатов, строк)], последний раунд — на всех строках"""
+    n_rounds = 0
+    while factor ** n_rounds < n_candidates:
+        n_rounds += 1
+
+    schedule = []
+    for round_index in range(n_rounds + 1):
+        candidates = max(1, math.ceil(n_candidates / factor ** round_index))
+        rows = n_rows // factor ** (n_rounds - round_index)
+        schedule.append((candidates, min(n_rows, max(rows, min_rows))))
+        if candidates == 1:
+            break
+    return schedule
+
+def save_tuned_params(best_params, path=TUNED_PARAMS_PATH):
+    """Сохранение найденных параметров поверх ранее подобранных (атомарная замена файла)"""
+    tuned = load_tuned_params(path)
+    tuned.update(best_params)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as tuned_file:
+        json.dump(tuned, tuned_file, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return tuned
+
+def successive_halving(X, y, model_keys=None, spaces=TUNE_SPACES, n_candidates=TUNE_CANDIDATES,
+                       factor=TUNE_HALVING_FACTOR, min_rows=TUNE_MIN_ROWS,
+                       validation_size=TUNE_VALIDATION_SIZE, time_budget=TUNE_TIME_BUDGET,
+                       n_jobs=None, random_state=RANDOM_STATE):
+    """Подбор гиперпараметров successive halving в пуле процессов
+
+    В первом раунде все кандидаты обучаются на небольшой подвыборке обучающих
+    данных; в следующий раунд проходит лучшая 1/factor часть, а подвыборка
+    увеличивается в factor раз — до полной в последнем раунде. Кандидаты всех
+    моделей одного раунда считаются в общем пуле. Оценка — R² на валидационной
+    части обучающей выборки, тестовая выборка в подборе не участвует.
+
+    Раунд, который по оценке по предыдущему не успевает в time_budget, не
+    начинается; при истечении бюджета пул процессов завершается вместе с
+    начатыми задачами (Pool.terminate), а лучшими считаются кандидаты
+    последнего завершенного раунда.
+    """
+    start_time = time.perf_counter()
+    deadline = start_time + time_budget if time_budget else None
+    model_keys = [key for key in (model_keys or MODEL_TITLES) if key in spaces]
+
+    # Перемешиваем один раз: подвыборка раунда — первые rows строк, выборки раундов вложены
+    rng = np.random.default_rng(random_state)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float64)
+    order = rng.permutation(len(X))
+    n_val = max(1, int(len(X) * validation_size))
+    X_val, y_val = X[order[:n_val]], y[order[:n_val]]
+    X_fit, y_fit = X[order[n_val:]], y[order[n_val:]]
+    # Обучающая часть и валидация публикуются в общей памяти один раз для всех процессов
+    shared = TrainingData(X_fit, X_val, y_fit, y_val, range(X.shape[1]))
+
+    state = {}
+    for model_key in model_keys:
+        candidates = sample_candidates(model_key, spaces[model_key], n_candidates, rng)
+        state[model_key] = {
+            'candidates': candidates,
+            'schedule': halving_schedule(len(candidates), len(X_fit), factor, min_rows),
+            'alive': list(range(len(candidates))),
+            'scores': {},
+            'rounds': []
+        }
+
+    n_workers = min(n_jobs or os.cpu_count() or 1, sum(len(s['candidates']) for s in state.values()))
+    print("⚙️  Кандидатов: " + ", ".join(f"{MODEL_TITLES[key]} — {len(s['candidates'])}"
+                                         for key, s in state.items()))
+    print(f"⚙️  Процессов: {n_workers}, обучение: {len(X_fit)} строк, валидация: {n_val} строк")
+
+    round_index = 0
+    last_round = None  # (секунды, кандидато-строки) прошлого раунда для оценки следующего
+    timed_out = False
+    # Выход из with завершает рабочие процессы (Pool.terminate), не дожидаясь начатых задач
+    with shared, multiprocessing.Pool(n_workers, initializer=_init_worker, initargs=(shared.share(),)) as pool:
+        while True:
+            tasks = []
+            for model_key, s in state.items():
+                if round_index < len(s['schedule']):
+                    _, rows = s['schedule'][round_index]
+                    tasks.extend((model_key, index, s['candidates'][index], rows) for index in s['alive'])
+            if not tasks:
+                break
+
+            work = sum(task[3] for task in tasks)
+            if deadline is not None and last_round is not None:
+                seconds, last_work = last_round
+                estimate = seconds * work / last_work
+                if time.perf_counter() + estimate > deadline:
+                    print(f"⏳ Раунд {round_index + 1} (~{estimate:.0f} с) не укладывается в бюджет времени")
+                    break
+
+            round_start = time.perf_counter()
+            results = pool.imap_unordered(_evaluate_candidate, tasks)
+            round_scores = {model_key: {} for model_key in state}
+            try:
+                for _ in tasks:
+                    timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                    model_key, index, score, _ = results.next(timeout)
+                    round_scores[model_key][index] = score
+            except multiprocessing.TimeoutError:
+                # Незапущенные задачи снимаются, а начатые прерываются вместе с процессами
+                pool.terminate()
+                pool.join()
+                timed_out = True
+                print(f"⏳ Бюджет времени исчерпан в раунде {round_index + 1}, раунд не засчитан")
+                break
+
+            last_round = (time.perf_counter() - round_start, work)
+            for model_key, scores in round_scores.items():
+                if not scores:
+                    continue
+                s = state[model_key]
+                rows = s['schedule'][round_index][1]
+                s['scores'] = scores
+                s['rounds'].append({'rows': rows, 'candidates': len(scores), 'best_score': max(scores.values())})
+                print(f"  {MODEL_TITLES[model_key]:<20} раунд {round_index + 1}: {len(scores):>3} кандидатов "
+                      f"× {rows:>8} строк, лучший R² {max(scores.values()):.4f}")
+                # В следующий раунд — кандидаты, которым он отведен расписанием
+                if round_index + 1 < len(s['schedule']):
+                    keep = s['schedule'][round_index + 1][0]
+                    s['alive'] = sorted(scores, key=lambda index: -scores[index])[:keep]
+            round_index += 1
+
+    results = {}
+    for model_key, s in state.items():
+        if not s['scores']:
+            continue
+        best_index = max(s['scores'], key=lambda index: s['scores'][index])
+        results[model_key] = {
+            'params': s['candidates'][best_index],
+            'score': s['scores'][best_index],
+            'rows': s['rounds'][-1]['rows'],
+            'is_default': best_index == 0,
+            'rounds': s['rounds']
+        }
+    return {'models': results, 'timed_out': timed_out, 'seconds': time.perf_counter() - start_time}
+
+def print_search_results(search):
+    """Отчет о подборе: лучший R² на валидации и параметры каждой модели"""
+    print("\n" + "="*60)
+    print("РЕЗУЛЬТАТЫ ПОДБОРА ГИПЕРПАРАМЕТРОВ")
+    print("="*60)
+    for model_key, result in search['models'].items():
+        source = "текущие настройки" if result['is_default'] else "новые параметры"
+        print(f"\n🏆 {MODEL_TITLES[model_key]}: R² {result['score']:.4f} на {result['rows']} строках ({source})")
+        for name, value in sorted(result['params'].items()):
+            print(f"   {name}: {value}")
+    print(f"\n🕒 Подбор занял {search['seconds']:.1f} с" + (" (бюджет времени исчерпан)" if search['timed_out'] else ""))
+
+def main(n_jobs=None, time_budget=TUNE_TIME_BUDGET, use_cache=True, path=TUNED_PARAMS_PATH):
+    """Подбор гиперпараметров всех моделей и сохранение лучших в path"""
+    trainer = TransportModelTrainer(plots='none', use_cache=use_cache)
+    trainer.prepare_data()
+    trainer.check_training_data()
+
+    print("\n" + "="*60)
+    print("ПОДБОР ГИПЕРПАРАМЕТРОВ (SUCCESSIVE HALVING)")
+    print("="*60)
+    search = successive_halving(trainer.data.X_train, trainer.data.y_train, time_budget=time_budget, n_jobs=n_jobs)
+    print_search_results(search)
+
+    if not search['models']:
+        print("\n❌ Ни один раунд не завершился в бюджете времени, параметры не сохранены")
+        return search
+
+    save_tuned_params({model_key: result['params'] for model_key, result in search['models'].items()}, path)
+    print(f"\n✓ Параметры сохранены в: {path}")
+    print("  python main.py train обучит модели с ними")
+    return search
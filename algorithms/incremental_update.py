@@ -0,0 +1,214 @@
+import copy
+import os
+import time
+
+import numpy as np
+from sklearn.metrics import r2_score, mean_absolute_error
+
+from configuration.settings import (MODEL_PATH, REPORT_DIR, LOAD_CHUNK_SIZE, RANDOM_STATE, COMPILE_TREE_MODELS,
+                                    PERMUTATION_REPEATS, HGB_NATIVE_MISSING, INCREMENTAL_TREES, INCREMENTAL_MAX_TREES,
+                                    INCREMENTAL_MIN_ROWS, INCREMENTAL_HOLDOUT_SIZE, INCREMENTAL_MAX_R2_DROP)
+from datasets.data_fetcher import DATA_PATH, load_appended_training_data
+from algorithms.model_store import load_model_artifact, save_model_artifact, linear_sufficient_stats
+from algorithms.tree_engine import compile_tree_ensemble
+from algorithms.permutation_importance import permutation_importance
+from algorithms.train_model import MODEL_TITLES, TransportModelTrainer
+
+def extend_forest(model, X, y, n_trees=INCREMENTAL_TREES, max_trees=INCREMENTAL_MAX_TREES, n_jobs=None):
+    """Добавление в лес деревьев, обученных на новых строках (warm start)"""
+    saved_jobs = model.n_jobs
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees,
+                     n_jobs=n_jobs if n_jobs is not None else saved_jobs)
+    model.fit(X, y)
+    # Как в fit_model: n_jobs из артефакта, чтобы прогнозы не зависели от режима дообучения
+    model.set_params(warm_start=False, n_jobs=saved_jobs)
+
+    if max_trees and len(model.estimators_) > max_trees:
+        # Прогноз леса — среднее деревьев, поэтому самые старые деревья просто убираются
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.set_params(n_estimators=max_trees)
+    return model
+
+def extend_boosting(model, X, y, n_stages=INCREMENTAL_TREES):
+    """Новые стадии бустинга, обученные на остатках модели на новых строках (warm start)"""
+    model.set_params(warm_start=True, n_estimators=model.n_estimators_ + n_stages)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    return model
+
+def extend_hist_boosting(model, X, y, n_iterations=INCREMENTAL_TREES):
+    """Новые итерации гистограммного бустинга на новых строках (warm start)"""
+    model.set_params(warm_start=True, max_iter=model.n_iter_ + n_iterations)
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    return model
+
+def extend_linear(model, stats, X, y):
+    """Точное решение линейной регрессии по суммам X'X и X'y всех строк, включая новые"""
+    update = linear_sufficient_stats(X, y)
+    stats = {name: stats[name] + update[name] for name in ('xtx', 'xty', 'rows')}
+    solution = np.linalg.lstsq(stats['xtx'], stats['xty'], rcond=None)[0]
+    model.coef_ = solution[:-1]
+    model.intercept_ = solution[-1]
+    return model, stats
+
+def _extend_model(model_name, model, stats, X, y, n_jobs=None):
+    """Дообучение модели своим способом; возвращает (модель, суммы линейной модели)"""
+    if model_name == 'random_forest':
+        return extend_forest(model, X, y, n_jobs=n_jobs), stats
+    if model_name == 'gradient_boosting':
+        return extend_boosting(model, X, y), stats
+    if model_name == 'hist_gradient_boosting':
+        return extend_hist_boosting(model, X, y), stats
+    return extend_linear(model, stats, X, y)
+
+def _prepare_rows(pipeline, X_raw, model_name):
+    """Матрица признаков новых строк; исходная матрица X_raw не меняется"""
+    if model_name != 'hist_gradient_boosting' or not HGB_NATIVE_MISSING:
+        X_raw = X_raw.copy()
+        pipeline.impute(X_raw)
+    return pipeline.transform(X_raw)
+
+def _full_retrain_required(reason):
+    """Результат обновления, после которого нужно полное переобучение"""
+    print(f"⚠️  Дообучение невозможно: {reason}")
+    return {'status': 'full_retrain_required', 'reason': reason}
+
+def update_model(model_path=MODEL_PATH, data_path=DATA_PATH, n_jobs=None, random_state=RANDOM_STATE):
+    """Дообучение сохраненной модели на строках, дописанных в файл данных после обучения
+
+    Новые строки читаются с отметки data_watermark из артефакта. Медианы
+    пропусков обновляются слиянием эскизов распределений с новыми строками, лес и бустинг получают
+    INCREMENTAL_TREES деревьев/стадий, обученных на них, а линейная регрессия
+    решается заново по накопленным суммам. Сначала проверка: копия модели
+    дообучается без отложенной части новых строк, и если R² на отложенных
+    ниже Test R² полного обучения больше чем на INCREMENTAL_MAX_R2_DROP,
+    артефакт не меняется и возвращается status='full_retrain_required'.
+    После успешной проверки модель, медианы и суммы линейной модели
+    обновляются по всем новым строкам, включая отложенные, и только затем
+    сдвигается отметка данных. Permutation importance полного обучения в
+    артефакте сохраняется; важность проверочной модели на отложенных строках
+    записывается отдельно, в model_data['incremental'].
+    """
+    print("="*60)
+    print("ДООБУЧЕНИЕ НА НОВЫХ ДАННЫХ")
+    print("="*60)
+
+    if not os.path.exists(model_path):
+        return _full_retrain_required(f"модель не найдена: {model_path}")
+
+    model_data = dict(load_model_artifact(model_path, mmap_mode=None, use_registry=False))
+    model_name = model_data['model_name']
+    watermark = model_data.get('data_watermark')
+    if watermark is None or model_data.get('feature_pipeline') is None:
+        return _full_retrain_required("модель обучена без отметки данных")
+    if watermark['path'] != os.path.abspath(data_path):
+        return _full_retrain_required(f"модель обучена на другом файле: {watermark['path']}")
+    if model_name == 'linear_regression' and 'linear_stats' not in model_data:
+        return _full_retrain_required("в артефакте нет сумм X'X и X'y линейной модели")
+
+    try:
+        X_raw, y, new_watermark = load_appended_training_data(data_path, watermark, LOAD_CHUNK_SIZE)
+    except ValueError as error:
+        return _full_retrain_required(str(error))
+
+    print(f"📁 Новых строк после отметки: {len(y)} "
+          f"({(new_watermark['bytes'] - watermark['bytes']) / 1024**2:.1f} МБ)")
+    if len(y) < INCREMENTAL_MIN_ROWS:
+        print(f"ℹ️ Меньше {INCREMENTAL_MIN_ROWS} строк — модель не обновляется")
+        return {'status': 'no_data', 'rows': len(y)}
+
+    # Проверка на копиях: медианы обновляются по обучающей части, пропуски заполняются новыми медианами
+    order = np.random.default_rng(random_state).permutation(len(y))
+    n_holdout = max(1, int(len(y) * INCREMENTAL_HOLDOUT_SIZE))
+    holdout, fit_rows = np.sort(order[:n_holdout]), np.sort(order[n_holdout:])
+    check_pipeline = copy.deepcopy(model_data['feature_pipeline'])
+    check_pipeline.partial_fit(X_raw[fit_rows])
+    X = _prepare_rows(check_pipeline, X_raw, model_name)
+    X_fit, y_fit, X_holdout, y_holdout = X[fit_rows], y[fit_rows], X[holdout], y[holdout]
+
+    model = model_data['model']
+    before_r2 = r2_score(y_holdout, model.predict(X_holdout))
+
+    start_time = time.perf_counter()
+    check_model, _ = _extend_model(model_name, copy.deepcopy(model), model_data.get('linear_stats'),
+                                   X_fit, y_fit, n_jobs)
+    seconds = time.perf_counter() - start_time
+
+    holdout_pred = check_model.predict(X_holdout)
+    holdout_r2 = r2_score(y_holdout, holdout_pred)
+    holdout_mae = mean_absolute_error(y_holdout, holdout_pred)
+    reference_r2 = model_data['metrics']['Test R2']
+
+    print(f"\n⚙️  {MODEL_TITLES[model_name]} дообучена за {seconds:.2f} с на {len(y_fit)} строках")
+    print(f"   R² на отложенных новых строках ({len(y_holdout)}): {before_r2:.4f} → {holdout_r2:.4f}")
+    print(f"   MAE на отложенных новых строках: {holdout_mae:.2f}")
+    print(f"   Test R² полного обучения: {reference_r2:.4f}")
+
+    if reference_r2 - holdout_r2 > INCREMENTAL_MAX_R2_DROP:
+        return _full_retrain_required(f"R² на новых строках {holdout_r2:.4f} ниже Test R² полного обучения "
+                                      f"{reference_r2:.4f} больше чем на {INCREMENTAL_MAX_R2_DROP}")
+
+    # Проверка пройдена: исходная модель дообучается на всех новых строках, отложенные не теряются
+    pipeline = copy.deepcopy(model_data['feature_pipeline'])
+    pipeline.partial_fit(X_raw)
+    X_all = _prepare_rows(pipeline, X_raw, model_name)
+    start_time = time.perf_counter()
+    model, linear_stats = _extend_model(model_name, model, model_data.get('linear_stats'), X_all, y, n_jobs)
+    if linear_stats is not None:
+        model_data['linear_stats'] = linear_stats
+    seconds += time.perf_counter() - start_time
+    print(f"   ✓ Проверка пройдена — модель дообучена на всех {len(y)} новых строках")
+
+    history = model_data.get('incremental', {})
+    holdout_importance = None
+    if PERMUTATION_REPEATS:
+        # Важность проверочной модели на отложенных строках, которых она не видела. Сохраненная
+        # модель обучена и на них, поэтому запись полного обучения ('permutation_importance') не меняется
+        holdout_importance = permutation_importance(check_model, X_holdout, y_holdout,
+                                                    check_pipeline.feature_names, n_jobs=n_jobs)
+    model_data.update({
+        'model': model,
+        'feature_pipeline': pipeline,
+        'data_watermark': new_watermark,
+        'incremental': {
+            'updates': history.get('updates', 0) + 1,
+            'rows': history.get('rows', 0) + len(y),
+            'holdout_r2': holdout_r2,
+            'holdout_r2_before': before_r2,
+            'holdout_mae': holdout_mae,
+            'reference_r2': reference_r2,
+            'holdout_permutation_importance': holdout_importance,
+            'seconds': seconds
+        }
+    })
+
+    # Производные таблицы артефакта строятся заново по обновленной модели
+    model_data.pop('compiled_trees', None)
+    model_data.pop('linear_coefficients', None)
+    if COMPILE_TREE_MODELS:
+        engine = compile_tree_ensemble(model)
+        if engine is not None:
+            model_data['compiled_trees'] = engine
+
+    save_model_artifact(model_data, model_path)
+    print(f"\n✓ Модель обновлена: {model_path} (обновлений с полного обучения: "
+          f"{model_data['incremental']['updates']})")
+    return {'status': 'updated', 'rows': len(y), 'holdout_r2': holdout_r2, 'seconds': seconds}
+
+def main(n_jobs=None, plots=None, report_dir=REPORT_DIR, use_cache=True):
+    """Дообучение на новых строках; при невозможности или падении качества — полное обучение"""
+    print("\n" + "="*60)
+    print("CITY TRANSPORT ANALYTICS - ДООБУЧЕНИЕ МОДЕЛИ")
+    print("="*60 + "\n")
+
+    result = update_model(n_jobs=n_jobs)
+    if result['status'] == 'full_retrain_required':
+        print("\n🔁 Полное переобучение...")
+        trainer = TransportModelTrainer(plots=plots, report_dir=report_dir, use_cache=use_cache)
+        trainer.train_all_models(n_jobs=n_jobs)
+        trainer.finish_report()
+        result['status'] = 'retrained'
+
+    print("\n✓ Обновление модели завершено!")
+    return result
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections.abc import MutableMapping
+
+import joblib
+import numpy as np
+
+# Реестр загруженных артефактов: путь -> (версия файла, данные модели)
+_registry = {}
+_registry_lock = threading.Lock()
+
+# Строк в блоке при подсчете сумм X'X и X'y: в float64 переводится только текущий блок
+LINEAR_STATS_BLOCK_ROWS = 65536
+
+def serialize_estimator(model):
+    """Оценщик в виде pickle без массивов и самих массивов numpy (pickle protocol 5)
+
+    Массивы оценщика (узлы деревьев, коэффициенты) выносятся из pickle как
+    внеполосные буферы и сохраняются в артефакте обычными массивами uint8 —
+    joblib отображает их в память так же, как остальные массивы артефакта.
+    """
+    buffers = []
+    payload = pickle.dumps(model, protocol=5, buffer_callback=buffers.append)
+    return {'pickle': payload, 'buffers': [np.frombuffer(buffer.raw(), dtype=np.uint8) for buffer in buffers]}
+
+def deserialize_estimator(estimator):
+    """Оценщик из serialize_estimator(): массивы numpy ссылаются на буферы без копирования"""
+    return pickle.loads(estimator['pickle'], buffers=estimator['buffers'])
+
+class ModelArtifact(MutableMapping):
+    """Данные артефакта модели с распаковкой оценщика sklearn при первом обращении к ['model']
+
+    Загрузка артефакта не импортирует sklearn: прогнозы по скомпилированным
+    деревьям и линейным коэффициентам оценщик не используют. Проверка
+    'model' in artifact его не распаковывает. Служебный ключ 'estimator'
+    (сериализованный оценщик) скрыт: dict(artifact) содержит сам оценщик.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self._lock = threading.Lock()
+
+    @property
+    def model_loaded(self):
+        """Был ли оценщик уже распакован"""
+        return 'model' in self._data
+
+    def __getitem__(self, key):
+        if key == 'model' and 'model' not in self._data and 'estimator' in self._data:
+            with self._lock:
+                if 'model' not in self._data:
+                    self._data['model'] = deserialize_estimator(self._data['estimator'])
+        if key == 'estimator':
+            raise KeyError(key)
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        if key == 'model':
+            self._data.pop('estimator', None)
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key == 'model':
+            self._data.pop('estimator', None)
+        self._data.pop(key, None)
+
+    def __contains__(self, key):
+        if key == 'model':
+            return 'model' in self._data or 'estimator' in self._data
+        return key != 'estimator' and key in self._data
+
+    def __iter__(self):
+        for key in self._data:
+            if key == 'estimator':
+                if 'model' not in self._data:
+                    yield 'model'
+            else:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+def linear_coefficients(model):
+    """Коэффициенты линейной модели для прогноза без sklearn; None для остальных моделей"""
+    coef = getattr(model, 'coef_', None)
+    if coef is None or np.ndim(coef) != 1 or not hasattr(model, 'intercept_'):
+        return None
+    # float64: модель, обученная на float32, иначе считала бы в float32 и расходилась с одиночным путем
+    return {'coef': np.asarray(coef, dtype=np.float64), 'intercept': float(model.intercept_)}
+
+def linear_sufficient_stats(X, y, block_rows=LINEAR_STATS_BLOCK_ROWS):
+    """Суммы X'X и X'y с колонкой свободного члена: линейная модель по ним решается заново
+
+    Суммы складываются по частям данных, поэтому дообучение на новых строках
+    дает те же коэффициенты, что и обучение на всех строках сразу. Считаются
+    блоками по block_rows строк, без копии всей матрицы в float64.
+    """
+    X = np.asarray(X)
+    y = np.asarray(y, dtype=np.float64)
+    n_columns = X.shape[1] + 1
+    xtx = np.zeros((n_columns, n_columns))
+    xty = np.zeros(n_columns)
+    block = np.ones((min(block_rows, len(X)), n_columns))
+    for start in range(0, len(X), block_rows):
+        rows = len(X[start:start + block_rows])
+        block[:rows, :-1] = X[start:start + rows]
+        xtx += block[:rows].T @ block[:rows]
+        xty += block[:rows].T @ y[start:start + rows]
+    return {'xtx': xtx, 'xty': xty, 'rows': len(X)}
+
+def _artifact_version(path, mmap_mode):
+    """Версия артефакта: время изменения и размер файла"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, mmap_mode)
+
+def artifact_fingerprint(path):
+    """Хэш артефакта по пути, времени изменения и размеру: меняется при каждом сохранении модели"""
+    source = os.path.abspath(path)
+    stat = os.stat(source)
+    return hashlib.sha1(f"{source}:{stat.st_mtime_ns}:{stat.st_size}".encode('utf-8')).hexdigest()[:16]
+
+def save_model_artifact(model_data, path):
+    """Сохранение артефакта модели без сжатия с атомарной заменой файла
+
+    Несжатый формат joblib позволяет отображать массивы numpy в память при
+    загрузке. Запись во временный файл с os.replace не портит отображение
+    в уже работающих процессах: они продолжают читать прежнюю версию.
+    Оценщик сохраняется как pickle с массивами вне его (serialize_estimator),
+    а рядом — коэффициенты линейной модели.
+    """
+    model_data = dict(model_data)
+    model = model_data.pop('model')
+    model_data['linear_coefficients'] = linear_coefficients(model)
+    model_data['estimator'] = serialize_estimator(model)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    joblib.dump(model_data, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+
+def load_model_artifact(path, mmap_mode='r', use_registry=True):
+    """Загрузка артефакта модели с повторным использованием уже загруженных
+
+    mmap_mode='r' — массивы numpy не копируются в память процесса, а читаются
+    через page cache, общий для всех рабочих процессов на машине.
+    Реестр ключуется абсолютным путем и временем изменения файла: после
+    переобучения модель будет загружена заново. Возвращает ModelArtifact:
+    оценщик распаковывается при первом обращении к ['model'].
+    """
+    source = os.path.abspath(path)
+    version = _artifact_version(source, mmap_mode)
+
+    if use_registry:
+        with _registry_lock:
+            cached = _registry.get(source)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    model_data = ModelArtifact(joblib.load(source, mmap_mode=mmap_mode))
+
+    if use_registry:
+        with _registry_lock:
+            _registry[source] = (version, model_data)
+
+    return model_data
+
+def clear_model_registry():
+    """Очистка реестра загруженных артефактов"""
+    with _registry_lock:
+        _registry.clear()
+
+def model_registry_info():
+    """Список артефактов в реестре"""
+    with _registry_lock:
+        return {source: {'mtime_ns': version[0], 'size': version[1], 'mmap_mode': version[2]}
+                for source, (version, _) in _registry.items()}
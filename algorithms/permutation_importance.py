@@ -0,0 +1,79 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import r2_score
+
+from configuration.settings import PERMUTATION_REPEATS, PERMUTATION_MAX_ROWS, RANDOM_STATE
+
+# Данные рабочего процесса: передаются один раз при запуске, а не с каждой задачей
+_worker = {}
+
+def _init_worker(model, X, y, baseline, random_state, in_pool=True):
+    """Инициализация рабочего процесса: собственная копия матрицы для перестановок"""
+    # Внутри пула модель считает в один поток, иначе процессы конкурируют за ядра.
+    # Копия модели в рабочем процессе своя, поэтому модель вызывающего кода не меняется
+    if in_pool and 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=1)
+    _worker.update(model=model, X=np.array(X, copy=True), y=y, baseline=baseline,
+                   random_state=random_state)
+
+def _permutation_drop(task):
+    """Падение R² после перестановки одного признака (column, repeat)"""
+    column, repeat = task
+    X = _worker['X']
+    original = X[:, column].copy()
+    # Генератор зависит только от признака и повтора — результат не зависит от числа процессов
+    rng = np.random.default_rng([_worker['random_state'], column, repeat])
+    X[:, column] = original[rng.permutation(len(original))]
+    try:
+        score = r2_score(_worker['y'], _worker['model'].predict(X))
+    finally:
+        X[:, column] = original
+    return column, repeat, _worker['baseline'] - score
+
+def permutation_importance(model, X, y, feature_names, n_repeats=PERMUTATION_REPEATS,
+                           n_jobs=None, max_rows=PERMUTATION_MAX_ROWS, random_state=RANDOM_STATE):
+    """Permutation importance на отложенной выборке в пуле процессов
+
+    Каждая задача — одна пара (признак, повтор); важность — среднее падение R²
+    после случайной перестановки значений признака. Работает для любой модели,
+    в том числе без feature_importances_.
+    """
+    start_time = time.perf_counter()
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float64)
+    if max_rows and len(X) > max_rows:
+        rows = np.random.default_rng(random_state).choice(len(X), max_rows, replace=False)
+        X, y = X[np.sort(rows)], y[np.sort(rows)]
+
+    baseline = r2_score(y, model.predict(X))
+    tasks = [(column, repeat) for column in range(X.shape[1]) for repeat in range(n_repeats)]
+    n_workers = min(n_jobs or os.cpu_count() or 1, len(tasks))
+    drops = np.zeros((X.shape[1], n_repeats))
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(model, X, y, baseline, random_state)) as executor:
+            chunksize = max(1, len(tasks) // (n_workers * 4))
+            for column, repeat, drop in executor.map(_permutation_drop, tasks, chunksize=chunksize):
+                drops[column, repeat] = drop
+    else:
+        _init_worker(model, X, y, baseline, random_state, in_pool=False)
+        try:
+            for column, repeat, drop in map(_permutation_drop, tasks):
+                drops[column, repeat] = drop
+        finally:
+            _worker.clear()
+
+    return {
+        'features': list(feature_names),
+        'importances_mean': drops.mean(axis=1),
+        'importances_std': drops.std(axis=1),
+        'scoring': 'r2',
+        'baseline_score': float(baseline),
+        'n_repeats': n_repeats,
+        'n_rows': len(X),
+        'seconds': time.perf_counter() - start_time
+    }
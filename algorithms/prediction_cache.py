@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+class PredictionCache:
+    """Ограниченный LRU-кэш прогнозов с временем жизни записей
+
+    Ключ — кортеж значений признаков поездки (при заданных steps — округленных
+    до шага). Кэш привязан к хэшу модели: при загрузке другой модели записи
+    сбрасываются, а прогнозы, посчитанные прежней моделью, не сохраняются.
+    """
+
+    def __init__(self, max_size, ttl=None, steps=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.steps = dict(steps) if steps else {}
+        self.model_hash = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def bind(self, model_hash):
+        """Привязка к модели; при смене модели кэш очищается"""
+        with self._lock:
+            if model_hash != self.model_hash:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.model_hash = model_hash
+
+    def normalize(self, features, record):
+        """Ключ кэша и значения признаков после квантования
+
+        Возвращает (ключ, {признак: значение}) или (None, None), если значение
+        нечисловое или NaN — такие запросы не кэшируются. Отсутствующий
+        признак входит в ключ как None. Без квантования словарь значений не
+        нужен и вместо него возвращается None.
+        """
+        steps = self.steps
+        key = []
+        for feature in features:
+            value = record.get(feature)
+            if value is not None:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    return None, None
+                if value != value:  # NaN
+                    return None, None
+                step = steps.get(feature)
+                if step:
+                    value = round(value / step) * step
+            key.append(value)
+        key = tuple(key)
+        return key, dict(zip(features, key)) if steps else None
+
+    def get(self, key):
+        """Прогноз из кэша или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, model_hash):
+        """Сохранение прогноза, посчитанного моделью model_hash"""
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if model_hash != self.model_hash:
+                return
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Удаление всех записей"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Статистика попаданий и вытеснений"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_s': self.ttl,
+                'quantized': bool(self.steps),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'model_hash': self.model_hash
+            }
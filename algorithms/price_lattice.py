@@ -0,0 +1,276 @@
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+# Добавляем путь для импорта модулей при запуске как скрипта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from configuration.settings import (PRICE_LATTICE_DIR, PRICE_LATTICE_AXES, PRICE_LATTICE_BATCH_ROWS,
+                                    PRICE_LATTICE_CHECK_POINTS, PRICE_LATTICE_MAX_ERROR, RANDOM_STATE)
+from algorithms.model_store import artifact_fingerprint
+from tools.metrics import get_logger
+
+logger = get_logger('price_lattice')
+
+LATTICE_FILE = 'price_lattice.npy'
+META_FILE = 'price_lattice.json'
+
+def axis_nodes(spec):
+    """Узлы оси: (начало, конец, шаг) или список таких отрезков с разным шагом"""
+    segments = spec if isinstance(spec[0], (list, tuple)) else [spec]
+    nodes = []
+    for start, stop, step in segments:
+        count = int(round((stop - start) / step)) + 1
+        nodes.append(start + step * np.arange(count))
+    return np.unique(np.round(np.concatenate(nodes), 10))
+
+class PriceLattice:
+    """Цены модели, заранее посчитанные на сетке признаков калькулятора
+
+    Значения хранятся в N-мерном массиве float32 (memory-mapped NPY). Запрос в
+    узле сетки — прямое чтение элемента, между узлами — полилинейная
+    интерполяция по 2^N соседним узлам. Интерполяция используется, только
+    если ее измеренная ошибка не больше допуска (interpolation_allowed).
+    """
+
+    def __init__(self, values, axes, features, meta):
+        self.values = values
+        self.flat = values.reshape(-1)
+        self.axes = [np.asarray(axis, dtype=np.float64) for axis in axes]
+        self.features = list(features)
+        self.meta = meta
+        self._axis_lists = [axis.tolist() for axis in self.axes]
+        self._strides = [int(np.prod(values.shape[index + 1:])) for index in range(len(self.axes))]
+
+    @classmethod
+    def load(cls, directory=PRICE_LATTICE_DIR):
+        """Загрузка решетки с диска (memory-mapped); None, если ее нет"""
+        meta_path = os.path.join(directory, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+        values = np.load(os.path.join(directory, LATTICE_FILE), mmap_mode='r')
+        return cls(values, meta['axes'], meta['features'], meta)
+
+    def is_current(self, model_path):
+        """Посчитана ли решетка по текущей версии файла модели"""
+        return os.path.exists(model_path) and self.meta.get('model_hash') == artifact_fingerprint(model_path)
+
+    def interpolation_allowed(self, max_error=PRICE_LATTICE_MAX_ERROR):
+        """Не превышает ли максимальная ошибка интерполяции, измеренная при построении, допуск"""
+        error = self.meta.get('error') or {}
+        return error.get('max_abs_error', float('inf')) <= max_error
+
+    def lookup(self, ride, exact_only=False):
+        """Цена поездки (dict) по решетке
+
+        None, если признака нет, значение вне сетки или (при exact_only)
+        поездка не попадает точно в узел.
+        """
+        index = 0
+        corners = [(0, 1.0)]
+        for feature, axis, stride in zip(self.features, self._axis_lists, self._strides):
+            try:
+                value = float(ride[feature])
+            except (KeyError, TypeError, ValueError):
+                return None
+            if not axis[0] <= value <= axis[-1]:
+                return None
+            position = min(bisect_right(axis, value) - 1, len(axis) - 2)
+            fraction = (value - axis[position]) / (axis[position + 1] - axis[position])
+            if fraction == 0.0:
+                # Значение в узле: по этой оси соседний узел не нужен
+                index += position * stride
+            elif fraction == 1.0:
+                index += (position + 1) * stride
+            elif exact_only:
+                return None
+            else:
+                index += position * stride
+                corners = [(offset, weight * (1.0 - fraction)) for offset, weight in corners] + \
+                          [(offset + stride, weight * fraction) for offset, weight in corners]
+
+        flat = self.flat
+        return sum(weight * float(flat[index + offset]) for offset, weight in corners)
+
+    def interpolate(self, X):
+        """Векторизованная полилинейная интерполяция для матрицы (строки x features); вне сетки — NaN"""
+        X = np.asarray(X, dtype=np.float64)
+        lower = []
+        fractions = []
+        inside = np.ones(len(X), dtype=bool)
+        for column, axis in enumerate(self.axes):
+            values = X[:, column]
+            inside &= (values >= axis[0]) & (values <= axis[-1])
+            values = np.clip(values, axis[0], axis[-1])
+            position = np.clip(np.searchsorted(axis, values, side='right') - 1, 0, len(axis) - 2)
+            lower.append(position)
+            fractions.append((values - axis[position]) / (axis[position + 1] - axis[position]))
+
+        result = np.zeros(len(X))
+        for corner in itertools.product((0, 1), repeat=len(self.axes)):
+            weight = np.ones(len(X))
+            index = np.zeros(len(X), dtype=np.int64)
+            for column, shift in enumerate(corner):
+                weight *= fractions[column] if shift else 1.0 - fractions[column]
+                index += (lower[column] + shift) * self._strides[column]
+            result += weight * self.flat[index]
+        result[~inside] = np.nan
+        return result
+
+def _grid_rows(axes, start, stop):
+    """Матрица входных признаков для узлов сетки с плоскими номерами start .. stop"""
+    coordinates = np.unravel_index(np.arange(start, stop), [len(axis) for axis in axes])
+    X = np.empty((stop - start, len(axes)), dtype=np.float32, order='F')
+    for column, (axis, positions) in enumerate(zip(axes, coordinates)):
+        X[:, column] = axis[positions]
+    return X
+
+def lattice_error(lattice, predictor, n_points=PRICE_LATTICE_CHECK_POINTS, seed=RANDOM_STATE):
+    """Ошибка решетки относительно модели на случайных точках внутри сетки"""
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.uniform(axis[0], axis[-1], n_points) for axis in lattice.axes]).astype(np.float32)
+    true_values = predictor.predict_inputs(X)
+    errors = np.abs(lattice.interpolate(X) - true_values)
+    return {
+        'points': n_points,
+        'max_abs_error': float(errors.max()),
+        'mean_abs_error': float(errors.mean()),
+        'p99_abs_error': float(np.percentile(errors, 99)),
+        'mean_price': float(np.abs(true_values).mean())
+    }
+
+def build_price_lattice(predictor, axes=PRICE_LATTICE_AXES, directory=PRICE_LATTICE_DIR,
+                        batch_rows=PRICE_LATTICE_BATCH_ROWS, check_points=PRICE_LATTICE_CHECK_POINTS):
+    """Расчет цен модели во всех узлах сетки крупными пакетами и сохранение на диск
+
+    Массив пишется прямо в memory-mapped NPY, поэтому память не растет с
+    размером сетки. Файлы заменяются атомарно.
+    """
+    features = list(predictor.pipeline.input_features)
+    missing_axes = [feature for feature in features if feature not in axes]
+    if missing_axes:
+        raise ValueError(f"Нет оси решетки для признаков: {missing_axes}")
+
+    grid = [axis_nodes(axes[feature]) for feature in features]
+    shape = tuple(len(axis) for axis in grid)
+    total = int(np.prod(shape))
+    print(f"🧮 Решетка цен: {' x '.join(map(str, shape))} = {total:,} узлов "
+          f"({total * 4 / 1024**2:.1f} МБ float32)")
+
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f"{LATTICE_FILE}.tmp{os.getpid()}.npy")
+    start_time = time.perf_counter()
+    values = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=shape)
+    flat = values.reshape(-1)
+    for start in range(0, total, batch_rows):
+        stop = min(start + batch_rows, total)
+        flat[start:stop] = predictor.predict_inputs(_grid_rows(grid, start, stop))
+    values.flush()
+    del values, flat
+    build_seconds = time.perf_counter() - start_time
+    print(f"⚡ Посчитано за {build_seconds:.1f} с ({total / max(build_seconds, 1e-9):,.0f} узлов/с)")
+
+    meta = {
+        'features': features,
+        'axes': [axis.tolist() for axis in grid],
+        'model_path': os.path.abspath(predictor.model_path),
+        'model_hash': predictor.model_hash,
+        'model_name': predictor.model_data.get('model_name'),
+        'build_seconds': build_seconds,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    # Проверка по отображению файла: решетка не читается в память целиком.
+    # Отображение закрывается (del) до замены файла — иначе под Windows его нельзя заменить
+    lattice = PriceLattice(np.load(tmp_path, mmap_mode='r'), meta['axes'], features, meta)
+    meta['error'] = lattice_error(lattice, predictor, check_points)
+    del lattice
+    error = meta['error']
+    print(f"📏 Ошибка относительно модели ({error['points']:,} случайных точек): "
+          f"макс. {error['max_abs_error']:.4f}, средняя {error['mean_abs_error']:.4f}, "
+          f"p99 {error['p99_abs_error']:.4f} при средней цене {error['mean_price']:.2f}")
+    if error['max_abs_error'] > PRICE_LATTICE_MAX_ERROR:
+        print(f"⚠️  Ошибка больше допуска {PRICE_LATTICE_MAX_ERROR}: калькулятор берет из решетки "
+              f"только точные узлы, остальное считает модель")
+
+    os.replace(tmp_path, os.path.join(directory, LATTICE_FILE))
+    meta_path = os.path.join(directory, META_FILE)
+    with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as meta_file:
+        json.dump(meta, meta_file, indent=2, ensure_ascii=False)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    print(f"💾 Решетка сохранена: {directory}")
+
+    return PriceLattice.load(directory)
+
+def build_lattice_for_model(model_path=None, directory=PRICE_LATTICE_DIR):
+    """Построение решетки по файлу модели собственным предсказателем; None, если модели нет"""
+    from algorithms.transport_predictor import MODEL_PATH, TransportCostPredictor
+    predictor = TransportCostPredictor(model_path or MODEL_PATH, cache_size=0)
+    if predictor.model_data is None:
+        return None
+    return build_price_lattice(predictor, directory=directory)
+
+class LatticeLoader:
+    """Решетка текущей версии модели для обработчиков запросов
+
+    get() никогда не строит решетку в вызывающем потоке: если на диске нет
+    решетки для текущего файла модели, построение запускается в фоновом
+    потоке (не больше одного за раз), а get() возвращает None — до его
+    завершения цену считает модель. Версия модели проверяется по stat файла.
+    """
+
+    def __init__(self, model_path, directory=PRICE_LATTICE_DIR):
+        self.model_path = model_path
+        self.directory = directory
+        self._lattice = None
+        self._thread = None
+        self._failed_hash = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Решетка для текущего файла модели или None, пока она строится"""
+        if not os.path.exists(self.model_path):
+            return None
+        model_hash = artifact_fingerprint(self.model_path)
+        lattice = self._lattice
+        if lattice is not None and lattice.meta.get('model_hash') == model_hash:
+            return lattice
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return None
+            lattice = PriceLattice.load(self.directory)
+            if lattice is not None and lattice.meta.get('model_hash') == model_hash:
+                self._lattice = lattice
+                return lattice
+            # Построение для этой версии модели уже завершилось ошибкой — не повторяем его в каждом запросе
+            if self._failed_hash != model_hash:
+                logger.info("🔄 Решетка цен не построена для текущей модели — построение в фоне")
+                self._thread = threading.Thread(target=self._build, args=(model_hash,),
+                                                name='price-lattice', daemon=True)
+                self._thread.start()
+        return None
+
+    def wait(self, timeout=None):
+        """Ожидание фонового построения (для CLI и тестов)"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.get()
+
+    def _build(self, model_hash):
+        try:
+            if build_lattice_for_model(self.model_path, self.directory) is None:
+                self._failed_hash = model_hash
+        except Exception as error:
+            self._failed_hash = model_hash
+            logger.error(f"❌ Ошибка построения решетки цен: {error}")
+
+if __name__ == "__main__":
+    build_lattice_for_model(sys.argv[1] if len(sys.argv) > 1 else None)
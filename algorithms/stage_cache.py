@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+import joblib
+
+from configuration.settings import STAGE_CACHE_DIR, STAGE_CACHE_MAX_ENTRIES
+from datasets.dataset_cache import file_hash
+
+# Версия формата записей: меняется при изменении структуры сохраняемых результатов этапов
+STAGE_CACHE_FORMAT_VERSION = 1
+
+_code_versions = {}
+
+def code_version(*module_names):
+    """SHA-256 исходного кода модулей и версий библиотек, от которых зависит результат этапа"""
+    key = tuple(module_names)
+    if key not in _code_versions:
+        import numpy
+        import sklearn
+        digest = hashlib.sha256(f"numpy {numpy.__version__} sklearn {sklearn.__version__}".encode('utf-8'))
+        for name in module_names:
+            with open(sys.modules[name].__file__, 'rb') as source_file:
+                digest.update(source_file.read())
+        _code_versions[key] = digest.hexdigest()
+    return _code_versions[key]
+
+def stage_key(stage, inputs):
+    """Ключ результата этапа: хэш названия этапа и всех его входов"""
+    payload = json.dumps({'stage': stage, 'inputs': inputs, 'version': STAGE_CACHE_FORMAT_VERSION},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+class StageCache:
+    """Кэш результатов этапов обучения на диске
+
+    Результат этапа хранится в <cache_dir>/<stage>/<key>.joblib, где key —
+    stage_key() от входов этапа: ключей предыдущих этапов, параметров и
+    версии кода. Этап выполняется, только если результата с таким ключом нет.
+    Для каждого этапа хранится не больше max_entries последних результатов,
+    поэтому возврат к прежним параметрам тоже берется из кэша. Каждый этап
+    записывается в summary — отчет о попаданиях print_summary().
+    """
+
+    def __init__(self, cache_dir=STAGE_CACHE_DIR, max_entries=STAGE_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.summary = []
+
+    def _path(self, stage, key, extension='joblib'):
+        return os.path.join(self.cache_dir, stage, f"{key}.{extension}")
+
+    def load(self, stage, key):
+        """Результат этапа из кэша, None при промахе"""
+        path = self._path(stage, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            value = joblib.load(path)
+        except Exception as error:
+            print(f"⚠️  Запись кэша этапа {stage} повреждена и будет пересчитана: {error}")
+            return None
+        # Время изменения — время последнего использования: вытесняются давно не нужные записи
+        os.utime(path)
+        return value
+
+    def save(self, stage, key, value):
+        """Атомарное сохранение результата этапа"""
+        path = self._path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+        self._prune(stage)
+
+    def is_current(self, stage, key, path):
+        """Создан ли файл path этапом с ключом key и не изменен ли он с тех пор"""
+        record_path = self._path(stage, key, 'json')
+        if not os.path.exists(record_path) or not os.path.exists(path):
+            return False
+        with open(record_path, encoding='utf-8') as record_file:
+            record = json.load(record_file)
+        if record.get('path') != os.path.abspath(path) or record.get('sha256') != file_hash(path, self.cache_dir):
+            return False
+        os.utime(record_path)
+        return True
+
+    def mark_current(self, stage, key, path):
+        """Запись о том, что файл path — результат этапа с ключом key"""
+        record_path = self._path(stage, key, 'json')
+        os.makedirs(os.path.dirname(record_path), exist_ok=True)
+        tmp_path = f"{record_path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as record_file:
+            json.dump({'path': os.path.abspath(path), 'sha256': file_hash(path, self.cache_dir)}, record_file)
+        os.replace(tmp_path, record_path)
+        self._prune(stage)
+
+    def _prune(self, stage):
+        """Удаление самых давно использованных записей этапа сверх max_entries"""
+        stage_dir = os.path.join(self.cache_dir, stage)
+        entries = [os.path.join(stage_dir, name) for name in os.listdir(stage_dir) if '.tmp' not in name]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def record(self, title, hit, seconds):
+        """Учет этапа в отчете: title, взят ли из кэша, время выполнения или загрузки"""
+        self.summary.append({'title': title, 'hit': hit, 'seconds': seconds})
+
+    def print_summary(self):
+        """Отчет о том, какие этапы взяты из кэша, а какие выполнены"""
+        if not self.summary:
+            return
+
+        print("\n" + "="*60)
+        print("ЭТАПЫ ОБУЧЕНИЯ")
+        print("="*60)
+        for stage in self.summary:
+            status = "⚡ из кэша" if stage['hit'] else "🔄 выполнен"
+            print(f"  {stage['title']:<30} {status:<12} {stage['seconds']:8.2f} с")
+        hits = sum(stage['hit'] for stage in self.summary)
+        print(f"\n  Из кэша: {hits} из {len(self.summary)} этапов ({self.cache_dir})")
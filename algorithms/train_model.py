@@ -1,96 +1,345 @@
 import pandas as pd
-import joblib
+import numpy as np
+import contextlib
+import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
+from threadpoolctl import threadpool_limits
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 
-from configuration.settings import TEST_SIZE, RANDOM_STATE, RF_PARAMS, GB_PARAMS, MODEL_PATH
-from datasets.data_fetcher import load_data, preprocess_data
+from configuration.settings import (TEST_SIZE, RANDOM_STATE, RF_PARAMS, GB_PARAMS, HGB_PARAMS, MODEL_PATH,
+                                    REPORT_DIR, LOAD_CHUNK_SIZE, DATASET_CACHE_DIR, COMPILE_TREE_MODELS,
+                                    PERMUTATION_REPEATS, TUNED_PARAMS_PATH, HGB_NATIVE_MISSING,
+                                    OUT_OF_CORE_MEMORY_MB, OUT_OF_CORE_OVERHEAD, QUANTILE_SKETCH_SIZE,
+                                    SPLIT_ID_COLUMN, PERMUTATION_MAX_ROWS)
+from datasets.data_fetcher import load_training_data, data_watermark, DATA_PATH, USEFUL_FEATURES, TARGET_COLUMN
+from datasets.dataset_cache import load_or_build_split
+from datasets.out_of_core import stream_split_sample
+from datasets.feature_pipeline import FeatureTransformer
+from datasets.training_data import TrainingData
+from algorithms.model_store import save_model_artifact, linear_sufficient_stats
+from algorithms.tree_engine import compile_tree_ensemble
+from algorithms.permutation_importance import permutation_importance
+from algorithms.stage_cache import StageCache, code_version, stage_key
 from tools.helpers import evaluate_model, plot_predictions, plot_feature_importance, create_comparison_table
+from tools.reporting import TrainingReport, default_plot_mode
+
+# Ключ модели -> название для отчетов
+MODEL_TITLES = {
+    'linear_regression': 'Linear Regression',
+    'random_forest': 'Random Forest',
+    'gradient_boosting': 'Gradient Boosting',
+    'hist_gradient_boosting': 'Hist Gradient Boosting'
+}
+
+# Многопоточные модели: в параллельном режиме делят между собой свободные ядра
+THREADED_MODELS = ('random_forest', 'hist_gradient_boosting')
+
+# Этапы, кроме обучения моделей, в отчете о времени
+TIMING_TITLES = {
+    'parallel_total': 'Всего (параллельно)',
+    'permutation_importance': 'Permutation importance'
+}
+
+# Модули, от кода которых зависят предобработанные данные и артефакт модели
+DATA_MODULES = ('datasets.data_fetcher', 'datasets.feature_pipeline', 'datasets.out_of_core')
+ARTIFACT_MODULES = ('algorithms.model_store', 'algorithms.tree_engine', 'algorithms.permutation_importance')
+
+def peak_rss_mb():
+    """Пиковая резидентная память процесса в МБ; None, если платформа ее не сообщает"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux сообщает килобайты, macOS — байты
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+def load_tuned_params(path=TUNED_PARAMS_PATH):
+    """Параметры, найденные python main.py tune: {модель: {параметр: значение}}"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as tuned_file:
+        return json.load(tuned_file)
+
+def model_params(model_key, tuned_path=TUNED_PARAMS_PATH):
+    """Параметры модели: значения из настроек, переопределенные подобранными"""
+    base = {'random_forest': RF_PARAMS, 'gradient_boosting': GB_PARAMS,
+            'hist_gradient_boosting': HGB_PARAMS}.get(model_key, {})
+    params = dict(base)
+    params.update(load_tuned_params(tuned_path).get(model_key, {}))
+    return params
+
+def build_model(model_key, n_jobs=None, params=None, categorical_features=None):
+    """Создание необученной модели по ключу (params — явные параметры вместо настроек)
+
+    categorical_features — маска колонок с кодами корзин для нативной
+    обработки категорий в Hist Gradient Boosting; остальные модели ее не используют.
+    """
+    if model_key == 'linear_regression':
+        return LinearRegression()
+    if model_key not in ('random_forest', 'gradient_boosting', 'hist_gradient_boosting'):
+        raise ValueError(f"Неизвестная модель: {model_key}")
+    params = dict(params) if params is not None else model_params(model_key)
+    if model_key == 'random_forest':
+        if n_jobs is not None:
+            params['n_jobs'] = n_jobs
+        return RandomForestRegressor(**params)
+    if model_key == 'hist_gradient_boosting':
+        if categorical_features is not None and categorical_features.any():
+            params['categorical_features'] = categorical_features
+        return HistGradientBoostingRegressor(**params)
+    return GradientBoostingRegressor(**params)
+
+def fit_model(model_key, X_train, y_train, X_test, n_jobs=None, categorical_features=None):
+    """Обучение и предсказания одной модели (выполняется и в пуле процессов)"""
+    start_time = time.perf_counter()
+
+    model = build_model(model_key, n_jobs, categorical_features=categorical_features)
+    # Hist Gradient Boosting считает в потоках OpenMP: n_jobs ограничивает их число
+    # (ограничение применяется при создании и снимается при выходе из with)
+    threads = (threadpool_limits(limits=n_jobs, user_api='openmp')
+               if n_jobs is not None and model_key == 'hist_gradient_boosting' else contextlib.nullcontext())
+    with threads:
+        model.fit(X_train, y_train)
+
+        # Деревья не зависят от n_jobs, а параллельное суммирование в predict меняет
+        # последние биты прогнозов. Возвращаем значение из настроек до предсказаний,
+        # чтобы артефакт и метрики не зависели от режима обучения
+        if n_jobs is not None and model_key == 'random_forest':
+            model.set_params(n_jobs=model_params(model_key).get('n_jobs'))
+
+        y_train_pred = model.predict(X_train)
+        y_test_pred = model.predict(X_test)
+
+    return model, y_train_pred, y_test_pred, time.perf_counter() - start_time
+
+# Выборка рабочего процесса: подключается из общей памяти один раз при запуске
+_worker = {}
+
+def _init_worker(handle):
+    """Инициализация рабочего процесса: выборка из общей памяти без копирования"""
+    _worker['data'] = TrainingData.attach(handle)
+
+def _fit_shared_model(model_key, n_jobs=None, categorical_features=None, native_missing=False):
+    """fit_model на выборке рабочего процесса: в задаче передается только ключ модели"""
+    data = _worker['data']
+    X_train, X_test = ((data.X_train_native, data.X_test_native) if native_missing
+                       else (data.X_train, data.X_test))
+    return fit_model(model_key, X_train, data.y_train, X_test, n_jobs, categorical_features)
 
 class TransportModelTrainer:
     """Класс для обучения и управления моделями предсказания стоимости поездок"""
     
-    def __init__(self):
+    def __init__(self, plots=None, report_dir=REPORT_DIR, use_cache=True, data_path=DATA_PATH,
+                 out_of_core=False, memory_mb=OUT_OF_CORE_MEMORY_MB):
+        # plots: 'show' — окна matplotlib, 'files' — PNG/HTML в фоне, 'none' — без графиков
+        self.plots = plots or default_plot_mode()
+        self.report = TrainingReport(report_dir) if self.plots == 'files' else None
+        self.use_cache = use_cache
+        # Кэш этапов: обучение модели и сохранение повторяются, только если изменились их входы
+        self.stages = StageCache() if use_cache else None
+        self.data_key = None
+        self.data_path = data_path
+        # out_of_core: потоковый проход и обучение на выборке в пределах memory_mb
+        self.out_of_core = out_of_core
+        self.memory_mb = memory_mb
+        self.stream_stats = None
         self.models = {}
         self.results = {}
+        # Массивы выборки для обучения, предсказаний и метрик; X_train и др. — их представления pandas
+        self.data = None
         self.X_train = None
         self.X_test = None
         self.y_train = None
         self.y_test = None
+        self.missing_train = None
+        self.missing_test = None
         self.feature_names = None
+        self.feature_pipeline = None
+        self.data_watermark = None
+        self.timings = {}
         
     def prepare_data(self):
         """Подготовка и разделение данных"""
         print("="*60)
         print("ПОДГОТОВКА ДАННЫХ ДЛЯ ОБУЧЕНИЯ")
         print("="*60)
-        
-        # Загружаем и предобрабатываем данные
-        df = load_data()
-        X, y = preprocess_data(df)
-        
-        self.feature_names = X.columns.tolist()
-        
-        # Разделяем на обучающую и тестовую выборки
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
-            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
-        )
+
+        # Отметка до чтения: python main.py update дочитает только строки, дописанные после нее
+        self.data_watermark = data_watermark(self.data_path)
+        
+        build = self._build_split_out_of_core if self.out_of_core else self._build_split
+        if self.use_cache:
+            # Повторные запуски с теми же данными и настройками не разбирают CSV
+            start_time = time.perf_counter()
+            split = load_or_build_split(self.data_path, self.dataset_config(), build, DATASET_CACHE_DIR)
+            self.data_key = split['cache_key']
+            self.stages.record("Данные и разбиение", split['cache_hit'], time.perf_counter() - start_time)
+        else:
+            split = build()
+
+        self.feature_names = list(split['feature_names'])
+        self.feature_pipeline = FeatureTransformer.from_dict(split['feature_pipeline'])
+        # Один раз приводим к непрерывным float32/float64: модели и метрики больше не конвертируют данные
+        self.data = TrainingData(split['X_train'], split['X_test'], split['y_train'], split['y_test'],
+                                 self.feature_names)
+        self._set_frames()
+        self.missing_train = split['missing_train']
+        self.missing_test = split['missing_test']
+        self.stream_stats = split.get('stream_stats')
         
         print(f"\nОбучающая выборка: {self.X_train.shape}")
         print(f"Тестовая выборка: {self.X_test.shape}")
         print(f"Среднее значение Booking Value (train): {self.y_train.mean():.2f}")
         print(f"Среднее значение Booking Value (test): {self.y_test.mean():.2f}")
+
+    def _set_frames(self):
+        """DataFrame/Series поверх массивов self.data (без копирования) для кода, работающего с pandas"""
+        self.X_train = pd.DataFrame(self.data.X_train, columns=self.feature_names, copy=False)
+        self.X_test = pd.DataFrame(self.data.X_test, columns=self.feature_names, copy=False)
+        self.y_train = pd.Series(self.data.y_train, name=TARGET_COLUMN, copy=False)
+        self.y_test = pd.Series(self.data.y_test, name=TARGET_COLUMN, copy=False)
+        
+    def dataset_config(self):
+        """Параметры предобработки, от которых зависит кэш данных"""
+        config = {
+            'features': USEFUL_FEATURES,
+            'pipeline': FeatureTransformer(USEFUL_FEATURES).to_dict(),
+            'target': TARGET_COLUMN,
+            'test_size': TEST_SIZE,
+            'random_state': RANDOM_STATE,
+            'code': code_version(*DATA_MODULES)
+        }
+        if self.out_of_core:
+            config['out_of_core'] = {'sample_rows': self._sample_rows(), 'sketch_size': QUANTILE_SKETCH_SIZE,
+                                     'id_column': SPLIT_ID_COLUMN}
+        return config
+
+    def _sample_rows(self):
+        """Строк обучающей и тестовой выборок, которые помещаются в memory_mb"""
+        n_inputs = len(USEFUL_FEATURES)
+        n_features = len(FeatureTransformer(USEFUL_FEATURES).feature_names)
+        # Исходные признаки, целевая переменная, приоритет, маска пропусков и итоговая матрица
+        row_bytes = n_inputs * 4 + 8 + 8 + n_inputs + n_features * 4
+        total = max(2, int(self.memory_mb * 1024**2 // (row_bytes * OUT_OF_CORE_OVERHEAD)))
+        test_rows = max(1, int(total * TEST_SIZE))
+        return total - test_rows, test_rows
+
+    def _build_split_out_of_core(self):
+        """Потоковый проход по файлу: медианы по эскизам, хэш-разбиение и выборки в пределах памяти"""
+        train_rows, test_rows = self._sample_rows()
+        print(f"💾 Бюджет памяти: {self.memory_mb} МБ — до {train_rows} обучающих и {test_rows} тестовых строк")
+        sample = stream_split_sample(self.data_path, train_rows, test_rows, chunksize=LOAD_CHUNK_SIZE,
+                                     test_size=TEST_SIZE, random_state=RANDOM_STATE, id_column=SPLIT_ID_COLUMN,
+                                     sketch_size=QUANTILE_SKETCH_SIZE)
+
+        # Медианы — по эскизам всех обучающих строк файла, а не только выборки
+        pipeline = FeatureTransformer(USEFUL_FEATURES)
+        pipeline.medians = np.array([sketch.quantile(0.5) if sketch.count else 0.0
+                                     for sketch in sample['sketches']], dtype=np.float32)
+        pipeline.counts = np.array([sketch.count for sketch in sample['sketches']], dtype=np.int64)
+        pipeline.sketches = sample['sketches']
+
+        split = {}
+        for part in ('train', 'test'):
+            X = sample[f'X_{part}']
+            split[f'missing_{part}'] = np.isnan(X)
+            pipeline.impute(X)
+            split[f'X_{part}'] = pipeline.transform(X)
+            split[f'y_{part}'] = sample[f'y_{part}']
+        print(f"🎨 Признаков после преобразования: {len(pipeline.feature_names)}")
+
+        split.update({
+            'feature_names': pipeline.feature_names,
+            'feature_pipeline': pipeline.to_dict(),
+            'stream_stats': {'rows': sample['rows'], 'train_rows': sample['train_rows'],
+                             'test_rows': sample['test_rows']}
+        })
+        return split
+
+    def _build_split(self):
+        """Загрузка, предобработка и разделение данных"""
+        # Потоковая загрузка только нужных колонок с компактными типами
+        pipeline = FeatureTransformer(USEFUL_FEATURES)
+        X, y, missing = load_training_data(self.data_path, chunksize=LOAD_CHUNK_SIZE, pipeline=pipeline,
+                                           return_missing=True)
+
+        # Тот же преобразователь, что сохраняется в артефакт и используется при предсказаниях
+        X_features = pipeline.transform(X)
+        print(f"🎨 Признаков после преобразования: {len(pipeline.feature_names)}")
         
-    def train_linear_regression(self):
-        """Обучение линейной регрессии"""
-        print("\n" + "="*60)
-        print("ОБУЧЕНИЕ LINEAR REGRESSION")
-        print("="*60)
+        # Разделяем на обучающую и тестовую выборки
+        # Маска заполненных пропусков делится вместе с данными — для моделей с нативными пропусками
+        X_train, X_test, y_train, y_test, missing_train, missing_test = train_test_split(
+            X_features, y.to_numpy(), missing, test_size=TEST_SIZE, random_state=RANDOM_STATE
+        )
 
-        # Финальная проверка данных перед обучением
+        return {
+            'X_train': X_train,
+            'X_test': X_test,
+            'y_train': y_train,
+            'y_test': y_test,
+            'missing_train': missing_train,
+            'missing_test': missing_test,
+            'feature_names': pipeline.feature_names,
+            'feature_pipeline': pipeline.to_dict()
+        }
+
+    def check_training_data(self):
+        """Финальная проверка и очистка обучающих данных"""
+        data = self.data
+        x_has_nan = bool(np.isnan(data.X_train).any())
+        y_has_nan = bool(np.isnan(data.y_train).any())
         print("Проверка данных перед обучением...")
-        print(f"X_train shape: {self.X_train.shape}")
-        print(f"y_train shape: {self.y_train.shape}")
-        print(f"X_train содержит NaN: {self.X_train.isnull().any().any()}")
-        print(f"y_train содержит NaN: {self.y_train.isnull().any()}")
+        print(f"X_train shape: {data.X_train.shape}")
+        print(f"y_train shape: {data.y_train.shape}")
+        print(f"X_train содержит NaN: {x_has_nan}")
+        print(f"y_train содержит NaN: {y_has_nan}")
 
-        # Последняя проверка и очистка
-        if self.X_train.isnull().any().any():
+        # Последняя проверка и очистка: массивы копируются, только если есть что исправлять
+        if x_has_nan:
             print("Удаляю строки с NaN в X_train...")
-            self.X_train = self.X_train.fillna(0)
-        if self.y_train.isnull().any():
+            data.X_train = np.nan_to_num(data.X_train, nan=0.0)
+        if y_has_nan:
             print("Удаляю строки с NaN в y_train...")
-            valid_indices = ~self.y_train.isnull()
-            self.X_train = self.X_train[valid_indices]
-            self.y_train = self.y_train[valid_indices]
+            valid_indices = ~np.isnan(data.y_train)
+            data.X_train = data.X_train[valid_indices]
+            data.y_train = data.y_train[valid_indices]
+            self.missing_train = self.missing_train[valid_indices]
+            if data.X_train_native is not None:
+                data.X_train_native = data.X_train_native[valid_indices]
+        if x_has_nan or y_has_nan:
+            self._set_frames()
 
-        print(f"После очистки - X_train: {self.X_train.shape}, y_train: {self.y_train.shape}")
+        print(f"После очистки - X_train: {data.X_train.shape}, y_train: {data.y_train.shape}")
+
+    def _record_results(self, model_key, model, y_train_pred, y_test_pred):
+        """Оценка модели и сохранение результатов"""
+        title = MODEL_TITLES[model_key]
 
-        lr = LinearRegression()
-        lr.fit(self.X_train, self.y_train)
-        
-        # Предсказания
-        y_train_pred = lr.predict(self.X_train)
-        y_test_pred = lr.predict(self.X_test)
-        
         # Оценка
-        train_mse, train_r2 = evaluate_model(self.y_train, y_train_pred, "Linear Regression Train")
-        test_mse, test_r2 = evaluate_model(self.y_test, y_test_pred, "Linear Regression Test")
+        train_mse, train_r2 = evaluate_model(self.data.y_train, y_train_pred, f"{title} Train")
+        test_mse, test_r2 = evaluate_model(self.data.y_test, y_test_pred, f"{title} Test")
         
         # Дополнительные метрики
-        train_mae = mean_absolute_error(self.y_train, y_train_pred)
-        test_mae = mean_absolute_error(self.y_test, y_test_pred)
+        train_mae = mean_absolute_error(self.data.y_train, y_train_pred)
+        test_mae = mean_absolute_error(self.data.y_test, y_test_pred)
         
         print(f"Training MAE: {train_mae:.2f}")
         print(f"Test MAE: {test_mae:.2f}")
+        if getattr(model, 'n_iter_', None) is not None:
+            print(f"Итераций после ранней остановки: {model.n_iter_} из {model.max_iter}")
         
         # Сохраняем результаты
-        self.models['linear_regression'] = lr
-        self.results['linear_regression'] = {
-            'model': lr,
+        self.models[model_key] = model
+        self.results[model_key] = {
+            'model': model,
             'train_pred': y_train_pred,
             'test_pred': y_test_pred,
             'metrics': {
@@ -102,110 +351,198 @@ class TransportModelTrainer:
                 'Test MAE': test_mae
             }
         }
+
+    def _plot_results(self, model_key):
+        """Визуализация предсказаний и важности признаков модели"""
+        if self.plots == 'none':
+            return
+
+        title = MODEL_TITLES[model_key]
+        result = self.results[model_key]
+        has_importance = hasattr(result['model'], 'feature_importances_')
+
+        # Без GUI только собираем данные, графики рисуются после обучения
+        if self.plots == 'files':
+            self.report.add_predictions(f"{title} - Booking Value Prediction", self.data.y_train,
+                                        result['train_pred'], self.data.y_test, result['test_pred'])
+            if has_importance:
+                self.report.add_feature_importance(title, self.feature_names,
+                                                   result['model'].feature_importances_)
+            return
+
+        plot_predictions(self.data.y_train, result['train_pred'], self.data.y_test, result['test_pred'], 
+                        f"{title} - Booking Value Prediction")
         
-        # Визуализация
-        plot_predictions(self.y_train, y_train_pred, self.y_test, y_test_pred, 
-                        "Linear Regression - Booking Value Prediction")
-        
-        return lr
-    
-    def train_random_forest(self):
-        """Обучение случайного леса"""
+        # Важность признаков
+        if has_importance:
+            plot_feature_importance(result['model'], self.feature_names, title)
+
+    def _uses_native_missing(self, model_key):
+        """Обучается ли модель на матрицах с пропусками вместо медиан"""
+        return model_key == 'hist_gradient_boosting' and HGB_NATIVE_MISSING
+
+    def _model_inputs(self, model_key):
+        """Обучающая и тестовая матрицы и маска категориальных колонок для модели"""
+        data = self.data
+        if model_key != 'hist_gradient_boosting':
+            return data.X_train, data.X_test, None
+
+        categorical = self.feature_pipeline.categorical_mask()
+        if not self._uses_native_missing(model_key):
+            return data.X_train, data.X_test, categorical
+
+        # Вместо медиан — пропуски: бустинг сам выбирает для них ветвь в каждом узле.
+        # Матрицы строятся один раз и переиспользуются для обучения и permutation importance
+        if data.X_train_native is None:
+            data.set_native(self.feature_pipeline.restore_missing(data.X_train, self.missing_train),
+                            self.feature_pipeline.restore_missing(data.X_test, self.missing_test))
+        return data.X_train_native, data.X_test_native, categorical
+
+    def _fit_key(self, model_key):
+        """Ключ этапа обучения модели: данные, параметры модели и версия кода обучения"""
+        return stage_key(f'fit_{model_key}', {
+            'data': self.data_key,
+            'params': model_params(model_key),
+            'native_missing': self._uses_native_missing(model_key),
+            'code': code_version(__name__)
+        })
+
+    def _load_fit(self, model_key):
+        """Результат обучения из кэша этапов (модель, прогнозы, время обучения) или None"""
+        if self.stages is None or self.data_key is None:
+            return None
+        start_time = time.perf_counter()
+        result = self.stages.load(f'fit_{model_key}', self._fit_key(model_key))
+        if result is not None:
+            self.stages.record(MODEL_TITLES[model_key], True, time.perf_counter() - start_time)
+            print(f"⚡ {MODEL_TITLES[model_key]} загружена из кэша этапов (обучение заняло {result[3]:.2f} с)")
+        return result
+
+    def _save_fit(self, model_key, result):
+        """Сохранение результата обучения в кэш этапов"""
+        if self.stages is None or self.data_key is None:
+            return
+        self.stages.save(f'fit_{model_key}', self._fit_key(model_key), result)
+        self.stages.record(MODEL_TITLES[model_key], False, result[3])
+
+    def _train_model(self, model_key, n_jobs=None):
+        """Последовательное обучение одной модели (или загрузка из кэша этапов)"""
         print("\n" + "="*60)
-        print("ОБУЧЕНИЕ RANDOM FOREST")
+        print(f"ОБУЧЕНИЕ {MODEL_TITLES[model_key].upper()}")
         print("="*60)
-        
-        rf = RandomForestRegressor(**RF_PARAMS)
-        rf.fit(self.X_train, self.y_train)
-        
-        # Предсказания
-        y_train_pred = rf.predict(self.X_train)
-        y_test_pred = rf.predict(self.X_test)
-        
-        # Оценка
-        train_mse, train_r2 = evaluate_model(self.y_train, y_train_pred, "Random Forest Train")
-        test_mse, test_r2 = evaluate_model(self.y_test, y_test_pred, "Random Forest Test")
-        
-        # Дополнительные метрики
-        train_mae = mean_absolute_error(self.y_train, y_train_pred)
-        test_mae = mean_absolute_error(self.y_test, y_test_pred)
-        
-        print(f"Training MAE: {train_mae:.2f}")
-        print(f"Test MAE: {test_mae:.2f}")
-        
-        # Сохраняем результаты
-        self.models['random_forest'] = rf
-        self.results['random_forest'] = {
-            'model': rf,
-            'train_pred': y_train_pred,
-            'test_pred': y_test_pred,
-            'metrics': {
-                'Training MSE': train_mse,
-                'Training R2': train_r2,
-                'Training MAE': train_mae,
-                'Test MSE': test_mse,
-                'Test R2': test_r2,
-                'Test MAE': test_mae
-            }
-        }
+
+        if model_key == 'linear_regression':
+            self.check_training_data()
+
+        result = self._load_fit(model_key)
+        if result is None:
+            X_train, X_test, categorical = self._model_inputs(model_key)
+            result = fit_model(model_key, X_train, self.data.y_train, X_test, n_jobs, categorical)
+            self.timings[model_key] = result[3]
+            self._save_fit(model_key, result)
+        model, y_train_pred, y_test_pred, _ = result
+        self._record_results(model_key, model, y_train_pred, y_test_pred)
         
         # Визуализация
-        plot_predictions(self.y_train, y_train_pred, self.y_test, y_test_pred, 
-                        "Random Forest - Booking Value Prediction")
-        
-        # Важность признаков
-        plot_feature_importance(rf, self.feature_names, "Random Forest")
+        self._plot_results(model_key)
         
-        return rf
+        return model
+
+    def train_linear_regression(self):
+        """Обучение линейной регрессии"""
+        return self._train_model('linear_regression')
+    
+    def train_random_forest(self, n_jobs=None):
+        """Обучение случайного леса"""
+        return self._train_model('random_forest', n_jobs)
     
     def train_gradient_boosting(self):
         """Обучение градиентного бустинга"""
+        return self._train_model('gradient_boosting')
+
+    def train_hist_gradient_boosting(self, n_jobs=None):
+        """Обучение гистограммного градиентного бустинга (многопоточный, с ранней остановкой)"""
+        return self._train_model('hist_gradient_boosting', n_jobs)
+
+    def train_models_parallel(self, n_jobs=None):
+        """Одновременное обучение всех моделей в пуле процессов"""
         print("\n" + "="*60)
-        print("ОБУЧЕНИЕ GRADIENT BOOSTING")
+        print("ПАРАЛЛЕЛЬНОЕ ОБУЧЕНИЕ МОДЕЛЕЙ")
         print("="*60)
-        
-        gb = GradientBoostingRegressor(**GB_PARAMS)
-        gb.fit(self.X_train, self.y_train)
-        
-        # Предсказания
-        y_train_pred = gb.predict(self.X_train)
-        y_test_pred = gb.predict(self.X_test)
-        
-        # Оценка
-        train_mse, train_r2 = evaluate_model(self.y_train, y_train_pred, "Gradient Boosting Train")
-        test_mse, test_r2 = evaluate_model(self.y_test, y_test_pred, "Gradient Boosting Test")
-        
-        # Дополнительные метрики
-        train_mae = mean_absolute_error(self.y_train, y_train_pred)
-        test_mae = mean_absolute_error(self.y_test, y_test_pred)
-        
-        print(f"Training MAE: {train_mae:.2f}")
-        print(f"Test MAE: {test_mae:.2f}")
-        
-        # Сохраняем результаты
-        self.models['gradient_boosting'] = gb
-        self.results['gradient_boosting'] = {
-            'model': gb,
-            'train_pred': y_train_pred,
-            'test_pred': y_test_pred,
-            'metrics': {
-                'Training MSE': train_mse,
-                'Training R2': train_r2,
-                'Training MAE': train_mae,
-                'Test MSE': test_mse,
-                'Test R2': test_r2,
-                'Test MAE': test_mae
+
+        self.check_training_data()
+
+        # Модели из кэша этапов не обучаются заново: в пул уходят только остальные
+        results = {model_key: self._load_fit(model_key) for model_key in MODEL_TITLES}
+        model_keys = [model_key for model_key, result in results.items() if result is None]
+        if model_keys:
+            results.update(self._fit_in_pool(model_keys, n_jobs))
+
+        # Результаты сохраняются в фиксированном порядке — как при последовательном обучении
+        for model_key, (model, y_train_pred, y_test_pred, _) in results.items():
+            self._record_results(model_key, model, y_train_pred, y_test_pred)
+
+        # Графики строятся после обучения, чтобы не блокировать пул
+        for model_key in results:
+            self._plot_results(model_key)
+
+    def _fit_in_pool(self, model_keys, n_jobs=None):
+        """Обучение моделей model_keys в пуле процессов: {модель: результат fit_model}"""
+        n_cores = n_jobs or os.cpu_count() or 1
+        n_workers = min(len(model_keys), n_cores)
+        # Линейная регрессия и классический бустинг однопоточны — оставшиеся ядра
+        # поровну делят лес и гистограммный бустинг
+        threaded = [model_key for model_key in model_keys if model_key in THREADED_MODELS]
+        spare_cores = n_cores - (n_workers - len(threaded))
+        model_jobs = max(1, spare_cores // max(1, len(threaded)))
+
+        print(f"⚙️  Процессов: {n_workers}, потоков на {', '.join(MODEL_TITLES[key] for key in threaded)}: "
+              f"{model_jobs}")
+
+        start_time = time.perf_counter()
+        # Все матрицы (в том числе с нативными пропусками) готовятся до публикации в общей памяти
+        categorical = {model_key: self._model_inputs(model_key)[2] for model_key in model_keys}
+        # Процессы подключают выборку из общей памяти, задачи передают только ключ модели
+        results = {}
+        with self.data, ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                            initargs=(self.data.share(),)) as executor:
+            futures = {
+                model_key: executor.submit(
+                    _fit_shared_model, model_key, model_jobs if model_key in THREADED_MODELS else None,
+                    categorical[model_key], self._uses_native_missing(model_key)
+                )
+                for model_key in model_keys
             }
-        }
-        
-        # Визуализация
-        plot_predictions(self.y_train, y_train_pred, self.y_test, y_test_pred, 
-                        "Gradient Boosting - Booking Value Prediction")
-        
-        # Важность признаков
-        plot_feature_importance(gb, self.feature_names, "Gradient Boosting")
-        
-        return gb
+            for model_key in model_keys:
+                results[model_key] = futures[model_key].result()
+                self.timings[model_key] = results[model_key][3]
+                print(f"\n✓ {MODEL_TITLES[model_key]} обучена за {results[model_key][3]:.2f} с")
+                self._save_fit(model_key, results[model_key])
+        self.timings['parallel_total'] = time.perf_counter() - start_time
+        return results
+
+    def print_timings(self):
+        """Отчет о времени обучения моделей"""
+        if not self.timings:
+            return
+
+        print("\n" + "="*60)
+        print("ВРЕМЯ ОБУЧЕНИЯ")
+        print("="*60)
+        for model_key, seconds in self.timings.items():
+            title = MODEL_TITLES.get(model_key) or TIMING_TITLES.get(model_key, model_key)
+            print(f"  {title:<25} {seconds:8.2f} с")
+
+        if self.out_of_core and self.stream_stats:
+            print(f"\n  Строк в файле: {self.stream_stats['rows']}, обучение на выборке "
+                  f"{len(self.data.y_train)} из {self.stream_stats['train_rows']}, "
+                  f"метрики на {len(self.data.y_test)} из {self.stream_stats['test_rows']} тестовых")
+        if self.data is not None:
+            print(f"\n  Массивы выборки: {self.data.nbytes / 1024**2:.1f} МБ")
+        peak = peak_rss_mb()
+        if peak is not None:
+            budget = f" (бюджет выборок {self.memory_mb} МБ)" if self.out_of_core else ""
+            print(f"  Пиковая память процесса: {peak:.0f} МБ{budget}")
     
     def compare_models(self):
         """Сравнение всех обученных моделей"""
@@ -240,10 +577,33 @@ class TransportModelTrainer:
         print(f"\n🏆 Лучшая модель: {best_model_name.upper()}")
         print(f"   Test R²: {comparison_df.loc[best_model_name, 'Test R²']:.4f}")
         print(f"   Test MAE: {comparison_df.loc[best_model_name, 'Test MAE']:.2f}")
+
+        if self.report is not None:
+            self.report.set_comparison(comparison_df)
         
         return comparison_df
     
-    def save_best_model(self):
+    def compute_permutation_importance(self, model_key, n_jobs=None):
+        """Permutation importance модели на тестовой выборке (признаки и повторы — в пуле процессов)"""
+        print("\n" + "="*60)
+        print(f"PERMUTATION IMPORTANCE: {MODEL_TITLES[model_key].upper()}")
+        print("="*60)
+
+        _, X_test, _ = self._model_inputs(model_key)
+        importance = permutation_importance(self.results[model_key]['model'], X_test, self.data.y_test,
+                                            self.feature_names, n_jobs=n_jobs)
+        self.results[model_key]['permutation_importance'] = importance
+        self.timings['permutation_importance'] = importance['seconds']
+
+        order = importance['importances_mean'].argsort()[::-1]
+        print(f"Базовый Test R²: {importance['baseline_score']:.4f} "
+              f"({importance['n_rows']} строк, {importance['n_repeats']} перестановок)")
+        for index in order[:10]:
+            print(f"  {importance['features'][index]:<35} {importance['importances_mean'][index]:8.4f} "
+                  f"± {importance['importances_std'][index]:.4f}")
+        return importance
+
+    def save_best_model(self, path=MODEL_PATH, n_jobs=None):
         """Сохранение лучшей модели"""
         if not self.results:
             print("Нет обученных моделей для сохранения")
@@ -252,46 +612,120 @@ class TransportModelTrainer:
         # Находим модель с лучшим R² на тестовой выборке
         best_model_name = max(self.results.keys(), 
                              key=lambda x: self.results[x]['metrics']['Test R2'])
-        best_model = self.results[best_model_name]['model']
         
-        # Создаем папку models, если её нет
-        os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-        
-        # Сохраняем модель с метаданными
-        model_data = {
-            'model': best_model,
-            'feature_names': self.feature_names,
-            'model_name': best_model_name,
-            'metrics': self.results[best_model_name]['metrics']
-        }
-        
-        joblib.dump(model_data, MODEL_PATH)
+        # Артефакт уже содержит эту модель, обученную на тех же данных: запись не повторяется
+        start_time = time.perf_counter()
+        saved = False
+        if self.stages is not None:
+            save_key = self._save_key(best_model_name, path)
+            saved = self.stages.is_current('save', save_key, path)
+        if not saved:
+            self._write_artifact(best_model_name, path, n_jobs)
+            if self.stages is not None:
+                self.stages.mark_current('save', save_key, path)
+        if self.stages is not None:
+            self.stages.record("Сохранение модели", saved, time.perf_counter() - start_time)
         
         print("\n" + "="*60)
-        print(f"✓ Лучшая модель ({best_model_name}) сохранена в: {MODEL_PATH}")
+        if saved:
+            print(f"⚡ Лучшая модель ({best_model_name}) уже сохранена в: {path}, артефакт не изменился")
+        else:
+            print(f"✓ Лучшая модель ({best_model_name}) сохранена в: {path}")
         print(f"  Метрики модели:")
         print(f"  - Test R²: {self.results[best_model_name]['metrics']['Test R2']:.4f}")
         print(f"  - Test MAE: {self.results[best_model_name]['metrics']['Test MAE']:.2f}")
         print(f"  - Test MSE: {self.results[best_model_name]['metrics']['Test MSE']:.2f}")
         print("="*60)
+
+    def _save_key(self, best_model_name, path):
+        """Ключ этапа сохранения: обучение лучшей модели, отметка данных и настройки артефакта"""
+        return stage_key('save', {
+            'fit': self._fit_key(best_model_name),
+            'path': os.path.abspath(path),
+            'data_watermark': self.data_watermark,
+            'permutation': [PERMUTATION_REPEATS, PERMUTATION_MAX_ROWS],
+            'compile_trees': COMPILE_TREE_MODELS,
+            'code': code_version(__name__, *ARTIFACT_MODULES)
+        })
+
+    def _write_artifact(self, best_model_name, path, n_jobs=None):
+        """Артефакт лучшей модели: модель, преобразование, метрики и производные таблицы"""
+        best_model = self.results[best_model_name]['model']
+
+        # Сохраняем модель с метаданными
+        model_data = {
+            'model': best_model,
+            'feature_names': self.feature_names,
+            'feature_pipeline': self.feature_pipeline,
+            'model_name': best_model_name,
+            'metrics': self.results[best_model_name]['metrics'],
+            'data_watermark': self.data_watermark
+        }
+
+        # Линейная модель дообучается точно: новые строки добавляются к суммам X'X и X'y
+        if best_model_name == 'linear_regression':
+            model_data['linear_stats'] = linear_sufficient_stats(self.data.X_train, self.data.y_train)
+
+        # Готовая таблица важности для веб-интерфейса — для модели любого типа
+        if PERMUTATION_REPEATS:
+            model_data['permutation_importance'] = self.compute_permutation_importance(best_model_name, n_jobs)
+
+        # Плоские массивы деревьев для быстрого инференса малых пакетов
+        if COMPILE_TREE_MODELS:
+            engine = compile_tree_ensemble(best_model)
+            if engine is not None:
+                model_data['compiled_trees'] = engine
+                print(f"⚡ Деревья скомпилированы: {len(engine['roots'])} деревьев, {len(engine['value'])} узлов")
+        
+        # Без сжатия и с атомарной заменой: массивы можно отображать в память
+        save_model_artifact(model_data, path)
     
-    def train_all_models(self):
+    def train_all_models(self, parallel=False, n_jobs=None):
         """Обучение всех моделей"""
         self.prepare_data()
-        self.train_linear_regression()
-        self.train_random_forest()
-        self.train_gradient_boosting()
+        if parallel:
+            self.train_models_parallel(n_jobs)
+        else:
+            self.train_linear_regression()
+            self.train_random_forest(n_jobs)
+            self.train_gradient_boosting()
+            self.train_hist_gradient_boosting(n_jobs)
         self.compare_models()
-        self.save_best_model()
+        self.save_best_model(n_jobs=n_jobs)
+        if self.report is not None:
+            # Поток отрисовки запускается только после пула процессов важности признаков:
+            # fork при живом потоке matplotlib может унаследовать захваченные им блокировки
+            self.report.render_async()
+        self.print_timings()
+        if self.stages is not None:
+            self.stages.print_summary()
+
+    def finish_report(self):
+        """Ожидание фоновой отрисовки отчета и вывод путей к файлам"""
+        if self.report is None:
+            return []
 
-def main():
+        files = self.report.wait()
+        if files:
+            print(f"\n📈 Отчет об обучении сохранен: {files[-1]}")
+            print(f"   Графиков: {len(files) - 1}")
+        return files
+
+def main(parallel=False, n_jobs=None, plots=None, report_dir=REPORT_DIR, use_cache=True, out_of_core=False,
+         memory_mb=OUT_OF_CORE_MEMORY_MB):
     """Основная функция для обучения моделей"""
     print("\n" + "="*60)
     print("CITY TRANSPORT ANALYTICS - ОБУЧЕНИЕ МОДЕЛИ ПРЕДСКАЗАНИЯ СТОИМОСТИ")
     print("="*60 + "\n")
     
-    trainer = TransportModelTrainer()
-    trainer.train_all_models()
+    trainer = TransportModelTrainer(plots=plots, report_dir=report_dir, use_cache=use_cache,
+                                    out_of_core=out_of_core, memory_mb=memory_mb)
+    trainer.train_all_models(parallel=parallel, n_jobs=n_jobs)
+    trainer.finish_report()
+
+    # Решетка цен калькулятора строится здесь, а не в запросе веб-интерфейса
+    from algorithms.price_lattice import build_lattice_for_model
+    build_lattice_for_model(MODEL_PATH)
     
     print("\n✓ Обучение завершено успешно!")
 
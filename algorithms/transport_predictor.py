@@ -1,78 +1,205 @@
-import joblib
 import pandas as pd
 import numpy as np
 import sys
 import os
+import time
+import warnings
+import threading
 
 # Добавляем путь к datasets для импорта
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-try:
-    from datasets.data_fetcher import create_features, USEFUL_FEATURES
-except ImportError:
-    # Альтернативный импорт если структура папок отличается
-    try:
-        from download_data import create_features, USEFUL_FEATURES
-    except ImportError as e:
-        print(f"❌ Ошибка импорта модулей: {e}")
-        # Создаем базовые константы если импорт не удался
-        USEFUL_FEATURES = ['Ride Distance', 'Driver Ratings', 'Customer Rating', 'Avg VTAT', 'Avg CTAT']
-        
-        def create_features(X):
-            """Базовая функция создания признаков если основной модуль недоступен"""
-            X = X.copy()
-            
-            # Базовые преобразования
-            if 'Ride Distance' in X.columns:
-                X['distance_category'] = pd.cut(X['Ride Distance'], 
-                                               bins=[0, 10, 25, 50, float('inf')], 
-                                               labels=['short', 'medium', 'long', 'very_long'])
-                X['distance_category'] = X['distance_category'].astype(str)
-            
-            if 'Driver Ratings' in X.columns and 'Customer Rating' in X.columns:
-                X['rating_diff'] = X['Driver Ratings'] - X['Customer Rating']
-                X['avg_rating'] = (X['Driver Ratings'] + X['Customer Rating']) / 2
-            
-            if 'Avg VTAT' in X.columns and 'Avg CTAT' in X.columns:
-                X['total_time'] = X['Avg VTAT'] + X['Avg CTAT']
-                if 'Ride Distance' in X.columns:
-                    X['time_per_distance'] = X['total_time'] / (X['Ride Distance'] + 1e-8)
-            
-            return X
+from configuration.settings import (BATCH_CHUNK_SIZE, BATCH_OUTPUT_SUFFIX, PREDICTION_COLUMN, MODEL_MMAP_MODE,
+                                    TREE_ENGINE_MAX_ROWS, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+from algorithms.model_store import load_model_artifact, linear_coefficients, artifact_fingerprint
+from algorithms.prediction_cache import PredictionCache
+from algorithms.tree_engine import predict_compiled
+from datasets.data_fetcher import USEFUL_FEATURES
+from datasets.feature_pipeline import FeatureTransformer
+from tools.metrics import get_logger
+
+logger = get_logger('predictor')
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'transport_model.joblib')
 
 class TransportCostPredictor:
     """Класс для предсказания стоимости поездок с улучшенными признаками"""
 
-    def __init__(self, model_path=MODEL_PATH):
+    def __init__(self, model_path=MODEL_PATH, mmap_mode=MODEL_MMAP_MODE, use_registry=True, metrics=None,
+                 cache_size=PREDICTION_CACHE_SIZE, cache_ttl=PREDICTION_CACHE_TTL, cache_steps=None):
         self.model_path = model_path
+        self.mmap_mode = mmap_mode
+        self.use_registry = use_registry
+        # tools.metrics.Metrics для замеров этапов; None — замеры выключены
+        self.metrics = metrics
+        # Кэш прогнозов поездок; cache_steps — округление признаков до шагов интерфейса
+        self.cache = PredictionCache(cache_size, cache_ttl, cache_steps) if cache_size else None
+        self.model_hash = None
         self.model_data = None
         self.feature_names = None
+        self.pipeline = None
+        self._fast_path = None
+        self._tree_engine = None
+        self._linear = None
         self.load_model()
 
     def load_model(self):
         """Загрузка модели и обновление списка признаков"""
+        start_time = time.perf_counter()
         try:
             if not os.path.exists(self.model_path):
-                print(f"🚨 Модель не найдена по пути: {self.model_path}")
-                print("💡 Выполните обучение модели: python main.py train")
+                logger.warning(f"🚨 Модель не найдена по пути: {self.model_path}")
+                logger.warning("💡 Выполните обучение модели: python main.py train")
                 return None
                 
-            self.model_data = joblib.load(self.model_path)
+            # Повторная загрузка того же файла берет артефакт из реестра процесса
+            self.model_data = load_model_artifact(self.model_path, self.mmap_mode, self.use_registry)
+            self.model_hash = artifact_fingerprint(self.model_path)
+            if self.cache is not None:
+                self.cache.bind(self.model_hash)
             self.feature_names = self.model_data.get('feature_names', USEFUL_FEATURES)
-            print(f"✅ Модель успешно загружена: {self.model_data.get('model_name', 'Unknown')}")
-            print(f"📊 Используется {len(self.feature_names)} признаков для прогнозирования")
-            return self.model_data['model']
+            # Обученное преобразование признаков; для старых артефактов — по списку колонок модели
+            self.pipeline = self.model_data.get('feature_pipeline')
+            if self.pipeline is None:
+                self.pipeline = FeatureTransformer(USEFUL_FEATURES, self.feature_names)
+            logger.info(f"✅ Модель успешно загружена: {self.model_data.get('model_name', 'Unknown')}")
+            logger.info(f"📊 Используется {len(self.feature_names)} признаков для прогнозирования")
+            # Скомпилированные деревья (если есть в артефакте) считают малые пакеты без накладных расходов sklearn
+            engine = self.model_data.get('compiled_trees')
+            # np.asarray снимает обертку np.memmap без копирования: take() на ndarray заметно быстрее
+            self._tree_engine = ({key: np.asarray(value) if isinstance(value, np.ndarray) else value
+                                  for key, value in engine.items()} if engine is not None else None)
+            if self._tree_engine is not None:
+                logger.info(f"⚡ Скомпилированный движок деревьев: {len(self._tree_engine['roots'])} деревьев")
+            # Линейная модель считается по коэффициентам: распаковка оценщика и импорт sklearn не нужны
+            if 'linear_coefficients' in self.model_data:
+                self._linear = self.model_data['linear_coefficients']
+            else:
+                self._linear = linear_coefficients(self.model_data['model'])  # старый формат артефакта
+            self._compile_fast_path()
+            if self.metrics is not None:
+                self.metrics.since('load_model', start_time)
+            # Сам оценщик sklearn распаковывается при первом обращении к model_data['model']
+            return self.model_data
         except Exception as e:
-            print(f"❌ Ошибка загрузки модели: {e}")
+            logger.error(f"❌ Ошибка загрузки модели: {e}")
+            if self.metrics is not None:
+                self.metrics.count('errors', 'load_model')
+            return None
+
+    def _compile_fast_path(self):
+        """Подготовка быстрого пути для одиночных предсказаний без pandas"""
+        linear = self._linear
+        if linear is not None:
+            # Коэффициенты в float64 для всех путей (в старых артефактах они могут быть float32):
+            # пакетный float32 @ float64 и одиночный прогноз считаются одинаково
+            linear = self._linear = {'coef': np.asarray(linear['coef'], dtype=np.float64),
+                                     'intercept': float(linear['intercept'])}
+
+        self._fast_path = {
+            'n_features': len(self.feature_names),
+            'buffers': threading.local(),  # свой предвыделенный буфер строки на поток
+            'coef': linear['coef'] if linear else None,
+            'intercept': linear['intercept'] if linear else 0.0
+        }
+
+    def _predict_matrix(self, X):
+        """Предсказание для подготовленной матрицы признаков в порядке self.feature_names"""
+        if self._linear is not None:
+            # То же произведение, что и LinearRegression.predict
+            return np.asarray(X) @ self._linear['coef'] + self._linear['intercept']
+
+        if self._tree_engine is not None and len(X) <= TREE_ENGINE_MAX_ROWS:
+            return predict_compiled(self._tree_engine, X)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # модель обучена на DataFrame с именами колонок
+            return self.model_data['model'].predict(X)
+
+    def predict_one(self, input_data):
+        """Быстрое предсказание для одной поездки (dict) без построения DataFrame.
+
+        Возвращает None, если запрос нельзя обработать быстрым путем —
+        тогда вызывающий код использует обычный путь через pandas.
+        """
+        fast_path = self._fast_path
+        if fast_path is None:
+            return None
+        metrics = self.metrics
+        if metrics is not None:
+            start_time = stage_time = time.perf_counter()
+
+        try:
+            values = []
+            filled = 0
+            for feature in self.pipeline.input_features:
+                value = input_data.get(feature)
+                if value is None:
+                    filled += 1
+                    value = 0.0
+                values.append(float(value))
+        except (TypeError, ValueError):
+            return None
+        if any(value != value for value in values):  # NaN
             return None
 
+        row = getattr(fast_path['buffers'], 'row', None)
+        if row is None:
+            row = fast_path['buffers'].row = np.zeros((1, fast_path['n_features']), dtype=np.float32)
+        # Те же признаки и то же округление до float32, что и в векторизованном transform
+        self.pipeline.transform_row(values, row[0])
+        if metrics is not None:
+            stage_time = metrics.since('transform_row', stage_time)
+
+        if fast_path['coef'] is not None:
+            prediction = np.array([float(row[0] @ fast_path['coef']) + fast_path['intercept']])
+        else:
+            prediction = self._predict_matrix(row)
+
+        if metrics is not None:
+            metrics.since('model', stage_time)
+            metrics.since('predict_one', start_time)
+            metrics.count('calls', 'predict_one')
+            metrics.count('rows', 'predict_one')
+            if filled:
+                metrics.count('missing_feature_fills', 'predict_one', filled)
+        return prediction
+
     def predict_booking_value(self, input_data):
         """Предсказание с применением feature engineering"""
         if self.model_data is None:
-            print("⚠️ Модель не загружена. Предсказание невозможно.")
+            logger.warning("⚠️ Модель не загружена. Предсказание невозможно.")
             return None
 
+        # Одиночная поездка: сначала кэш, затем быстрый путь без pandas
+        cache_key = None
+        if isinstance(input_data, dict):
+            missing_features = set(USEFUL_FEATURES) - set(input_data)
+            if missing_features:
+                logger.warning(f"⚠️ Отсутствуют признаки: {missing_features}")
+
+            if self.cache is not None:
+                cache_key, values = self.cache.normalize(self.pipeline.input_features, input_data)
+                if cache_key is not None:
+                    cached = self.cache.get(cache_key)
+                    if self.metrics is not None:
+                        self.metrics.count('cache_hits' if cached is not None else 'cache_misses', 'predict_booking_value')
+                    if cached is not None:
+                        return np.array([cached])
+                    if self.cache.steps:
+                        # Прогноз считается по округленным значениям, как и ключ кэша
+                        input_data = {**input_data, **values}
+
+            if self._fast_path is not None:
+                prediction = self.predict_one(input_data)
+                if prediction is not None:
+                    if cache_key is not None:
+                        self.cache.put(cache_key, float(prediction[0]), self.model_hash)
+                    return prediction
+
+        metrics = self.metrics
+        if metrics is not None:
+            start_time = stage_time = time.perf_counter()
+
         try:
             # Создаем DataFrame из входных данных
             if isinstance(input_data, dict):
@@ -83,26 +210,236 @@ class TransportCostPredictor:
             # Проверяем наличие необходимых признаков
             missing_features = set(USEFUL_FEATURES) - set(df_input.columns)
             if missing_features:
-                print(f"⚠️ Отсутствуют признаки: {missing_features}")
+                logger.warning(f"⚠️ Отсутствуют признаки: {missing_features}")
                 # Добавляем недостающие признаки со значениями по умолчанию
                 for feature in missing_features:
                     df_input[feature] = 0.0
+            if metrics is not None:
+                stage_time = metrics.since('frame', stage_time)
 
-            # Берем только основные признаки и применяем feature engineering
-            X = df_input[USEFUL_FEATURES].copy()
-            X = create_features(X)  # Применяем те же преобразования что и при обучении
-
-            # Убеждаемся, что признаки совпадают с теми, на которых обучалась модель
-            X = X.reindex(columns=self.feature_names, fill_value=0)
+            # То же обученное преобразование, что и при обучении: матрица в порядке колонок модели
+            X = self.pipeline.transform(df_input[USEFUL_FEATURES])
+            if metrics is not None:
+                stage_time = metrics.since('transform', stage_time)
 
             # Предсказание
-            prediction = self.model_data['model'].predict(X)
+            prediction = self._predict_matrix(X)
+            if cache_key is not None:
+                self.cache.put(cache_key, float(prediction[0]), self.model_hash)
+
+            if metrics is not None:
+                metrics.since('model', stage_time)
+                metrics.since('predict_booking_value', start_time)
+                metrics.count('calls', 'predict_booking_value')
+                metrics.count('rows', 'predict_booking_value', len(X))
+                if missing_features:
+                    metrics.count('missing_feature_fills', 'predict_booking_value', len(missing_features) * len(X))
             return prediction
 
         except Exception as e:
-            print(f"❌ Ошибка при предсказании: {str(e)}")
+            logger.error(f"❌ Ошибка при предсказании: {str(e)}")
+            if metrics is not None:
+                metrics.count('errors', 'predict_booking_value')
             return None
     
+    def predict_inputs(self, X):
+        """Прогноз для матрицы исходных признаков (строки x pipeline.input_features) без пропусков"""
+        return self._predict_matrix(self.pipeline.transform(X))
+
+    def _complete_record(self, record):
+        """Поездка, в которой отсутствующие признаки заполнены 0.0, как в predict_booking_value
+
+        Без этого DataFrame.from_records превратил бы отсутствующий ключ в NaN,
+        и прогноз поездки зависел бы от того, с какими поездками она попала в пакет.
+        """
+        missing = [feature for feature in self.pipeline.input_features if record.get(feature) is None]
+        return {**record, **dict.fromkeys(missing, 0.0)} if missing else record
+
+    def predict_records(self, records):
+        """Прогнозы для списка поездок (dict): повторы берутся из кэша, остальные — одним пакетом"""
+        if self.model_data is None:
+            logger.warning("⚠️ Модель не загружена. Предсказание невозможно.")
+            return None
+        cache = self.cache
+        if cache is None:
+            return self.predict_frame(pd.DataFrame.from_records([self._complete_record(record) for record in records]),
+                                      verbose=False)
+
+        model_hash = self.model_hash
+        predictions = np.full(len(records), np.nan)
+        miss_rows = []
+        miss_keys = []
+        miss_records = []
+        for index, record in enumerate(records):
+            key, values = cache.normalize(self.pipeline.input_features, record)
+            cached = cache.get(key) if key is not None else None
+            if cached is not None:
+                predictions[index] = cached
+                continue
+            miss_rows.append(index)
+            miss_keys.append(key)
+            miss_records.append(self._complete_record({**record, **values} if key is not None and cache.steps
+                                                      else record))
+
+        if self.metrics is not None:
+            self.metrics.count('cache_hits', 'predict_records', len(records) - len(miss_rows))
+            self.metrics.count('cache_misses', 'predict_records', len(miss_rows))
+
+        if miss_records:
+            computed = self.predict_frame(pd.DataFrame.from_records(miss_records), verbose=False)
+            predictions[miss_rows] = computed
+            for key, value in zip(miss_keys, computed.tolist()):
+                if key is not None and value == value:
+                    cache.put(key, value, model_hash)
+        return predictions
+
+    def cache_stats(self):
+        """Статистика кэша прогнозов; None, если кэш выключен"""
+        return self.cache.stats() if self.cache is not None else None
+
+    def feature_importance(self):
+        """Таблица важности признаков: permutation importance из артефакта или feature_importances_ модели
+
+        Возвращает DataFrame (признак, важность, разброс) по убыванию важности
+        и название метода; (None, None), если важность недоступна.
+        """
+        if self.model_data is None:
+            return None, None
+        importance = self.model_data.get('permutation_importance')
+        if importance is not None:
+            table = pd.DataFrame({'feature': importance['features'],
+                                  'importance': np.asarray(importance['importances_mean']),
+                                  'std': np.asarray(importance['importances_std'])})
+            method = f"permutation importance (падение R², {importance['n_repeats']} перестановок)"
+        elif hasattr(self.model_data['model'], 'feature_importances_'):
+            # Старые артефакты без посчитанной таблицы
+            table = pd.DataFrame({'feature': self.feature_names,
+                                  'importance': self.model_data['model'].feature_importances_,
+                                  'std': np.nan})
+            method = "feature_importances_ модели"
+        else:
+            return None, None
+        return table.sort_values('importance', ascending=False, ignore_index=True), method
+
+    def predict_frame(self, df_input, verbose=True):
+        """Векторизованное предсказание для DataFrame: один вызов model.predict на весь кадр"""
+        if self.model_data is None:
+            logger.warning("⚠️ Модель не загружена. Предсказание невозможно.")
+            return None
+        metrics = self.metrics
+        if metrics is not None:
+            start_time = stage_time = time.perf_counter()
+
+        # Собираем основные признаки в матрицу float32; нечисловые значения превращаются в NaN
+        input_features = self.pipeline.input_features
+        missing_features = [feature for feature in input_features if feature not in df_input.columns]
+        if missing_features and verbose:
+            logger.warning(f"⚠️ Отсутствуют признаки: {set(missing_features)}")
+        X = np.zeros((len(df_input), len(input_features)), dtype=np.float32, order='F')
+        for index, feature in enumerate(input_features):
+            if feature in df_input.columns:
+                X[:, index] = pd.to_numeric(df_input[feature], errors='coerce')
+        if metrics is not None:
+            stage_time = metrics.since('input_matrix', stage_time)
+
+        # Строки с пропусками не прерывают пакет, а получают NaN
+        predictions = np.full(len(X), np.nan)
+        valid_rows = ~np.isnan(X).any(axis=1)
+        all_valid = valid_rows.all()
+        if not all_valid:
+            X = X[valid_rows]
+        if len(X):
+            X = self.pipeline.transform(X)
+            if metrics is not None:
+                stage_time = metrics.since('transform', stage_time)
+            if all_valid:
+                predictions[:] = self._predict_matrix(X)
+            else:
+                predictions[valid_rows] = self._predict_matrix(X)
+            if metrics is not None:
+                metrics.since('model', stage_time)
+
+        if metrics is not None:
+            metrics.since('predict_frame', start_time)
+            metrics.count('calls', 'predict_frame')
+            metrics.count('rows', 'predict_frame', len(predictions))
+            if missing_features:
+                metrics.count('missing_feature_fills', 'predict_frame', len(missing_features) * len(predictions))
+            if len(X) < len(predictions):
+                metrics.count('invalid_rows', 'predict_frame', len(predictions) - len(X))
+        return predictions
+
+    def predict_batch(self, csv_file, output_file=None, chunksize=BATCH_CHUNK_SIZE):
+        """Потоковое пакетное предсказание CSV файла частями фиксированного размера"""
+        if self.model_data is None:
+            logger.warning("⚠️ Модель не загружена. Предсказание невозможно.")
+            return None
+
+        if not os.path.exists(csv_file):
+            logger.error(f"🚨 Файл не найден: {csv_file}")
+            return None
+
+        if output_file is None:
+            root, ext = os.path.splitext(csv_file)
+            output_file = f"{root}{BATCH_OUTPUT_SUFFIX}{ext or '.csv'}"
+        if os.path.exists(output_file) and os.path.samefile(csv_file, output_file):
+            logger.error(f"🚨 Файл результатов совпадает с входным файлом: {output_file}")
+            return None
+
+        print(f"📦 Размер пакета: {chunksize} строк")
+        print(f"💾 Результаты записываются в: {output_file}")
+
+        total_rows = 0
+        failed_rows = 0
+        start_time = time.perf_counter()
+        # Результаты пишутся во временный файл и заменяют output_file только после успешной обработки
+        tmp_path = f"{output_file}.tmp"
+
+        try:
+            # Читаем и пишем по частям, чтобы память не росла с размером файла
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as output:
+                for chunk_index, chunk in enumerate(pd.read_csv(csv_file, chunksize=chunksize)):
+                    predictions = self.predict_frame(chunk, verbose=chunk_index == 0)
+                    chunk[PREDICTION_COLUMN] = predictions
+                    chunk.to_csv(output, header=total_rows == 0, index=False)
+
+                    total_rows += len(chunk)
+                    failed_rows += int(np.isnan(predictions).sum())
+                    elapsed = time.perf_counter() - start_time
+                    logger.info(f"   ⚙️  Пакет {chunk_index + 1}: обработано {total_rows} строк "
+                                f"({total_rows / max(elapsed, 1e-9):,.0f} строк/с)")
+                if total_rows == 0:
+                    # Во входном файле только заголовок: результат — заголовок с колонкой прогноза
+                    columns = list(pd.read_csv(csv_file, nrows=0).columns) + [PREDICTION_COLUMN]
+                    pd.DataFrame(columns=columns).to_csv(output, index=False)
+            os.replace(tmp_path, output_file)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при пакетной обработке: {str(e)}")
+            if self.metrics is not None:
+                self.metrics.count('errors', 'predict_batch')
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        elapsed = time.perf_counter() - start_time
+        throughput = total_rows / elapsed if elapsed > 0 else float('inf')
+
+        print("\n" + "📊" + "="*60 + "📊")
+        print(f"✅ Обработано строк: {total_rows}")
+        print(f"⚠️ Строк без прогноза (пропуски во входных данных): {failed_rows}")
+        print(f"⏱️  Время обработки: {elapsed:.2f} с")
+        print(f"🚀 Пропускная способность: {throughput:,.0f} строк/с")
+        print("📊" + "="*60 + "📊")
+
+        return {
+            'rows': total_rows,
+            'failed_rows': failed_rows,
+            'seconds': elapsed,
+            'rows_per_sec': throughput,
+            'output_file': output_file
+        }
+
     def predict_interactive(self):
         """Интерактивный ввод данных для предсказания"""
         if self.model_data is None:
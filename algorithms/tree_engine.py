@@ -0,0 +1,191 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Добавляем путь для импорта модулей при запуске как скрипта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Размер блока строк: матрица индексов узлов (строки x деревья) помещается в кэш
+ENGINE_BLOCK_ROWS = 2048
+
+def _tree_estimators(model):
+    """Деревья ансамбля, масштаб и базовое значение прогноза; None если не поддерживается"""
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is None:
+        return None
+
+    # Градиентный бустинг: init + learning_rate * сумма деревьев
+    if hasattr(model, 'learning_rate') and hasattr(model, 'init_'):
+        if np.ndim(estimators) != 2 or np.shape(estimators)[1] != 1:
+            return None
+        if isinstance(model.init_, str):
+            base = 0.0  # init='zero'
+        elif hasattr(model.init_, 'constant_'):
+            base = float(np.ravel(model.init_.constant_)[0])
+        else:
+            return None
+        return list(np.ravel(estimators)), float(model.learning_rate), base
+
+    # Случайный лес и подобные: среднее по деревьям
+    if all(hasattr(estimator, 'tree_') for estimator in estimators):
+        return list(estimators), 1.0 / len(estimators), 0.0
+
+    return None
+
+def compile_tree_ensemble(model):
+    """Преобразование обученного ансамбля деревьев в плоские массивы numpy
+
+    Все деревья склеиваются в один массив узлов. Листья ссылаются сами на себя
+    (порог +inf, переход влево на себя), поэтому обход выполняется фиксированное
+    число уровней без проверок «дошли ли до листа».
+    Возвращает dict массивов или None, если модель не является ансамблем деревьев.
+    """
+    parts = _tree_estimators(model)
+    if parts is None:
+        return None
+    estimators, scale, base = parts
+
+    n_nodes = [estimator.tree_.node_count for estimator in estimators]
+    if any(estimator.tree_.n_outputs != 1 for estimator in estimators):
+        return None
+
+    total = int(sum(n_nodes))
+    feature = np.empty(total, dtype=np.int32)
+    threshold = np.empty(total, dtype=np.float64)
+    # Потомки узла i: children[2*i] — левый (x <= порог), children[2*i + 1] — правый
+    children = np.empty((total, 2), dtype=np.int32)
+    value = np.empty(total, dtype=np.float64)
+    roots = np.empty(len(estimators), dtype=np.int32)
+
+    offset = 0
+    max_depth = 0
+    for tree_index, estimator in enumerate(estimators):
+        tree = estimator.tree_
+        count = tree.node_count
+        nodes = slice(offset, offset + count)
+        is_leaf = tree.children_left == -1
+        own_index = np.arange(offset, offset + count, dtype=np.int32)
+
+        feature[nodes] = np.where(is_leaf, 0, tree.feature)
+        threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+        children[nodes, 0] = np.where(is_leaf, own_index, tree.children_left + offset)
+        children[nodes, 1] = np.where(is_leaf, own_index, tree.children_right + offset)
+        value[nodes] = tree.value[:, 0, 0]
+        roots[tree_index] = offset
+
+        max_depth = max(max_depth, int(tree.max_depth))
+        offset += count
+
+    return {
+        'feature': feature,
+        'threshold': threshold,
+        'children': children.ravel(),
+        'value': value,
+        'roots': roots,
+        'max_depth': max_depth,
+        'scale': scale,
+        'base': base,
+        'n_features': int(model.n_features_in_)
+    }
+
+def predict_compiled(engine, X, block_rows=ENGINE_BLOCK_ROWS):
+    """Векторизованный обход всех деревьев по уровням для пакета строк"""
+    # Деревья sklearn сравнивают float32 признаки с порогами float64 — повторяем это
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    n_rows, n_features = X.shape
+    if n_features != engine['n_features']:
+        raise ValueError(f"Ожидается {engine['n_features']} признаков, получено {n_features}")
+
+    feature = engine['feature']
+    threshold = engine['threshold']
+    children = engine['children']
+    roots = engine['roots'].astype(np.int64)
+    n_trees = len(roots)
+    predictions = np.empty(n_rows)
+
+    for start in range(0, n_rows, block_rows):
+        block = X[start:start + block_rows]
+        n_block = len(block)
+        flat_block = block.ravel()
+        # Смещение начала строки в плоском массиве признаков для каждой пары (строка, дерево)
+        row_offsets = np.repeat(np.arange(n_block, dtype=np.int64) * n_features, n_trees)
+        nodes = np.tile(roots, n_block)
+
+        for _ in range(engine['max_depth']):
+            go_right = flat_block.take(row_offsets + feature.take(nodes)) > threshold.take(nodes)
+            nodes = children.take(2 * nodes + go_right)
+
+        leaf_values = engine['value'].take(nodes).reshape(n_block, n_trees)
+        predictions[start:start + n_block] = engine['base'] + engine['scale'] * leaf_values.sum(axis=1)
+
+    return predictions
+
+def benchmark_engine(model, engine, X, batch_sizes=(1, 10, 100, 1000, 10000), repeats=5):
+    """Сравнение задержки и пропускной способности sklearn и скомпилированного движка"""
+    import warnings
+
+    X = np.asarray(X)
+    results = []
+    print("\n" + "⚡" + "="*60 + "⚡")
+    print("           СРАВНЕНИЕ SKLEARN И СКОМПИЛИРОВАННОГО ДВИЖКА")
+    print("⚡" + "="*60 + "⚡")
+    print(f"{'Строк':>8} {'sklearn, мс':>14} {'движок, мс':>12} {'ускорение':>10} {'строк/с':>14} {'макс. откл.':>12}")
+
+    for batch_size in batch_sizes:
+        batch = X[np.arange(batch_size) % len(X)]
+        timings = {}
+        outputs = {}
+        for name, predict in (('sklearn', model.predict), ('engine', lambda rows: predict_compiled(engine, rows))):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                outputs[name] = predict(batch)
+                best = float('inf')
+                for _ in range(repeats):
+                    start_time = time.perf_counter()
+                    predict(batch)
+                    best = min(best, time.perf_counter() - start_time)
+            timings[name] = best
+
+        max_diff = float(np.max(np.abs(outputs['sklearn'] - outputs['engine'])))
+        speedup = timings['sklearn'] / timings['engine']
+        throughput = batch_size / timings['engine']
+        print(f"{batch_size:>8} {timings['sklearn'] * 1000:>14.3f} {timings['engine'] * 1000:>12.3f} "
+              f"{speedup:>9.1f}x {throughput:>14,.0f} {max_diff:>12.2e}")
+        results.append({
+            'rows': batch_size,
+            'sklearn_seconds': timings['sklearn'],
+            'engine_seconds': timings['engine'],
+            'speedup': speedup,
+            'max_abs_diff': max_diff
+        })
+
+    return results
+
+def export_compiled_model(model_path, benchmark=True):
+    """Добавление скомпилированного движка в существующий артефакт модели"""
+    from algorithms.model_store import load_model_artifact, save_model_artifact
+
+    model_data = dict(load_model_artifact(model_path, mmap_mode=None, use_registry=False))
+    engine = compile_tree_ensemble(model_data['model'])
+    if engine is None:
+        print(f"ℹ️ Модель {model_data.get('model_name', 'Unknown')} не является ансамблем деревьев — компиляция не требуется")
+        return None
+
+    model_data['compiled_trees'] = engine
+    save_model_artifact(model_data, model_path)
+    print(f"✅ Скомпилировано деревьев: {len(engine['roots'])}, узлов: {len(engine['value'])}, "
+          f"глубина: {engine['max_depth']}")
+    print(f"💾 Артефакт обновлен: {model_path}")
+
+    if benchmark:
+        rng = np.random.default_rng(0)
+        X = rng.uniform(0, 50, size=(10000, engine['n_features']))
+        benchmark_engine(model_data['model'], engine, X)
+
+    return engine
+
+if __name__ == "__main__":
+    from algorithms.transport_predictor import MODEL_PATH
+    export_compiled_model(sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH)
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Добавляем путь для импорта модулей при запуске как скрипта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from configuration.settings import WHAT_IF_RANGES, WHAT_IF_POINTS, WHAT_IF_PAIR_POINTS
+
+def sweep_values(feature, points=WHAT_IF_POINTS, ranges=WHAT_IF_RANGES):
+    """Равномерные значения признака для развертки в диапазоне интерфейса"""
+    low, high = ranges[feature]
+    return np.linspace(low, high, points)
+
+def build_what_if_matrix(features, base, scenarios=None, sweeps=None):
+    """Матрица входных признаков для всех сценариев и всех точек разверток
+
+    scenarios — {название: параметры поездки}, недостающие признаки берутся из base.
+    sweeps — список разверток {признак: значения} по одному или двум признакам,
+    остальные признаки равны base. Возвращает (X, layout): layout описывает,
+    какие строки матрицы относятся к каждому блоку.
+    """
+    index = {feature: column for column, feature in enumerate(features)}
+    base_row = np.array([float(base.get(feature, 0.0)) for feature in features], dtype=np.float32)
+    blocks = []
+    layout = []
+
+    if scenarios:
+        rows = np.tile(base_row, (len(scenarios), 1))
+        for row, ride in zip(rows, scenarios.values()):
+            for feature, value in ride.items():
+                if feature in index:
+                    row[index[feature]] = value
+        blocks.append(rows)
+        layout.append(('scenarios', list(scenarios), (len(scenarios),)))
+
+    for sweep in sweeps or []:
+        names = list(sweep)
+        grids = np.meshgrid(*[np.asarray(sweep[name], dtype=np.float32) for name in names], indexing='ij')
+        rows = np.tile(base_row, (grids[0].size, 1))
+        for name, grid in zip(names, grids):
+            rows[:, index[name]] = grid.ravel()
+        blocks.append(rows)
+        layout.append(('sweep', names, grids[0].shape))
+
+    if not blocks:
+        return np.empty((0, len(features)), dtype=np.float32, order='F'), layout
+    return np.asfortranarray(np.concatenate(blocks)), layout
+
+def evaluate_what_if(predictor, base, scenarios=None, sweeps=None):
+    """Сценарии и развертки «что если» одним векторизованным вызовом модели
+
+    Возвращает {'scenarios': {название: цена}, 'sweeps': [{'features', 'values',
+    'prices'}], 'rows', 'seconds'}; prices развертки по двум признакам — матрица
+    (значения первого x значения второго).
+    """
+    start_time = time.perf_counter()
+    features = predictor.pipeline.input_features
+    X, layout = build_what_if_matrix(features, base, scenarios, sweeps)
+    prices = predictor.predict_inputs(X) if len(X) else np.empty(0)
+
+    result = {'scenarios': {}, 'sweeps': [], 'rows': len(X)}
+    offset = 0
+    sweeps = iter(sweeps or [])
+    for kind, names, shape in layout:
+        size = int(np.prod(shape))
+        block = np.asarray(prices[offset:offset + size]).reshape(shape)
+        offset += size
+        if kind == 'scenarios':
+            result['scenarios'] = dict(zip(names, block.tolist()))
+        else:
+            sweep = next(sweeps)
+            result['sweeps'].append({
+                'features': names,
+                'values': [np.asarray(sweep[name]) for name in names],
+                'prices': block
+            })
+
+    result['seconds'] = time.perf_counter() - start_time
+    return result
+
+def sensitivity_sweeps(features, pair=None, points=WHAT_IF_POINTS, pair_points=WHAT_IF_PAIR_POINTS):
+    """Развертки по каждому признаку и (если задана) совместная развертка пары признаков"""
+    sweeps = [{feature: sweep_values(feature, points)} for feature in features if feature in WHAT_IF_RANGES]
+    if pair is not None:
+        first, second = pair
+        sweeps.append({first: sweep_values(first, pair_points), second: sweep_values(second, pair_points)})
+    return sweeps
+
+if __name__ == "__main__":
+    from algorithms.transport_predictor import TransportCostPredictor
+
+    predictor = TransportCostPredictor(cache_size=0)
+    if predictor.model_data is not None:
+        base = {'Avg VTAT': 10, 'Avg CTAT': 30, 'Ride Distance': 25, 'Driver Ratings': 4.5, 'Customer Rating': 4.7}
+        result = evaluate_what_if(predictor, base,
+                                  sweeps=sensitivity_sweeps(predictor.pipeline.input_features,
+                                                            pair=('Ride Distance', 'Driver Ratings')))
+        print(f"⚡ {result['rows']} точек «что если» за {result['seconds'] * 1000:.1f} мс")
+        for sweep in result['sweeps']:
+            prices = sweep['prices']
+            print(f"   📈 {' x '.join(sweep['features'])}: {prices.min():.2f} .. {prices.max():.2f}")
@@ -3,11 +3,100 @@
 # Пути к данным
 DATA_PATH = "transport_data.csv"
 MODEL_PATH = "algorithms/transport_model.joblib"
+MODEL_MMAP_MODE = "r"  # массивы модели читаются через page cache, общий для процессов
+LOAD_CHUNK_SIZE = 500000  # строк CSV на одну часть при потоковой загрузке
+DATASET_CACHE_DIR = ".cache/datasets"  # предобработанные выборки в формате NPY
+STAGE_CACHE_DIR = ".cache/stages"      # результаты этапов обучения (модели, прогнозы, сохранение)
+STAGE_CACHE_MAX_ENTRIES = 5            # последних результатов каждого этапа в кэше
+
+# Скомпилированный движок деревьев (RandomForest / GradientBoosting)
+COMPILE_TREE_MODELS = True   # сохранять плоские массивы деревьев в артефакт модели
+TREE_ENGINE_MAX_ROWS = 256   # пакеты больше этого размера выгоднее считать в sklearn
+
+# Параметры пакетного предсказания
+BATCH_CHUNK_SIZE = 50000  # строк CSV на один вызов model.predict
+BATCH_OUTPUT_SUFFIX = "_predictions"
+PREDICTION_COLUMN = "Predicted_Cost"
+
+# Кэш прогнозов одиночных поездок
+PREDICTION_CACHE_SIZE = 10000     # записей; 0 — кэш выключен
+PREDICTION_CACHE_TTL = 3600.0     # время жизни записи, секунды; None — без ограничения
+# Шаги слайдеров веб-интерфейса: значения округляются до шага перед прогнозом и поиском в кэше
+PREDICTION_CACHE_STEPS = {
+    'Ride Distance': 0.5,
+    'Avg VTAT': 0.5,
+    'Avg CTAT': 1.0,
+    'Driver Ratings': 0.1,
+    'Customer Rating': 0.1
+}
+
+# Решетка цен калькулятора (python main.py lattice)
+PRICE_LATTICE_DIR = ".cache/lattice"
+# Признак -> (начало, конец, шаг) оси или список отрезков с разным шагом.
+# Диапазоны слайдеров калькулятора; границы корзин признаков попадают в узлы.
+# Шаги осей кратны шагам слайдеров, поэтому каждый узел — достижимое значение слайдера.
+# На коротких поездках time_per_distance меняется быстрее всего — там шаг мельче.
+# Около 3 млн узлов (11.6 МБ float32): строится за секунды при обучении или в фоне
+PRICE_LATTICE_AXES = {
+    'Ride Distance': [(1.0, 10.0, 0.5), (10.0, 50.0, 2.5), (50.0, 150.0, 5.0)],
+    'Driver Ratings': (1.0, 5.0, 0.5),
+    'Customer Rating': (1.0, 5.0, 0.5),
+    'Avg VTAT': (0.0, 45.0, 2.5),
+    'Avg CTAT': (5.0, 180.0, 5.0)
+}
+# Допустимая максимальная ошибка интерполяции относительно модели (в единицах цены):
+# если проверка при построении показала больше, из решетки берутся только точные узлы
+PRICE_LATTICE_MAX_ERROR = 1.0
+PRICE_LATTICE_BATCH_ROWS = 262144    # узлов на один вызов модели при построении
+PRICE_LATTICE_CHECK_POINTS = 20000   # случайных точек для оценки ошибки интерполяции
+
+# Анализ «что если»: диапазоны разверток признаков на странице анализа
+WHAT_IF_RANGES = {
+    'Ride Distance': (1.0, 150.0),
+    'Driver Ratings': (1.0, 5.0),
+    'Customer Rating': (1.0, 5.0),
+    'Avg VTAT': (0.0, 45.0),
+    'Avg CTAT': (5.0, 180.0)
+}
+WHAT_IF_POINTS = 60        # точек в развертке одного признака
+WHAT_IF_PAIR_POINTS = 40   # точек по каждой оси тепловой карты пары признаков
+
+# Параметры HTTP сервиса предсказаний
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8080
+MICROBATCH_WINDOW_MS = 2.0  # сколько ждать попутные запросы перед вызовом модели
+MICROBATCH_MAX_ROWS = 256   # максимальный размер микропакета
+MAX_REQUEST_BYTES = 10 * 1024 * 1024
+
+# Логирование и метрики предсказаний
+LOGGER_NAME = "city_transport"       # без -v сообщения модулей не выводятся
+METRICS_PREFIX = "transport_predictor"
+METRICS_ENABLED = False              # замеры этапов в HTTP сервисе (python main.py serve --metrics)
+# Верхние границы корзин гистограмм длительности, секунды
+LATENCY_BUCKETS = [0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+                   0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+# Синтетические данные (python main.py generate)
+SYNTHETIC_ROWS = 100000          # строк по умолчанию
+SYNTHETIC_CHUNK_ROWS = 250000    # строк в одной части: ограничивает пиковую память генерации
+
+# Параметры бенчмарка (python main.py bench)
+BENCH_ROWS = 20000                   # строк синтетических данных для загрузки и обучения
+BENCH_REPEATS = 5                    # повторов для каждого замера
+BENCH_TRAIN_REPEATS = 2              # повторов обучения: лес и бустинг обучаются долго
+BENCH_PREDICT_SIZES = [1, 100, 10000, 1000000]
+BENCH_REGRESSION_THRESHOLD = 10.0    # допустимое замедление медианы относительно базы, %
 
 # Параметры модели
 TEST_SIZE = 0.2
 RANDOM_STATE = 42
 
+# Обучение на данных больше памяти (python main.py train --out-of-core)
+OUT_OF_CORE_MEMORY_MB = 2048     # память под выборки train/test и обучение моделей на них
+OUT_OF_CORE_OVERHEAD = 4         # во сколько раз обучение превышает размер выборки (буфер отбора, копии sklearn)
+QUANTILE_SKETCH_SIZE = 2000      # центроидов эскиза медианы на признак: ошибка ранга ~1/2000
+SPLIT_ID_COLUMN = 'Booking ID'   # ключ строки для хэш-разбиения train/test
+
 # Параметры Random Forest
 RF_PARAMS = {
     'n_estimators': 200,
@@ -25,6 +114,65 @@ GB_PARAMS = {
     'random_state': RANDOM_STATE
 }
 
+# Параметры Histogram Gradient Boosting: многопоточный, признаки разбиваются на корзины.
+# Число итераций выбирается ранней остановкой на validation_fraction обучающей выборки
+HGB_PARAMS = {
+    'max_iter': 500,
+    'learning_rate': 0.1,
+    'max_leaf_nodes': 63,
+    'min_samples_leaf': 20,
+    'max_bins': 255,
+    'early_stopping': True,
+    'validation_fraction': 0.1,
+    'n_iter_no_change': 20,
+    'random_state': RANDOM_STATE
+}
+HGB_NATIVE_MISSING = True   # обучать на пропусках как есть, без заполнения медианой
+
+# Подбор гиперпараметров (python main.py tune): successive halving в пуле процессов
+TUNED_PARAMS_PATH = "configuration/tuned_params.json"  # найденные параметры, переопределяют RF_PARAMS/GB_PARAMS/HGB_PARAMS
+# Пространства поиска: параметр -> список значений
+TUNE_SPACES = {
+    'random_forest': {
+        'n_estimators': [100, 200, 300, 500],
+        'max_depth': [8, 12, 15, 20, None],
+        'min_samples_split': [2, 5, 10, 20],
+        'min_samples_leaf': [1, 2, 4, 8],
+        'max_features': [1.0, 0.7, 0.5, 'sqrt']
+    },
+    'gradient_boosting': {
+        'n_estimators': [100, 150, 300, 500],
+        'max_depth': [3, 5, 7, 10],
+        'learning_rate': [0.02, 0.05, 0.1, 0.2],
+        'subsample': [0.6, 0.8, 1.0],
+        'min_samples_leaf': [1, 5, 20]
+    },
+    'hist_gradient_boosting': {
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_leaf_nodes': [15, 31, 63, 127],
+        'min_samples_leaf': [10, 20, 50, 100],
+        'l2_regularization': [0.0, 0.1, 1.0],
+        'max_bins': [63, 127, 255]
+    }
+}
+TUNE_CANDIDATES = 27          # кандидатов на модель в первом раунде (включая текущие настройки)
+TUNE_HALVING_FACTOR = 3       # в каждый следующий раунд проходит 1/3 кандидатов, данных — в 3 раза больше
+TUNE_MIN_ROWS = 2000          # минимальный размер подвыборки первого раунда
+TUNE_VALIDATION_SIZE = 0.2    # доля обучающей выборки для оценки кандидатов (тест не используется)
+TUNE_TIME_BUDGET = 3600.0     # ограничение времени на весь подбор, секунды
+
+# Дообучение на новых поездках (python main.py update)
+INCREMENTAL_TREES = 20           # деревьев леса / стадий бустинга, обучаемых на новых строках
+INCREMENTAL_MAX_TREES = 400      # сверх этого числа самые старые деревья леса удаляются
+INCREMENTAL_MIN_ROWS = 100       # меньше новых строк — модель не обновляется
+INCREMENTAL_HOLDOUT_SIZE = 0.2   # доля новых строк для проверки качества (не участвует в дообучении)
+INCREMENTAL_MAX_R2_DROP = 0.02   # допустимое падение R² на новых строках относительно Test R² полного обучения;
+                                 # больше — полное переобучение
+
+# Permutation importance лучшей модели на тестовой выборке (сохраняется в артефакт)
+PERMUTATION_REPEATS = 5         # перестановок каждого признака; 0 — не считать
+PERMUTATION_MAX_ROWS = 20000    # строк тестовой выборки для оценки
+
 # Целевая переменная
 TARGET_COLUMN = 'Booking Value'
 
@@ -52,3 +200,4 @@ CATEGORICAL_FEATURES = [
 # Параметры визуализации
 PLOT_STYLE = "seaborn-v0_8"
 FIGURE_SIZE = (12, 6)
+REPORT_DIR = "reports"  # PNG/HTML отчеты обучения в режиме без GUI
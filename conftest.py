@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pytest
+
+from configuration.settings import RANDOM_STATE
+from datasets.data_fetcher import USEFUL_FEATURES, TARGET_COLUMN
+
+# Строк синтетических данных в общих фикстурах: модели обучаются за доли секунды
+TEST_ROWS = 3000
+
+def make_training_data(n_rows=TEST_ROWS, seed=RANDOM_STATE):
+    """Небольшая синтетическая выборка: (поездки, матрица признаков, целевая переменная, преобразование)"""
+    from datasets.feature_pipeline import FeatureTransformer
+    from datasets.synthetic_data import generate_dataset
+
+    rides = generate_dataset(n_rows, seed=seed)
+    rides = rides[rides[TARGET_COLUMN].notna()].reset_index(drop=True)
+    pipeline = FeatureTransformer(USEFUL_FEATURES).fit(rides[USEFUL_FEATURES])
+    X_raw = rides[USEFUL_FEATURES].to_numpy(dtype=np.float32, copy=True)
+    pipeline.impute(X_raw)
+    return rides, pipeline.transform(X_raw), rides[TARGET_COLUMN].to_numpy(dtype=np.float64), pipeline
+
+def save_test_model(directory, model_name, model, pipeline, X, y):
+    """Обучение модели и сохранение артефакта; возвращает путь к файлу"""
+    from algorithms.model_store import save_model_artifact
+    from algorithms.tree_engine import compile_tree_ensemble
+
+    model.fit(X, y)
+    model_data = {
+        'model': model,
+        'feature_names': pipeline.feature_names,
+        'feature_pipeline': pipeline,
+        'model_name': model_name,
+        'metrics': {'Test R2': 0.8, 'Test MAE': 50.0}
+    }
+    engine = compile_tree_ensemble(model)
+    if engine is not None:
+        model_data['compiled_trees'] = engine
+    path = os.path.join(directory, f"{model_name}.joblib")
+    save_model_artifact(model_data, path)
+    return path
+
+@pytest.fixture(scope='session')
+def training_data():
+    """(поездки, матрица признаков, целевая переменная, преобразование) — общие для всех тестов"""
+    return make_training_data()
+
+@pytest.fixture(scope='session')
+def rides(training_data):
+    return training_data[0]
+
+@pytest.fixture(scope='session')
+def models_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('models'))
+
+@pytest.fixture(scope='session')
+def linear_model_path(training_data, models_dir):
+    from sklearn.linear_model import LinearRegression
+    _, X, y, pipeline = training_data
+    return save_test_model(models_dir, 'linear_regression', LinearRegression(), pipeline, X, y)
+
+@pytest.fixture(scope='session')
+def forest(training_data):
+    from sklearn.ensemble import RandomForestRegressor
+    _, X, y, _ = training_data
+    return RandomForestRegressor(n_estimators=5, max_depth=8, random_state=RANDOM_STATE).fit(X, y)
+
+@pytest.fixture(scope='session')
+def forest_model_path(training_data, models_dir, forest):
+    _, X, y, pipeline = training_data
+    return save_test_model(models_dir, 'random_forest', forest, pipeline, X, y)
+
+@pytest.fixture(params=['linear_regression', 'random_forest'])
+def model_path(request, linear_model_path, forest_model_path):
+    """Путь к артефакту каждой из тестовых моделей (тест выполняется для обеих)"""
+    return linear_model_path if request.param == 'linear_regression' else forest_model_path
+
+@pytest.fixture(scope='session')
+def training_csv(tmp_path_factory):
+    """Файл синтетических поездок для тестов обучения"""
+    from datasets.synthetic_data import generate_dataset
+    path = tmp_path_factory.mktemp('data') / 'transport_data.csv'
+    generate_dataset(TEST_ROWS).to_csv(path, index=False)
+    return str(path)
+
+@pytest.fixture
+def small_model_params(monkeypatch):
+    """Небольшие ансамбли вместо настроек: обучение всех моделей за секунды"""
+    from algorithms import train_model
+    monkeypatch.setattr(train_model, 'RF_PARAMS', {'n_estimators': 10, 'max_depth': 8, 'random_state': RANDOM_STATE})
+    monkeypatch.setattr(train_model, 'GB_PARAMS', {'n_estimators': 20, 'max_depth': 3, 'random_state': RANDOM_STATE})
+    monkeypatch.setattr(train_model, 'HGB_PARAMS', {'max_iter': 30, 'early_stopping': False,
+                                                     'random_state': RANDOM_STATE})
+
+@pytest.fixture
+def prepared_trainer(training_csv, small_model_params):
+    """Фабрика тренеров с подготовленными данными из training_csv (без графиков и кэша этапов)"""
+    from algorithms.train_model import TransportModelTrainer
+
+    def make(**kwargs):
+        kwargs.setdefault('plots', 'none')
+        kwargs.setdefault('use_cache', False)
+        trainer = TransportModelTrainer(data_path=training_csv, **kwargs)
+        trainer.prepare_data()
+        return trainer
+    return make
@@ -1,24 +1,177 @@
 import pandas as pd
 import numpy as np
+import hashlib
+import io
 import os
+import sys
+
+# Добавляем путь для импорта модулей при запуске как скрипта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from datasets.feature_pipeline import (DISTANCE_BINS, DISTANCE_LABELS, RATING_BINS, RATING_LABELS,
+                                       CATEGORY_BUCKETS, FeatureTransformer, bucket_codes)
 
 # Конфигурация системы
 DATA_PATH = "transport_data.csv"
 TARGET_COLUMN = 'Booking Value'
 KEY_FEATURES = ['Ride Distance', 'Driver Ratings', 'Customer Rating', 'Avg VTAT', 'Avg CTAT']
 USEFUL_FEATURES = KEY_FEATURES
+CATEGORICAL_COLUMNS = ['Booking Status', 'Vehicle Type', 'Pickup Location', 'Drop Location', 'Payment Method']
+TRAINING_COLUMNS = USEFUL_FEATURES + [TARGET_COLUMN]
+WATERMARK_TAIL_BYTES = 65536  # хвост прочитанной части файла, по которому проверяется, что файл только дописан
+
+def column_dtypes(columns):
+    """Компактные типы колонок: category для категорий, float32 для признаков.
+
+    Целевая переменная читается как float64, чтобы не терять точность метрик.
+    """
+    dtypes = {}
+    for column in columns:
+        if column in CATEGORICAL_COLUMNS:
+            dtypes[column] = 'category'
+        elif column == TARGET_COLUMN:
+            dtypes[column] = 'float64'
+        else:
+            dtypes[column] = 'float32'
+    return dtypes
 
-def load_data():
-    """Загрузка и валидация исходных данных"""
+def load_data(path=None, columns=None, chunksize=None):
+    """Загрузка и валидация исходных данных
+
+    columns — читать только указанные колонки с компактными типами,
+    chunksize — вернуть итератор по частям вместо всего файла.
+    """
+    path = path or DATA_PATH
     print("📁 Загрузка данных о поездках...")
     
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"🚨 Файл данных не обнаружен: {DATA_PATH}")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"🚨 Файл данных не обнаружен: {path}")
+
+    read_kwargs = {}
+    if columns is not None:
+        read_kwargs['usecols'] = columns
+        read_kwargs['dtype'] = column_dtypes(columns)
+
+    if chunksize is not None:
+        return pd.read_csv(path, chunksize=chunksize, **read_kwargs)
     
-    df = pd.read_csv(DATA_PATH)
+    df = pd.read_csv(path, **read_kwargs)
     print(f"✅ Данные успешно загружены: {len(df)} записей")
     return df
 
+def load_training_data(path=None, chunksize=None, pipeline=None, return_missing=False):
+    """Потоковая загрузка только нужных для обучения колонок с предобработкой
+
+    Читает USEFUL_FEATURES и целевую переменную как float32/float64, отбрасывает
+    строки без целевой переменной по мере чтения частей и заполняет пропуски
+    медианой. Результат совпадает с preprocess_data(load_data()), но пиковая
+    память в разы меньше: объектные колонки и лишние поля не загружаются.
+    pipeline — FeatureTransformer, который запоминает медианы для предсказаний.
+    return_missing — третьим значением вернуть маску заполненных пропусков
+    (строки x USEFUL_FEATURES) для моделей, которые обрабатывают пропуски сами.
+    """
+    chunks = load_data(path, columns=TRAINING_COLUMNS, chunksize=chunksize)
+    if chunksize is None:
+        chunks = [chunks]
+
+    print("\n🔧 Потоковая предобработка...")
+
+    # Фильтрация выполняется по частям, в памяти остаются только компактные массивы
+    X_parts = []
+    y_parts = []
+    initial_count = 0
+    for chunk in chunks:
+        initial_count += len(chunk)
+        chunk = chunk[chunk[TARGET_COLUMN].notna()]
+        X_parts.append(chunk[USEFUL_FEATURES].to_numpy(dtype=np.float32))
+        y_parts.append(chunk[TARGET_COLUMN].to_numpy(dtype=np.float64))
+
+    X_values = np.concatenate(X_parts) if X_parts else np.empty((0, len(USEFUL_FEATURES)), dtype=np.float32)
+    y_values = np.concatenate(y_parts) if y_parts else np.empty(0)
+    del X_parts, y_parts
+    cleaned_count = len(y_values)
+
+    print(f"✅ Данные успешно загружены: {initial_count} записей")
+    if initial_count > cleaned_count:
+        print(f"🧹 Удалено некорректных записей: {initial_count - cleaned_count}")
+    print(f"📊 После очистки: {cleaned_count} валидных записей")
+
+    # Заполнение пропусков медианой на месте, без копий
+    print("🎯 Заполнение пропущенных данных...")
+    if pipeline is None:
+        pipeline = FeatureTransformer(USEFUL_FEATURES)
+    missing = np.isnan(X_values) if return_missing else None
+    filled = pipeline.fit(X_values).impute(X_values)
+    for column, missing_count in filled.items():
+        print(f"   📈 {column}: заполнено {missing_count} пропусков (медиана)")
+
+    X = pd.DataFrame(X_values, columns=USEFUL_FEATURES, copy=False)
+    y = pd.Series(y_values, name=TARGET_COLUMN, copy=False)
+
+    print(f"\n📋 Используемые признаки ({len(X.columns)}):")
+    for feature in X.columns:
+        print(f"   • {feature}")
+
+    print(f"💰 Диапазон стоимости поездок: ${y.min():.0f} - ${y.max():.0f}")
+    print(f"📊 Средняя стоимость: ${y.mean():.2f}")
+    print(f"💾 Объем признаков в памяти: {X_values.nbytes / 1024**2:.1f} МБ")
+
+    if return_missing:
+        return X, y, missing
+    return X, y
+
+def data_watermark(path=None, size=None, tail_bytes=WATERMARK_TAIL_BYTES):
+    """Отметка прочитанных данных: размер прочитанной части файла и хэш ее последних tail_bytes байт"""
+    path = path or DATA_PATH
+    size = os.path.getsize(path) if size is None else size
+    with open(path, 'rb') as source_file:
+        source_file.seek(max(0, size - tail_bytes))
+        tail = source_file.read(size - source_file.tell())
+    return {'path': os.path.abspath(path), 'bytes': size, 'tail_bytes': len(tail),
+            'tail_sha1': hashlib.sha1(tail).hexdigest()}
+
+def load_appended_training_data(path, watermark, chunksize=None):
+    """Строки, дописанные в CSV после отметки data_watermark
+
+    Возвращает исходные признаки float32 (пропуски не заполнены — это делает
+    обученное преобразование), целевую переменную без пропусков и новую
+    отметку. Читаются только полные строки, записанные к началу вызова:
+    строка, которую в этот момент дописывают, войдет в следующее обновление.
+    ValueError, если файл не только дописан, а изменен: стал короче или
+    изменился хвост прочитанной ранее части.
+    """
+    path = path or DATA_PATH
+    size = os.path.getsize(path)
+    if size < watermark['bytes']:
+        raise ValueError(f"Файл данных стал короче отметки обучения: {size} < {watermark['bytes']} байт")
+
+    with open(path, 'rb') as source_file:
+        source_file.seek(watermark['bytes'] - watermark['tail_bytes'])
+        if hashlib.sha1(source_file.read(watermark['tail_bytes'])).hexdigest() != watermark['tail_sha1']:
+            raise ValueError("Прочитанная при обучении часть файла данных изменилась")
+        # Новые строки — обычно данные за день, поэтому читаются в память целиком
+        appended = source_file.read(size - watermark['bytes'])
+
+    appended = appended[:appended.rfind(b'\n') + 1]
+    new_watermark = data_watermark(path, watermark['bytes'] + len(appended))
+    if not appended.strip():
+        return np.empty((0, len(USEFUL_FEATURES)), dtype=np.float32), np.empty(0), new_watermark
+
+    # Заголовок читается отдельно: уже прочитанная часть файла не разбирается
+    header = list(pd.read_csv(path, nrows=0).columns)
+    chunks = pd.read_csv(io.BytesIO(appended), header=None, names=header, usecols=TRAINING_COLUMNS,
+                         dtype=column_dtypes(TRAINING_COLUMNS), chunksize=chunksize)
+    if chunksize is None:
+        chunks = [chunks]
+
+    X_parts = []
+    y_parts = []
+    for chunk in chunks:
+        chunk = chunk[chunk[TARGET_COLUMN].notna()]
+        X_parts.append(chunk[USEFUL_FEATURES].to_numpy(dtype=np.float32))
+        y_parts.append(chunk[TARGET_COLUMN].to_numpy(dtype=np.float64))
+
+    return np.concatenate(X_parts), np.concatenate(y_parts), new_watermark
+
 def preprocess_data(df):
     """Интеллектуальная предобработка данных для ML"""
     print("\n🔧 Запуск процесса предобработки...")
@@ -65,57 +218,55 @@ def preprocess_data(df):
 
     return X, y
 
-def create_features(X):
-    """Создание расширенных признаков для улучшения прогнозирования"""
-    print("🎨 Генерация дополнительных признаков...")
-    X = X.copy()
+def create_features(X, verbose=True):
+    """Создание расширенных признаков для улучшения прогнозирования
+
+    Векторизованная версия для анализа в DataFrame: корзины вычисляются через
+    bucket_codes, а не pd.cut. Для обучения и предсказаний используется
+    FeatureTransformer, который выдает те же признаки сразу матрицей float32.
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    log("🎨 Генерация дополнительных признаков...")
+    new_columns = {}
     
-    features_created = 0
+    def bucket_labels(category):
+        source, bins, labels = CATEGORY_BUCKETS[category]
+        # Код -1 (вне границ) попадает на последний элемент 'nan', как astype(str) у pd.cut
+        return np.array(labels + ['nan'], dtype=object)[bucket_codes(X[source].to_numpy(), bins)]
     
     if 'Ride Distance' in X.columns:
         # Категоризация расстояния
-        X['distance_category'] = pd.cut(X['Ride Distance'], 
-                                       bins=[0, 10, 25, 50, float('inf')], 
-                                       labels=['short', 'medium', 'long', 'very_long'])
-        X['distance_category'] = X['distance_category'].astype(str)
-        features_created += 1
-        print("   📏 Добавлена категоризация расстояния")
+        new_columns['distance_category'] = bucket_labels('distance_category')
+        log("   📏 Добавлена категоризация расстояния")
     
     if 'Driver Ratings' in X.columns and 'Customer Rating' in X.columns:
         # Анализ рейтингов
-        X['rating_diff'] = X['Driver Ratings'] - X['Customer Rating']
-        X['avg_rating'] = (X['Driver Ratings'] + X['Customer Rating']) / 2
-        features_created += 2
-        print("   ⭐ Добавлены метрики рейтингов")
+        new_columns['rating_diff'] = X['Driver Ratings'] - X['Customer Rating']
+        new_columns['avg_rating'] = (X['Driver Ratings'] + X['Customer Rating']) / 2
+        log("   ⭐ Добавлены метрики рейтингов")
     
     if 'Avg VTAT' in X.columns and 'Avg CTAT' in X.columns:
         # Временные метрики
-        X['total_time'] = X['Avg VTAT'] + X['Avg CTAT']
+        new_columns['total_time'] = X['Avg VTAT'] + X['Avg CTAT']
         if 'Ride Distance' in X.columns:
-            X['time_per_distance'] = X['total_time'] / (X['Ride Distance'] + 1e-8)
-            features_created += 1
-            print("   ⏱️  Добавлены временные характеристики")
+            new_columns['time_per_distance'] = new_columns['total_time'] / (X['Ride Distance'] + 1e-8)
+            log("   ⏱️  Добавлены временные характеристики")
     
     if 'Driver Ratings' in X.columns:
         # Категоризация рейтинга водителя
-        X['driver_rating_category'] = pd.cut(X['Driver Ratings'], 
-                                            bins=[0, 3.0, 4.0, 4.5, 5.0], 
-                                            labels=['low', 'medium', 'high', 'excellent'])
-        X['driver_rating_category'] = X['driver_rating_category'].astype(str)
-        features_created += 1
-        print("   🚗 Добавлена категоризация водителей")
+        new_columns['driver_rating_category'] = bucket_labels('driver_rating_category')
+        log("   🚗 Добавлена категоризация водителей")
     
     if 'Customer Rating' in X.columns:
         # Категоризация рейтинга клиента
-        X['customer_rating_category'] = pd.cut(X['Customer Rating'], 
-                                              bins=[0, 3.0, 4.0, 4.5, 5.0], 
-                                              labels=['low', 'medium', 'high', 'excellent'])
-        X['customer_rating_category'] = X['customer_rating_category'].astype(str)
-        features_created += 1
-        print("   👑 Добавлена категоризация клиентов")
+        new_columns['customer_rating_category'] = bucket_labels('customer_rating_category')
+        log("   👑 Добавлена категоризация клиентов")
+    
+    # Одна сборка итогового кадра вместо копии и поочередного добавления колонок
+    X = pd.concat([X, pd.DataFrame(new_columns, index=X.index)], axis=1)
     
-    print(f"🎯 Всего создано дополнительных признаков: {features_created}")
-    print(f"📊 Общее количество признаков: {len(X.columns)}")
+    log(f"🎯 Всего создано дополнительных признаков: {len(new_columns) - ('total_time' in new_columns)}")
+    log(f"📊 Общее количество признаков: {len(X.columns)}")
     
     return X
 
@@ -123,8 +274,7 @@ def get_feature_info():
     """Получение детальной информации о признаках для анализа"""
     print("\n🔍 Сбор информации о признаках...")
     
-    df = load_data()
-    X, y = preprocess_data(df)
+    X, y = load_training_data()
     
     feature_info = {
         'feature_names': list(X.columns),
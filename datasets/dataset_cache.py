@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+
+import numpy as np
+
+# Версия формата кэша: меняется при изменении структуры сохраняемых данных
+CACHE_FORMAT_VERSION = 3
+HASH_BLOCK_SIZE = 1 << 20
+SPLIT_ARRAYS = ['X_train', 'X_test', 'y_train', 'y_test', 'missing_train', 'missing_test']
+# Служебные поля meta.json, которые не возвращаются вместе с разбиением
+META_SERVICE_FIELDS = ('source', 'created')
+
+def file_hash(path, cache_dir):
+    """SHA-256 содержимого файла с запоминанием по (размер, время изменения)"""
+    stat = os.stat(path)
+    registry_path = os.path.join(cache_dir, 'hashes.json')
+    source = os.path.abspath(path)
+
+    registry = {}
+    if os.path.exists(registry_path):
+        try:
+            with open(registry_path, encoding='utf-8') as registry_file:
+                registry = json.load(registry_file)
+        except ValueError:
+            registry = {}
+
+    entry = registry.get(source)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+
+    registry[source] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(registry_path, 'w', encoding='utf-8') as registry_file:
+        json.dump(registry, registry_file, indent=2)
+
+    return registry[source]['sha256']
+
+def cache_key(source_hash, config):
+    """Ключ кэша: хэш исходного файла + параметры предобработки"""
+    payload = json.dumps({'source': source_hash, 'config': config, 'version': CACHE_FORMAT_VERSION},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def load_split(cache_dir, key):
+    """Загрузка разбиения из кэша (memory-mapped), None при промахе"""
+    entry_dir = os.path.join(cache_dir, key)
+    meta_path = os.path.join(entry_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, encoding='utf-8') as meta_file:
+        meta = json.load(meta_file)
+
+    split = {name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode='r') for name in SPLIT_ARRAYS}
+    split.update({name: value for name, value in meta.items() if name not in META_SERVICE_FIELDS})
+    return split
+
+def save_split(cache_dir, key, split, source_path):
+    """Атомарное сохранение разбиения в кэш"""
+    entry_dir = os.path.join(cache_dir, key)
+    tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    for name in SPLIT_ARRAYS:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(split[name]))
+    # Все не-массивы разбиения (feature_names, состояние преобразования) хранятся в JSON
+    meta = {name: value for name, value in split.items() if name not in SPLIT_ARRAYS}
+    meta['feature_names'] = list(split['feature_names'])
+    meta['source'] = os.path.abspath(source_path)
+    meta['created'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as meta_file:
+        json.dump(meta, meta_file, indent=2, ensure_ascii=False)
+
+    if os.path.exists(entry_dir):
+        shutil.rmtree(entry_dir)
+    os.replace(tmp_dir, entry_dir)
+    _prune(cache_dir, source_path, key)
+
+def _prune(cache_dir, source_path, keep_key):
+    """Удаление устаревших записей кэша для того же исходного файла"""
+    source = os.path.abspath(source_path)
+    for name in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, name, 'meta.json')
+        if name == keep_key or not os.path.exists(meta_path):
+            continue
+        with open(meta_path, encoding='utf-8') as meta_file:
+            if json.load(meta_file).get('source') == source:
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+def load_or_build_split(source_path, config, build, cache_dir):
+    """Разбиение из кэша или построение через build() с сохранением
+
+    build() возвращает dict с X_train, X_test, y_train, y_test, missing_train,
+    missing_test, feature_names
+    и, при необходимости, другими JSON-совместимыми полями.
+    Кэш инвалидируется автоматически при изменении содержимого файла или config.
+    В результат добавляются cache_key — ключ записи (вход следующих этапов
+    обучения) и cache_hit — взято ли разбиение из кэша.
+    """
+    start_time = time.perf_counter()
+    key = cache_key(file_hash(source_path, cache_dir), config)
+
+    split = load_split(cache_dir, key)
+    if split is not None:
+        print(f"⚡ Предобработанные данные загружены из кэша за {(time.perf_counter() - start_time) * 1000:.1f} мс")
+        print(f"   📁 {os.path.join(cache_dir, key)}")
+        split.update(cache_key=key, cache_hit=True)
+        return split
+
+    print("🔄 Кэш предобработанных данных не найден, выполняем предобработку...")
+    split = build()
+    save_split(cache_dir, key, split, source_path)
+    print(f"💾 Предобработанные данные сохранены в кэш: {os.path.join(cache_dir, key)}")
+    return dict(split, cache_key=key, cache_hit=False)
@@ -0,0 +1,286 @@
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from datasets.quantile_sketch import QuantileSketch
+
+# Границы корзин для категоризации (интервалы (a, b], как в pd.cut)
+DISTANCE_BINS = [0, 10, 25, 50, float('inf')]
+DISTANCE_LABELS = ['short', 'medium', 'long', 'very_long']
+RATING_BINS = [0, 3.0, 4.0, 4.5, 5.0]
+RATING_LABELS = ['low', 'medium', 'high', 'excellent']
+
+# Категориальный признак -> (исходная колонка, границы, метки)
+CATEGORY_BUCKETS = {
+    'distance_category': ('Ride Distance', DISTANCE_BINS, DISTANCE_LABELS),
+    'driver_rating_category': ('Driver Ratings', RATING_BINS, RATING_LABELS),
+    'customer_rating_category': ('Customer Rating', RATING_BINS, RATING_LABELS)
+}
+
+# Производный признак -> (операция, исходные колонки)
+DERIVED_FEATURES = {
+    'rating_diff': ('sub', 'Driver Ratings', 'Customer Rating'),
+    'avg_rating': ('mean', 'Driver Ratings', 'Customer Rating'),
+    'total_time': ('add', 'Avg VTAT', 'Avg CTAT'),
+    'time_per_distance': ('per_distance', 'Avg VTAT', 'Avg CTAT', 'Ride Distance')
+}
+
+# Защита от деления на ноль в time_per_distance
+DISTANCE_EPSILON = np.float32(1e-8)
+
+def bucket_codes(values, bins, out=None):
+    """Номер интервала (a, b] для каждого значения; -1 вне границ и для NaN
+
+    То же, что np.searchsorted(bins, values) - 1, но для нескольких границ сумма
+    сравнений быстрее двоичного поиска и пишет сразу в выходной буфер.
+    """
+    values = np.asarray(values)
+    if out is None:
+        out = np.zeros(values.shape, dtype=np.int64)
+    else:
+        out[...] = 0
+    for edge in bins:
+        np.add(out, edge < values, out=out)
+    out -= 1
+    # Значения за последней границей, как и NaN, не попадают ни в один интервал
+    out[out >= len(bins) - 1] = -1
+    return out
+
+class FeatureTransformer:
+    """Обученное преобразование признаков: медианы пропусков, производные признаки и коды корзин
+
+    Выдает непрерывную матрицу float32 в порядке колонок модели. Корзины
+    кодируются целыми номерами интервалов вместо строковых меток. Один и тот же
+    объект используется при обучении и сохраняется в артефакте модели.
+    """
+
+    def __init__(self, input_features, feature_names=None, buckets=CATEGORY_BUCKETS):
+        self.input_features = list(input_features)
+        self.buckets = {category: (source, [float(edge) for edge in bins], list(labels))
+                        for category, (source, bins, labels) in buckets.items()
+                        if source in self.input_features}
+        if feature_names is None:
+            # По умолчанию: исходные признаки, все производные и коды всех корзин
+            feature_names = self.input_features + list(DERIVED_FEATURES) + list(self.buckets)
+        self.feature_names = list(feature_names)
+        self.medians = None
+        self.counts = None
+        # Эскизы распределений исходных признаков: по ним медианы обновляются при дообучении
+        self.sketches = None
+        self._compile()
+
+    def _compile(self):
+        """Список операций по колонкам выхода"""
+        position = {name: index for index, name in enumerate(self.input_features)}
+
+        onehot = {}
+        for category, (source, bins, labels) in self.buckets.items():
+            for code, label in enumerate(labels):
+                onehot[f"{category}_{label}"] = (source, bins, code)
+            onehot[f"{category}_nan"] = (source, bins, -1)
+
+        self._ops = []
+        for name in self.feature_names:
+            if name in position:
+                self._ops.append(('input', position[name]))
+            elif name in DERIVED_FEATURES and all(column in position for column in DERIVED_FEATURES[name][1:]):
+                operation, *columns = DERIVED_FEATURES[name]
+                self._ops.append((operation, *[position[column] for column in columns]))
+            elif name in self.buckets:
+                source, bins, _ = self.buckets[name]
+                self._ops.append(('code', position[source], *self._edges(bins)))
+            elif name in onehot:
+                source, bins, code = onehot[name]
+                self._ops.append(('onehot', position[source], *self._edges(bins), code))
+            else:
+                # Неизвестная колонка заполняется нулем, как reindex(fill_value=0)
+                self._ops.append(('zero',))
+
+    @staticmethod
+    def _edges(bins):
+        """Границы в float32 (для numpy) и те же значения списком (для bisect)"""
+        edges = np.asarray(bins, dtype=np.float32)
+        return edges, edges.tolist()
+
+    def fit(self, X):
+        """Запоминание медиан исходных признаков для заполнения пропусков и их эскизов"""
+        X = self._as_inputs(X)
+        self.medians, self.counts = self._column_medians(X)
+        self.sketches = [QuantileSketch().update(X[:, index]) for index in range(len(self.input_features))]
+        return self
+
+    def partial_fit(self, X):
+        """Обновление медиан по новым строкам без исходных данных
+
+        Новые значения сливаются с эскизами распределений (QuantileSketch), и
+        медиана берется по объединенному эскизу — это оценка медианы всех
+        строк с ошибкой ранга порядка 1/size, а не среднее медиан частей.
+        У преобразования без эскизов (артефакты прежних версий) медианы
+        не меняются до полного переобучения, обновляется только число значений.
+        """
+        if self.medians is None or self.counts is None:
+            return self.fit(X)
+
+        X = self._as_inputs(X)
+        if self.sketches is None:
+            self.counts = self.counts + self._column_medians(X)[1]
+            return self
+        for index, sketch in enumerate(self.sketches):
+            sketch.update(X[:, index])
+            if sketch.count:
+                self.medians[index] = sketch.quantile(0.5)
+            self.counts[index] = sketch.count
+        return self
+
+    def _column_medians(self, X):
+        """Медианы и число непропущенных значений по колонкам"""
+        medians = np.zeros(len(self.input_features), dtype=np.float32)
+        counts = np.zeros(len(self.input_features), dtype=np.int64)
+        for index in range(len(self.input_features)):
+            column = X[:, index]
+            present = column[~np.isnan(column)]
+            counts[index] = len(present)
+            if len(present):
+                medians[index] = np.median(present)
+        return medians, counts
+
+    def impute(self, X):
+        """Заполнение пропусков медианами на месте; возвращает число заполненных по колонкам"""
+        filled = {}
+        for index, column in enumerate(self.input_features):
+            missing = np.isnan(X[:, index])
+            missing_count = int(missing.sum())
+            if missing_count > 0:
+                X[missing, index] = self.medians[index]
+                filled[column] = missing_count
+        return filled
+
+    def _as_inputs(self, X):
+        """Матрица исходных признаков float32 в порядке input_features, по столбцам"""
+        if isinstance(X, pd.DataFrame):
+            X = X[self.input_features]
+        return np.asarray(X, dtype=np.float32, order='F')
+
+    def transform(self, X, out=None):
+        """Векторизованное преобразование в матрицу float32 (строки x feature_names)
+
+        Матрица хранится по столбцам (order='F'): каждая операция пишет в
+        непрерывный участок памяти, а sklearn принимает такой массив без копии.
+        """
+        X = self._as_inputs(X)
+        if out is None:
+            out = np.empty((len(X), len(self.feature_names)), dtype=np.float32, order='F')
+
+        for index, op in enumerate(self._ops):
+            column = out[:, index]
+            kind = op[0]
+            if kind == 'input':
+                column[:] = X[:, op[1]]
+            elif kind == 'sub':
+                np.subtract(X[:, op[1]], X[:, op[2]], out=column)
+            elif kind == 'mean':
+                np.add(X[:, op[1]], X[:, op[2]], out=column)
+                column *= np.float32(0.5)
+            elif kind == 'add':
+                np.add(X[:, op[1]], X[:, op[2]], out=column)
+            elif kind == 'per_distance':
+                np.add(X[:, op[1]], X[:, op[2]], out=column)
+                column /= X[:, op[3]] + DISTANCE_EPSILON
+            elif kind == 'code':
+                bucket_codes(X[:, op[1]], op[2], out=column)
+            elif kind == 'onehot':
+                np.equal(bucket_codes(X[:, op[1]], op[2]), op[4], out=column, casting='unsafe')
+            else:
+                column[:] = 0.0
+
+        return out
+
+    def fit_transform(self, X):
+        """Обучение медиан, заполнение пропусков на месте и преобразование"""
+        X = self._as_inputs(X)
+        self.fit(X)
+        self.impute(X)
+        return self.transform(X)
+
+    def categorical_mask(self):
+        """Маска колонок с кодами корзин: для моделей с нативными категориальными признаками"""
+        return np.array([name in self.buckets for name in self.feature_names])
+
+    def restore_missing(self, X, missing):
+        """Копия преобразованной матрицы, в которой заполненные медианой значения снова пропущены
+
+        missing — маска пропусков исходных признаков (строки x input_features).
+        Пересчитываются только строки с пропусками: производные признаки в них
+        становятся NaN, а коды корзин — -1.
+        """
+        out = np.array(X, dtype=np.float32, order='F')
+        rows = np.flatnonzero(np.asarray(missing).any(axis=1))
+        if len(rows):
+            positions = [self.feature_names.index(name) for name in self.input_features]
+            inputs = out[np.ix_(rows, positions)]
+            inputs[np.asarray(missing)[rows]] = np.nan
+            out[rows] = self.transform(inputs)
+        return out
+
+    def transform_row(self, values, out):
+        """Преобразование одной строки (список float в порядке input_features) без numpy-операций
+
+        Арифметика повторяет transform: значения и промежуточные суммы
+        округляются до float32 через array('f'), запись в out округляет результат.
+        """
+        values = array('f', values).tolist()
+        for index, op in enumerate(self._ops):
+            kind = op[0]
+            if kind == 'input':
+                out[index] = values[op[1]]
+            elif kind == 'sub':
+                out[index] = values[op[1]] - values[op[2]]
+            elif kind == 'mean':
+                # Умножение на 0.5 точное, поэтому достаточно одного округления при записи
+                out[index] = (values[op[1]] + values[op[2]]) * 0.5
+            elif kind == 'add':
+                out[index] = values[op[1]] + values[op[2]]
+            elif kind == 'per_distance':
+                total, distance = array('f', (values[op[1]] + values[op[2]], values[op[3]] + DISTANCE_EPSILON))
+                out[index] = total / distance
+            elif kind in ('code', 'onehot'):
+                edges = op[3]
+                code = bisect_left(edges, values[op[1]]) - 1
+                if code >= len(edges) - 1:
+                    code = -1
+                out[index] = code if kind == 'code' else float(code == op[4])
+            else:
+                out[index] = 0.0
+        return out
+
+    def to_dict(self):
+        """Состояние в виде JSON-совместимого словаря"""
+        return {
+            'input_features': self.input_features,
+            'feature_names': self.feature_names,
+            'buckets': {category: [source, bins, labels] for category, (source, bins, labels) in self.buckets.items()},
+            'medians': None if self.medians is None else [float(value) for value in self.medians],
+            'counts': None if self.counts is None else [int(value) for value in self.counts],
+            'sketches': None if self.sketches is None else [sketch.to_dict() for sketch in self.sketches]
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Восстановление из словаря to_dict()"""
+        transformer = cls(state['input_features'], state['feature_names'],
+                          {category: tuple(bucket) for category, bucket in state['buckets'].items()})
+        if state.get('medians') is not None:
+            transformer.medians = np.asarray(state['medians'], dtype=np.float32)
+        if state.get('counts') is not None:
+            transformer.counts = np.asarray(state['counts'], dtype=np.int64)
+        if state.get('sketches') is not None:
+            transformer.sketches = [QuantileSketch.from_dict(sketch) for sketch in state['sketches']]
+        return transformer
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__dict__.update(FeatureTransformer.from_dict(state).__dict__)
@@ -0,0 +1,144 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь для импорта модулей при запуске как скрипта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from datasets.data_fetcher import DATA_PATH, TARGET_COLUMN, USEFUL_FEATURES, TRAINING_COLUMNS, column_dtypes
+from datasets.quantile_sketch import SKETCH_SIZE, QuantileSketch
+
+# Младшие биты хэша строки задают разбиение train/test, старшие — приоритет в выборке
+SPLIT_BITS = 16
+
+class BottomKSample:
+    """Равномерная выборка не больше capacity строк с наименьшим приоритетом
+
+    Приоритет — хэш строки, поэтому в выборку попадают одни и те же строки
+    при любом размере частей (кроме строк с совпавшим 48-битным приоритетом
+    на границе отбора). Кандидаты копятся в буфере и отбираются, когда буфер
+    достигает половины capacity: пиковая память — около трех capacity строк.
+    """
+
+    def __init__(self, capacity, n_features):
+        self.capacity = int(capacity)
+        self.X = np.empty((0, n_features), dtype=np.float32)
+        self.y = np.empty(0)
+        self.priority = np.empty(0, dtype=np.uint64)
+        self.threshold = None  # наибольший приоритет в заполненной выборке
+        self.seen = 0
+        self._pending = []
+        self._pending_rows = 0
+
+    def add(self, X, y, priority):
+        """Учет строк части данных"""
+        self.seen += len(y)
+        if self.threshold is not None:
+            # В заполненную выборку могут попасть только строки с меньшим приоритетом
+            keep = priority < self.threshold
+            X, y, priority = X[keep], y[keep], priority[keep]
+        if len(y):
+            self._pending.append((X, y, priority))
+            self._pending_rows += len(y)
+        if len(self.y) + self._pending_rows > self.capacity and self._pending_rows >= self.capacity // 2:
+            self._compact()
+
+    def _compact(self):
+        """Слияние буфера с выборкой и отбор capacity строк с наименьшим приоритетом"""
+        X = np.concatenate([self.X] + [part[0] for part in self._pending])
+        y = np.concatenate([self.y] + [part[1] for part in self._pending])
+        priority = np.concatenate([self.priority] + [part[2] for part in self._pending])
+        self._pending = []
+        self._pending_rows = 0
+
+        if len(y) > self.capacity:
+            keep = np.sort(np.argpartition(priority, self.capacity - 1)[:self.capacity])
+            X, y, priority = X[keep], y[keep], priority[keep]
+            self.threshold = priority.max()
+        self.X, self.y, self.priority = X, y, priority
+
+    def result(self):
+        """Итоговая выборка (X, y)"""
+        if self._pending:
+            self._compact()
+        return self.X, self.y
+
+def row_hashes(chunk, id_column, first_row, random_state):
+    """64-битный хэш строки: по ключу id_column, если он есть в файле, иначе по номеру строки"""
+    hash_key = f"{random_state:016d}"[-16:]
+    if id_column is not None and id_column in chunk.columns:
+        values = chunk[id_column].astype(str).to_numpy(dtype=object)
+    else:
+        # Для чисел hash_array не использует hash_key, поэтому зерно смешивается со значениями
+        values = np.arange(first_row, first_row + len(chunk), dtype=np.int64) ^ np.int64(random_state << 32)
+    return pd.util.hash_array(values, hash_key=hash_key)
+
+def is_test_row(hashes, test_size):
+    """Принадлежность строк тестовой выборке по младшим битам хэша"""
+    return (hashes & np.uint64((1 << SPLIT_BITS) - 1)) < np.uint64(int(test_size * (1 << SPLIT_BITS)))
+
+def stream_split_sample(path, max_train_rows, max_test_rows, chunksize=500000, test_size=0.2,
+                        random_state=42, id_column='Booking ID', sketch_size=SKETCH_SIZE):
+    """Один потоковый проход по CSV: эскизы квантилей признаков и выборки train/test
+
+    Каждая строка попадает в train или test по хэшу своего ключа — разбиение
+    не требует копий данных и стабильно при дописывании файла. Эскизы
+    строятся по всем обучающим строкам (медианы по ним приближенные, с
+    ошибкой ранга порядка 1/sketch_size), а в памяти остаются только
+    равномерные выборки не больше max_train_rows / max_test_rows строк с
+    пропусками как есть (их заполняет обученное преобразование).
+    """
+    path = path or DATA_PATH
+    print("📁 Потоковое чтение данных вне памяти...")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"🚨 Файл данных не обнаружен: {path}")
+
+    header = list(pd.read_csv(path, nrows=0).columns)
+    columns = TRAINING_COLUMNS + ([id_column] if id_column in header else [])
+    dtypes = column_dtypes(TRAINING_COLUMNS)
+    if id_column in header:
+        dtypes[id_column] = str
+    else:
+        print(f"   ⚠️  Колонка {id_column} не найдена: разбиение по номеру строки")
+
+    n_features = len(USEFUL_FEATURES)
+    sketches = [QuantileSketch(sketch_size) for _ in USEFUL_FEATURES]
+    train = BottomKSample(max_train_rows, n_features)
+    test = BottomKSample(max_test_rows, n_features)
+    rows = 0
+    for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+        hashes = row_hashes(chunk, id_column, rows, random_state)
+        rows += len(chunk)
+
+        valid = chunk[TARGET_COLUMN].notna().to_numpy()
+        X = chunk[USEFUL_FEATURES].to_numpy(dtype=np.float32)[valid]
+        y = chunk[TARGET_COLUMN].to_numpy(dtype=np.float64)[valid]
+        hashes = hashes[valid]
+        priority = hashes >> np.uint64(SPLIT_BITS)
+
+        in_test = is_test_row(hashes, test_size)
+        in_train = ~in_test
+        for index, sketch in enumerate(sketches):
+            sketch.update(X[in_train, index])
+        train.add(X[in_train], y[in_train], priority[in_train])
+        test.add(X[in_test], y[in_test], priority[in_test])
+
+    X_train, y_train = train.result()
+    X_test, y_test = test.result()
+    print(f"✅ Прочитано записей: {rows}, валидных: {train.seen + test.seen}")
+    if rows > train.seen + test.seen:
+        print(f"🧹 Удалено некорректных записей: {rows - train.seen - test.seen}")
+    print(f"📊 Обучающих строк: {train.seen} (в выборке {len(y_train)}), "
+          f"тестовых: {test.seen} (в выборке {len(y_test)})")
+
+    return {
+        'X_train': X_train,
+        'y_train': y_train,
+        'X_test': X_test,
+        'y_test': y_test,
+        'sketches': sketches,
+        'rows': rows,
+        'train_rows': train.seen,
+        'test_rows': test.seen
+    }
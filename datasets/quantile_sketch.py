@@ -0,0 +1,75 @@
+import numpy as np
+
+# Центроидов эскиза по умолчанию: ошибка ранга квантиля ~1/2000
+SKETCH_SIZE = 2000
+
+class QuantileSketch:
+    """Сливаемый эскиз распределения: квантили без хранения всех значений
+
+    Хранит не больше size центроидов (среднее, вес) примерно равного веса.
+    При обновлении и слиянии центроиды и новые значения сортируются, делятся
+    по накопленному весу на size частей, и каждая часть заменяется
+    средневзвешенным. Квантиль — приближение: его ранг отличается от точного
+    на величину порядка 1/size доли значений. Центроиды зависят от того, как
+    данные разбиты на части и в каком порядке слиты, поэтому оценки при
+    разном разбиении немного различаются, оставаясь в пределах этой ошибки.
+    """
+
+    def __init__(self, size=SKETCH_SIZE):
+        self.size = size
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    @property
+    def count(self):
+        """Число учтенных значений"""
+        return int(self.weights.sum())
+
+    def update(self, values):
+        """Учет значений части данных (NaN пропускаются)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other):
+        """Слияние с эскизом другой части данных"""
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+        return self
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        if len(means) <= self.size:
+            self.means, self.weights = means, weights
+            return
+
+        # Номер части — по накопленному весу до середины центроида
+        cumulative = np.cumsum(weights)
+        parts = np.minimum(((cumulative - weights / 2) / cumulative[-1] * self.size).astype(np.int64),
+                           self.size - 1)
+        starts = np.flatnonzero(np.r_[True, parts[1:] != parts[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q):
+        """Оценка квантиля q (0..1); NaN для пустого эскиза"""
+        if not len(self.means):
+            return float('nan')
+        # Центроид представляет свою часть распределения в точке середины ее веса
+        positions = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.weights.sum(), positions, self.means))
+
+    def to_dict(self):
+        """Состояние в виде JSON-совместимого словаря"""
+        return {'size': self.size, 'means': self.means.tolist(), 'weights': self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        """Восстановление из словаря to_dict()"""
+        sketch = cls(state['size'])
+        sketch.means = np.asarray(state['means'], dtype=np.float64)
+        sketch.weights = np.asarray(state['weights'], dtype=np.float64)
+        return sketch
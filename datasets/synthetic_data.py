@@ -0,0 +1,275 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь для импорта модулей при запуске как скрипта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from configuration.settings import RANDOM_STATE, SYNTHETIC_ROWS, SYNTHETIC_CHUNK_ROWS
+
+# Порядок колонок как в выгрузке поездок
+COLUMNS = [
+    'Date', 'Time', 'Booking ID', 'Booking Status', 'Customer ID', 'Vehicle Type',
+    'Pickup Location', 'Drop Location', 'Avg VTAT', 'Avg CTAT',
+    'Reason for cancelling by Customer', 'Driver Cancellation Reason', 'Incomplete Rides Reason',
+    'Booking Value', 'Ride Distance', 'Driver Ratings', 'Customer Rating', 'Payment Method'
+]
+
+# Статус заказа -> доля; от статуса зависит, какие поля заполнены
+BOOKING_STATUSES = {
+    'Completed': 0.62,
+    'Cancelled by Driver': 0.18,
+    'No Driver Found': 0.07,
+    'Cancelled by Customer': 0.07,
+    'Incomplete': 0.06
+}
+
+# Тип транспорта -> (доля, посадка, цена за км)
+VEHICLE_TYPES = {
+    'Auto': (0.25, 40.0, 12.0),
+    'Go Mini': (0.20, 60.0, 14.0),
+    'Go Sedan': (0.18, 70.0, 16.0),
+    'Bike': (0.15, 20.0, 8.0),
+    'Premier Sedan': (0.12, 100.0, 20.0),
+    'eBike': (0.07, 25.0, 9.0),
+    'Uber XL': (0.03, 120.0, 24.0)
+}
+
+PAYMENT_METHODS = {'UPI': 0.45, 'Cash': 0.25, 'Uber Wallet': 0.12, 'Credit Card': 0.10, 'Debit Card': 0.08}
+
+CUSTOMER_CANCEL_REASONS = ['Driver is not moving towards pickup location', 'Driver asked to cancel',
+                           'AC is not working', 'Change of plans', 'Wrong Address']
+DRIVER_CANCEL_REASONS = ['Personal & Car related issues', 'Customer related issue',
+                         'The customer was coughing/sick', 'More than permitted people in there']
+INCOMPLETE_REASONS = ['Customer Demand', 'Vehicle Breakdown', 'Other Issue']
+
+N_LOCATIONS = 176
+N_CUSTOMERS = 10_000_000
+DATA_YEAR = 2024
+
+# Случайные пропуски поверх структурных (зависящих от статуса)
+RANDOM_MISSING_SHARE = {'Avg VTAT': 0.01, 'Driver Ratings': 0.02, 'Customer Rating': 0.02, 'Ride Distance': 0.005}
+
+# Строк в блоке со своим генератором случайных чисел: часть данных набирается из блоков,
+# поэтому строки не зависят от размера части. Изменение значения меняет сами данные
+SEED_BLOCK_ROWS = 16384
+
+_LOCATIONS = [f'Zone {index:03d}' for index in range(N_LOCATIONS)]
+_STATUSES = list(BOOKING_STATUSES)
+_VEHICLES = list(VEHICLE_TYPES)
+_PAYMENTS = list(PAYMENT_METHODS)
+
+def _probabilities(weights):
+    """Нормированные доли словаря или списка"""
+    weights = np.asarray(list(weights), dtype=np.float64)
+    return weights / weights.sum()
+
+def _lookup_tables():
+    """Строки всех дат года и всех секунд суток: форматирование сводится к индексации"""
+    days = np.arange(f'{DATA_YEAR}-01-01', f'{DATA_YEAR + 1}-01-01', dtype='datetime64[D]')
+    seconds = np.arange(24 * 3600)
+    times = [f'{hour:02d}:{minute:02d}:{second:02d}'
+             for hour, minute, second in zip(seconds // 3600, seconds // 60 % 60, seconds % 60)]
+    return np.datetime_as_string(days).astype(object), np.array(times, dtype=object)
+
+_DATES, _TIMES = _lookup_tables()
+
+def _categorical(codes, categories):
+    """Категориальная колонка из кодов (-1 — пропуск) без промежуточных строк"""
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def _with_reasons(rng, mask, reasons):
+    """Коды причины для строк mask, остальные строки — пропуск"""
+    codes = np.full(len(mask), -1, dtype=np.int8)
+    codes[mask] = rng.integers(0, len(reasons), int(mask.sum()))
+    return _categorical(codes, reasons)
+
+def generate_chunk(start, n_rows, seed=RANDOM_STATE):
+    """Часть синтетических поездок: строки start .. start + n_rows
+
+    Строки генерируются блоками по SEED_BLOCK_ROWS, генератор случайных чисел
+    блока инициализируется парой (seed, номер блока). Поэтому строка с данным
+    номером одна и та же при любом размере части (chunk_rows), а каждая часть
+    воспроизводима независимо от остальных.
+    """
+    first_block = start // SEED_BLOCK_ROWS
+    last_block = (start + n_rows - 1) // SEED_BLOCK_ROWS
+    if n_rows <= 0:
+        return _generate_block(first_block, seed).iloc[:0]
+
+    parts = []
+    for block in range(first_block, last_block + 1):
+        block_start = block * SEED_BLOCK_ROWS
+        rows = _generate_block(block, seed)
+        # Границы части внутри блока; крайние блоки берутся частично
+        parts.append(rows.iloc[max(start - block_start, 0):min(start + n_rows - block_start, SEED_BLOCK_ROWS)])
+    if len(parts) == 1:
+        return parts[0].reset_index(drop=True)
+    return pd.concat(parts, ignore_index=True)
+
+def _generate_block(block, seed):
+    """Блок из SEED_BLOCK_ROWS строк со своим генератором случайных чисел"""
+    return _generate_rows(block * SEED_BLOCK_ROWS, SEED_BLOCK_ROWS, np.random.default_rng([seed, block]))
+
+def _generate_rows(start, n_rows, rng):
+    """Строки start .. start + n_rows из генератора rng"""
+    status = rng.choice(len(_STATUSES), n_rows, p=_probabilities(BOOKING_STATUSES.values())).astype(np.int8)
+    vehicle = rng.choice(len(_VEHICLES), n_rows, p=_probabilities(share for share, _, _ in VEHICLE_TYPES.values())).astype(np.int8)
+    completed = status == _STATUSES.index('Completed')
+    incomplete = status == _STATUSES.index('Incomplete')
+    no_driver = status == _STATUSES.index('No Driver Found')
+    # Поездка состоялась (полностью или частично): есть стоимость, расстояние и оплата
+    rode = completed | incomplete
+
+    distance = np.clip(rng.gamma(2.0, 12.0, n_rows), 1.0, 50.0).astype(np.float32)
+    vtat = np.clip(rng.gamma(4.0, 2.0, n_rows), 2.0, 20.0).astype(np.float32)
+    # Время в пути растет с расстоянием: около 1.2 минуты на км плюс пробки
+    ctat = np.clip(distance * rng.uniform(0.8, 1.6, n_rows) + rng.gamma(2.0, 3.0, n_rows), 2.0, 120.0).astype(np.float32)
+    driver_rating = np.clip(rng.normal(4.23, 0.43, n_rows), 3.0, 5.0).astype(np.float32)
+    customer_rating = np.clip(rng.normal(4.40, 0.44, n_rows), 3.0, 5.0).astype(np.float32)
+
+    base_fare = np.array([fare for _, fare, _ in VEHICLE_TYPES.values()])[vehicle]
+    per_km = np.array([rate for _, _, rate in VEHICLE_TYPES.values()])[vehicle]
+    booking_value = (base_fare + per_km * distance + 1.5 * ctat) * rng.lognormal(0.0, 0.15, n_rows)
+
+    # Структурные пропуски: без поездки нет стоимости, расстояния и оценок
+    booking_value[~rode] = np.nan
+    distance[~rode] = np.nan
+    ctat[~rode] = np.nan
+    vtat[no_driver] = np.nan
+    driver_rating[~completed] = np.nan
+    customer_rating[~completed] = np.nan
+
+    features = {'Avg VTAT': vtat, 'Ride Distance': distance, 'Driver Ratings': driver_rating,
+                'Customer Rating': customer_rating}
+    for column, share in RANDOM_MISSING_SHARE.items():
+        features[column][rng.random(n_rows) < share] = np.nan
+
+    payment = rng.choice(len(_PAYMENTS), n_rows, p=_probabilities(PAYMENT_METHODS.values())).astype(np.int8)
+    payment[~rode] = -1
+
+    booking_ids = np.arange(start, start + n_rows).astype(str).astype(object)
+
+    return pd.DataFrame({
+        'Date': _DATES[rng.integers(0, len(_DATES), n_rows)],
+        'Time': _TIMES[rng.integers(0, len(_TIMES), n_rows)],
+        'Booking ID': 'CNR' + booking_ids,
+        'Booking Status': _categorical(status, _STATUSES),
+        'Customer ID': 'CID' + rng.integers(0, N_CUSTOMERS, n_rows).astype(str).astype(object),
+        'Vehicle Type': _categorical(vehicle, _VEHICLES),
+        'Pickup Location': _categorical(rng.integers(0, N_LOCATIONS, n_rows, dtype=np.int16), _LOCATIONS),
+        'Drop Location': _categorical(rng.integers(0, N_LOCATIONS, n_rows, dtype=np.int16), _LOCATIONS),
+        'Avg VTAT': vtat.round(1),
+        'Avg CTAT': ctat.round(1),
+        'Reason for cancelling by Customer': _with_reasons(rng, status == _STATUSES.index('Cancelled by Customer'),
+                                                           CUSTOMER_CANCEL_REASONS),
+        'Driver Cancellation Reason': _with_reasons(rng, status == _STATUSES.index('Cancelled by Driver'),
+                                                    DRIVER_CANCEL_REASONS),
+        'Incomplete Rides Reason': _with_reasons(rng, incomplete, INCOMPLETE_REASONS),
+        'Booking Value': booking_value.round(0),
+        'Ride Distance': distance.round(2),
+        'Driver Ratings': driver_rating.round(1),
+        'Customer Rating': customer_rating.round(1),
+        'Payment Method': _categorical(payment, _PAYMENTS)
+    }, columns=COLUMNS)
+
+def iter_synthetic_chunks(n_rows, chunk_rows=SYNTHETIC_CHUNK_ROWS, seed=RANDOM_STATE):
+    """Поток частей синтетических данных: в памяти одновременно не больше chunk_rows строк"""
+    for start in range(0, n_rows, chunk_rows):
+        yield generate_chunk(start, min(chunk_rows, n_rows - start), seed)
+
+def generate_dataset(n_rows, seed=RANDOM_STATE, chunk_rows=SYNTHETIC_CHUNK_ROWS):
+    """Синтетические поездки одним DataFrame (для небольших объемов)"""
+    chunks = list(iter_synthetic_chunks(n_rows, chunk_rows, seed))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+def _write_csv(chunks, path):
+    """Дозапись частей в CSV"""
+    for index, chunk in enumerate(chunks):
+        chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+        yield len(chunk)
+
+def _write_parquet(chunks, path):
+    """Запись частей в Parquet по одной группе строк на часть"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("🚨 Для записи Parquet установите pyarrow: pip install pyarrow")
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            yield len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_synthetic_data(path, n_rows=SYNTHETIC_ROWS, chunk_rows=SYNTHETIC_CHUNK_ROWS, seed=RANDOM_STATE,
+                         overwrite=False):
+    """Потоковая запись синтетических поездок в CSV или Parquet (по расширению файла)
+
+    Файл пишется во временный и атомарно заменяется, поэтому прерванная
+    генерация не оставляет обрезанных данных. Существующий файл (например,
+    настоящие данные transport_data.csv) заменяется только при overwrite=True,
+    иначе возвращается None.
+    """
+    if os.path.exists(path) and not overwrite:
+        print(f"❌ Файл {path} уже существует и не будет перезаписан")
+        print("💡 Укажите другой путь или добавьте --force для перезаписи")
+        return None
+
+    parquet = path.lower().endswith(('.parquet', '.pq'))
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    print(f"🧪 Генерация {n_rows:,} синтетических поездок (seed={seed}, части по {chunk_rows:,} строк)")
+    print(f"💾 Формат: {'Parquet' if parquet else 'CSV'} → {path}")
+
+    start_time = time.perf_counter()
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    writer = _write_parquet if parquet else _write_csv
+    written = 0
+    try:
+        for rows in writer(iter_synthetic_chunks(n_rows, chunk_rows, seed), tmp_path):
+            written += rows
+            elapsed = time.perf_counter() - start_time
+            print(f"   📈 {written:,} / {n_rows:,} строк ({written / max(elapsed, 1e-9):,.0f} строк/с)")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"✅ Готово за {elapsed:.1f} с, размер файла: {os.path.getsize(path) / 1024**2:.1f} МБ")
+    return path
+
+def main(argv=None):
+    """Командная строка генератора"""
+    parser = argparse.ArgumentParser(description="🧪 Генератор синтетических данных о поездках")
+    parser.add_argument('--rows', type=int, default=SYNTHETIC_ROWS,
+                        help=f'Количество строк (по умолчанию {SYNTHETIC_ROWS})')
+    parser.add_argument('--output', default='transport_data.csv',
+                        help='Путь к файлу: .csv или .parquet (по умолчанию transport_data.csv)')
+    parser.add_argument('--chunk-rows', type=int, default=SYNTHETIC_CHUNK_ROWS,
+                        help=f'Строк в одной части (по умолчанию {SYNTHETIC_CHUNK_ROWS})')
+    parser.add_argument('--seed', type=int, default=RANDOM_STATE,
+                        help=f'Зерно генератора (по умолчанию {RANDOM_STATE})')
+    parser.add_argument('--force', action='store_true',
+                        help='Перезаписать существующий файл')
+    args = parser.parse_args(argv)
+    if write_synthetic_data(args.output, args.rows, args.chunk_rows, args.seed, overwrite=args.force) is None:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Массивы выборки: матрицы признаков float32, целевая переменная float64
+MATRIX_ARRAYS = ('X_train', 'X_test', 'X_train_native', 'X_test_native')
+TARGET_ARRAYS = ('y_train', 'y_test')
+# tmpfs в Linux: файлы живут в оперативной памяти, отображение в память — общая память процессов
+SHARED_MEMORY_DIR = '/dev/shm'
+
+class TrainingData:
+    """Обучающая и тестовая выборки в виде выровненных непрерывных массивов
+
+    Матрицы признаков — C-непрерывные float32, целевая переменная — float64:
+    в таком виде fit, predict и метрики sklearn принимают их без
+    преобразования и копий. Строится один раз в prepare_data и используется
+    всеми моделями. X_train_native / X_test_native — необязательные матрицы
+    с пропусками вместо медиан для моделей, которые обрабатывают их сами.
+    Для пула процессов выборка публикуется в общей памяти через share().
+    """
+
+    def __init__(self, X_train, X_test, y_train, y_test, feature_names):
+        self.X_train = self._matrix(X_train)
+        self.X_test = self._matrix(X_test)
+        self.y_train = np.ascontiguousarray(y_train, dtype=np.float64)
+        self.y_test = np.ascontiguousarray(y_test, dtype=np.float64)
+        self.X_train_native = None
+        self.X_test_native = None
+        self.feature_names = list(feature_names)
+        self._shared_dir = None
+
+    @staticmethod
+    def _matrix(X):
+        # Массив из кэша уже C-непрерывный float32: остается отображением файла без копии
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def set_native(self, X_train_native, X_test_native):
+        """Матрицы с нативными пропусками (строятся один раз и переиспользуются)"""
+        self.X_train_native = self._matrix(X_train_native)
+        self.X_test_native = self._matrix(X_test_native)
+
+    def arrays(self):
+        """Имя -> массив для всех заданных массивов выборки"""
+        return {name: getattr(self, name) for name in MATRIX_ARRAYS + TARGET_ARRAYS
+                if getattr(self, name) is not None}
+
+    @property
+    def nbytes(self):
+        """Объем массивов выборки в байтах"""
+        return sum(array.nbytes for array in self.arrays().values())
+
+    def share(self):
+        """Публикация массивов в общей памяти; возвращает дескриптор для attach() в рабочих процессах
+
+        Массивы записываются один раз в файлы .npy на tmpfs (или во временную
+        папку, если его нет), рабочие процессы отображают их только для чтения.
+        Вместо копии выборки в каждый процесс передается только дескриптор.
+        """
+        if self._shared_dir is None:
+            base_dir = SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else None
+            self._shared_dir = tempfile.mkdtemp(prefix='transport_training_', dir=base_dir)
+            for name, array in self.arrays().items():
+                np.save(os.path.join(self._shared_dir, f"{name}.npy"), array)
+        return {'directory': self._shared_dir, 'arrays': list(self.arrays()), 'feature_names': self.feature_names}
+
+    def release(self):
+        """Удаление опубликованных массивов из общей памяти"""
+        if self._shared_dir is not None:
+            shutil.rmtree(self._shared_dir, ignore_errors=True)
+            self._shared_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # with data: ... — опубликованные массивы удаляются и при ошибке
+        self.release()
+
+    @classmethod
+    def attach(cls, handle):
+        """Выборка из общей памяти по дескриптору share() без копирования (только чтение)"""
+        arrays = {name: np.load(os.path.join(handle['directory'], f"{name}.npy"), mmap_mode='r')
+                  for name in handle['arrays']}
+        data = cls(arrays['X_train'], arrays['X_test'], arrays['y_train'], arrays['y_test'],
+                   handle['feature_names'])
+        if 'X_train_native' in arrays:
+            data.set_native(arrays['X_train_native'], arrays['X_test_native'])
+        return data
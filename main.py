@@ -1,10 +1,15 @@
 import argparse
+import logging
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from algorithms.train_model import main as train_main
-from algorithms.transport_predictor import TransportCostPredictor
+# Тяжелые модули (sklearn, matplotlib, pandas) импортируются внутри нужной команды
+from configuration.settings import (BATCH_CHUNK_SIZE, SERVER_HOST, SERVER_PORT,
+                                    MICROBATCH_WINDOW_MS, MICROBATCH_MAX_ROWS, REPORT_DIR,
+                                    BENCH_ROWS, BENCH_REPEATS, BENCH_REGRESSION_THRESHOLD,
+                                    SYNTHETIC_ROWS, SYNTHETIC_CHUNK_ROWS, RANDOM_STATE, METRICS_ENABLED,
+                                    TUNE_TIME_BUDGET, OUT_OF_CORE_MEMORY_MB)
 
 def launch_web_app():
     """Запуск интерактивного веб-приложения"""
@@ -13,9 +18,13 @@ def launch_web_app():
     print("✨" + "="*68 + "✨")
 
     try:
-        import streamlit
+        import importlib.util
         import subprocess
 
+        # Проверка наличия без импорта: сам streamlit загрузится в дочернем процессе
+        if importlib.util.find_spec('streamlit') is None:
+            raise ImportError('streamlit')
+
         web_app_path = os.path.join(os.path.dirname(__file__), 'web_app.py')
         if not os.path.exists(web_app_path):
             print("❌ Основной файл приложения не обнаружен")
@@ -64,9 +73,23 @@ def main():
         epilog="""
 📋 Примеры использования:
   python main.py train          🏋️  Обучение модели машинного обучения
+  python main.py train --parallel  ⚡ Параллельное обучение всех моделей
+  python main.py train --no-plots  🤖 Обучение без графиков (cron, контейнеры)
+  python main.py train --out-of-core --memory-mb 4096  💽 Обучение на данных больше памяти
+  python main.py update         🔁 Дообучение на дописанных поездках (или полное обучение)
+  python main.py tune --jobs 32 --time-budget 3600  🎛️  Подбор гиперпараметров (successive halving)
   python main.py predict        🔮 Интерактивный режим прогнозирования  
   python main.py predict --batch data.csv  📊 Пакетная обработка файла
+  python main.py predict --batch data.csv --output out.csv --chunksize 100000
   python main.py web            🌐 Запуск веб-интерфейса
+  python main.py serve          🛰️  HTTP сервис предсказаний (JSON API)
+  python main.py compile        ⚡ Компиляция деревьев модели и замер ускорения
+  python main.py lattice        🧮 Решетка цен калькулятора и ее ошибка относительно модели
+  python main.py predict --batch data.csv --metrics -v  📈 Время этапов и подробный журнал
+  python main.py predict --batch data.csv --startup-report  ⏱️  Отчет о времени запуска
+  python main.py generate --rows 1000000 --output rides.csv  🧪 Синтетические данные
+  python main.py bench --output bench.json  📏 Бенчмарк загрузки, обучения и предсказаний
+  python main.py bench --baseline bench.json --threshold 10  🚦 Проверка регрессий
 
 🎯 Возможности системы:
   • Мгновенные прогнозы стоимости транспортных услуг
@@ -78,16 +101,145 @@ def main():
     
     parser.add_argument(
         'action', 
-        choices=['train', 'predict', 'web'], 
+        choices=['train', 'update', 'tune', 'predict', 'web', 'serve', 'compile', 'bench', 'generate', 'lattice'], 
         help='Режим работы системы'
     )
     parser.add_argument(
         '--batch', 
         help='Путь к CSV файлу для массового анализа'
     )
+    parser.add_argument(
+        '--output',
+        help='Путь к файлу результатов (CSV пакетной обработки, JSON бенчмарка, CSV/Parquet генератора)'
+    )
+    parser.add_argument(
+        '--chunksize',
+        type=int,
+        default=BATCH_CHUNK_SIZE,
+        help=f'Количество строк в одном пакете (по умолчанию {BATCH_CHUNK_SIZE})'
+    )
+    parser.add_argument(
+        '--parallel',
+        action='store_true',
+        help='Обучать модели одновременно в пуле процессов'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        help='Количество ядер для обучения (по умолчанию все доступные)'
+    )
+    parser.add_argument(
+        '--out-of-core',
+        action='store_true',
+        help='Обучение на данных больше памяти: потоковый проход и выборка в пределах --memory-mb'
+    )
+    parser.add_argument(
+        '--memory-mb',
+        type=int,
+        default=OUT_OF_CORE_MEMORY_MB,
+        help=f'Бюджет памяти выборок для --out-of-core, МБ (по умолчанию {OUT_OF_CORE_MEMORY_MB})'
+    )
+    parser.add_argument(
+        '--time-budget',
+        type=float,
+        default=TUNE_TIME_BUDGET,
+        help=f'Ограничение времени подбора гиперпараметров, секунды (по умолчанию {TUNE_TIME_BUDGET})'
+    )
+    parser.add_argument(
+        '--no-plots',
+        action='store_true',
+        help='Обучение без построения графиков'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Не использовать кэш предобработанных данных'
+    )
+    parser.add_argument(
+        '--report-dir',
+        help='Сохранить графики обучения в PNG/HTML в указанную папку (без окон)'
+    )
+    parser.add_argument(
+        '--host',
+        default=SERVER_HOST,
+        help=f'Адрес HTTP сервиса (по умолчанию {SERVER_HOST})'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=SERVER_PORT,
+        help=f'Порт HTTP сервиса (по умолчанию {SERVER_PORT})'
+    )
+    parser.add_argument(
+        '--batch-window-ms',
+        type=float,
+        default=MICROBATCH_WINDOW_MS,
+        help=f'Окно сборки микропакета в миллисекундах (по умолчанию {MICROBATCH_WINDOW_MS})'
+    )
+    parser.add_argument(
+        '--batch-max-rows',
+        type=int,
+        default=MICROBATCH_MAX_ROWS,
+        help=f'Максимальный размер микропакета (по умолчанию {MICROBATCH_MAX_ROWS})'
+    )
+    parser.add_argument(
+        '--rows',
+        type=int,
+        help=f'Строк синтетических данных (по умолчанию {BENCH_ROWS} для bench, {SYNTHETIC_ROWS} для generate)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=RANDOM_STATE,
+        help=f'Зерно генератора синтетических данных (по умолчанию {RANDOM_STATE})'
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=BENCH_REPEATS,
+        help=f'Повторов каждого замера бенчмарка (по умолчанию {BENCH_REPEATS})'
+    )
+    parser.add_argument(
+        '--baseline',
+        help='JSON прошлого запуска бенчмарка для сравнения'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=BENCH_REGRESSION_THRESHOLD,
+        help=f'Допустимое замедление относительно базы, %% (по умолчанию {BENCH_REGRESSION_THRESHOLD})'
+    )
+    parser.add_argument(
+        '--metrics',
+        action='store_true',
+        help='Замерять этапы предсказания (predict: таблица в конце, serve: GET /metrics)'
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Выводить журнал модулей (загрузка модели, предупреждения, ход обработки)'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='generate: перезаписать существующий файл данных'
+    )
+    parser.add_argument(
+        '--startup-report',
+        action='store_true',
+        help='Выполнить команду с -X importtime и показать, что замедляет запуск'
+    )
 
     args = parser.parse_args()
 
+    if args.startup_report:
+        from tools.startup import run_with_import_report
+        argv = [arg for arg in sys.argv[1:] if arg != '--startup-report']
+        sys.exit(run_with_import_report(os.path.abspath(__file__), argv))
+
+    # Ошибки и предупреждения модулей выводятся всегда, ход обработки — только с -v
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(message)s')
+
     print("\n" + "🌟" + "="*68 + "🌟")
     print("           🤖 CITY TRANSPORT ANALYTICS SYSTEM")
     print("🌟" + "="*68 + "🌟")
@@ -96,12 +248,35 @@ def main():
         print("\n🏋️  АКТИВАЦИЯ РЕЖИМА ОБУЧЕНИЯ МОДЕЛИ")
         print("📊 Загрузка данных и подготовка функций...")
         print("⚙️  Оптимизация гиперпараметров...")
-        train_main()
+        if args.no_plots:
+            plots = 'none'
+        elif args.report_dir:
+            plots = 'files'
+        else:
+            plots = None  # окна при наличии дисплея, иначе файлы отчета
+        from algorithms.train_model import main as train_main
+        train_main(parallel=args.parallel, n_jobs=args.jobs, plots=plots,
+                   report_dir=args.report_dir or REPORT_DIR, use_cache=not args.no_cache,
+                   out_of_core=args.out_of_core, memory_mb=args.memory_mb)
+
+    elif args.action == 'update':
+        print("\n🔁 АКТИВАЦИЯ РЕЖИМА ДООБУЧЕНИЯ МОДЕЛИ")
+        plots = 'none' if args.no_plots else ('files' if args.report_dir else None)
+        from algorithms.incremental_update import main as update_main
+        update_main(n_jobs=args.jobs, plots=plots, report_dir=args.report_dir or REPORT_DIR,
+                    use_cache=not args.no_cache)
+
+    elif args.action == 'tune':
+        print("\n🎛️  АКТИВАЦИЯ РЕЖИМА ПОДБОРА ГИПЕРПАРАМЕТРОВ")
+        from algorithms.hyperparameter_search import main as tune_main
+        tune_main(n_jobs=args.jobs, time_budget=args.time_budget, use_cache=not args.no_cache)
 
     elif args.action == 'predict':
         print("\n🔮 АКТИВАЦИЯ РЕЖИМА ПРОГНОЗИРОВАНИЯ")
+        from algorithms.transport_predictor import TransportCostPredictor
+        from tools.metrics import Metrics
 
-        predictor = TransportCostPredictor()
+        predictor = TransportCostPredictor(metrics=Metrics() if args.metrics else None)
 
         if predictor.model_data is None:
             print("❌ Модель искусственного интеллекта не обнаружена")
@@ -113,15 +288,58 @@ def main():
         if args.batch:
             print(f"📁 Обработка файла: {args.batch}")
             print("📈 Массовый анализ данных...")
-            predictor.predict_batch(args.batch)
+            if predictor.predict_batch(args.batch, output_file=args.output, chunksize=args.chunksize) is None:
+                # Причина уже выведена в журнал модуля предсказаний
+                sys.exit(1)
         else:
             print("🎮 Запуск интерактивного режима")
             print("💬 Введите параметры поездки для мгновенного прогноза")
             predictor.predict_interactive()
 
+        if predictor.metrics is not None:
+            print("\n📈 Метрики этапов предсказания:")
+            predictor.metrics.print_report()
+
     elif args.action == 'web':
         launch_web_app()
 
+    elif args.action == 'serve':
+        print("\n🛰️  АКТИВАЦИЯ HTTP СЕРВИСА ПРЕДСКАЗАНИЙ")
+        from prediction_server import run_server
+        run_server(args.host, args.port, args.batch_window_ms, args.batch_max_rows,
+                   metrics=args.metrics or METRICS_ENABLED)
+
+    elif args.action == 'compile':
+        print("\n⚡ КОМПИЛЯЦИЯ ДЕРЕВЬЕВ МОДЕЛИ")
+        from algorithms.transport_predictor import MODEL_PATH
+        from algorithms.tree_engine import export_compiled_model
+        if not os.path.exists(MODEL_PATH):
+            print("❌ Модель не найдена. Выполните: python main.py train")
+            return
+        export_compiled_model(MODEL_PATH)
+
+    elif args.action == 'lattice':
+        print("\n🧮 ПОСТРОЕНИЕ РЕШЕТКИ ЦЕН КАЛЬКУЛЯТОРА")
+        from algorithms.price_lattice import build_lattice_for_model
+        if build_lattice_for_model() is None:
+            print("❌ Модель не найдена. Выполните: python main.py train")
+            return
+
+    elif args.action == 'bench':
+        print("\n📏 БЕНЧМАРК ПРОИЗВОДИТЕЛЬНОСТИ")
+        from tools.benchmark import main as bench_main
+        exit_code = bench_main(rows=args.rows or BENCH_ROWS, repeats=args.repeats, output=args.output,
+                               baseline=args.baseline, threshold=args.threshold, seed=args.seed)
+        if exit_code:
+            sys.exit(exit_code)
+
+    elif args.action == 'generate':
+        print("\n🧪 ГЕНЕРАЦИЯ СИНТЕТИЧЕСКИХ ДАННЫХ")
+        from datasets.synthetic_data import write_synthetic_data
+        if write_synthetic_data(args.output or 'transport_data.csv', args.rows or SYNTHETIC_ROWS,
+                                SYNTHETIC_CHUNK_ROWS, args.seed, overwrite=args.force) is None:
+            sys.exit(1)
+
     print("\n" + "✅" + "="*68 + "✅")
     print("           🎉 ОПЕРАЦИЯ УСПЕШНО ВЫПОЛНЕНА!")
     print("✅" + "="*68 + "✅")
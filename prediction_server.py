@@ -0,0 +1,293 @@
+import asyncio
+import json
+import sys
+import os
+
+import numpy as np
+
+# Добавляем путь для импорта модулей
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from algorithms.transport_predictor import TransportCostPredictor
+from configuration.settings import (SERVER_HOST, SERVER_PORT, MICROBATCH_WINDOW_MS,
+                                    MICROBATCH_MAX_ROWS, MAX_REQUEST_BYTES, METRICS_ENABLED)
+from tools.metrics import Metrics
+
+HTTP_STATUS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable'
+}
+
+def parse_content_length(value):
+    """Длина тела запроса из заголовка Content-Length; None для некорректного значения
+
+    Допускаются только десятичные цифры: отрицательные числа, знаки,
+    подчеркивания и пробелы внутри числа отклоняются.
+    """
+    if value is None or value == '':
+        return 0
+    if not (value.isascii() and value.isdigit()):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        # Число длиннее предела преобразования int заведомо больше допустимого размера
+        return float('inf')
+
+class MicroBatcher:
+    """Объединение конкурентных запросов в микропакеты для одного вызова model.predict"""
+
+    def __init__(self, predictor, window_ms=MICROBATCH_WINDOW_MS, max_rows=MICROBATCH_MAX_ROWS):
+        self.predictor = predictor
+        self.window = window_ms / 1000.0
+        self.max_rows = max_rows
+        # Очередь создается сразу: запрос может прийти раньше, чем запустится run()
+        self.queue = asyncio.Queue()
+        self.stats = {'requests': 0, 'rows': 0, 'batches': 0}
+
+    async def predict(self, rows):
+        """Поставить строки в очередь и дождаться их прогнозов"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def run(self):
+        """Цикл сборки микропакетов: ждем первое обращение, затем попутные в пределах окна"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            pending = [await self.queue.get()]
+            n_rows = len(pending[0][0])
+            deadline = loop.time() + self.window
+
+            while n_rows < self.max_rows:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self.queue.get_nowait()
+                pending.append(item)
+                n_rows += len(item[0])
+
+            await self._flush(pending, n_rows)
+
+    async def _flush(self, pending, n_rows):
+        """Один векторизованный вызов модели на весь микропакет"""
+        records = [row for rows, _ in pending for row in rows]
+
+        try:
+            # Повторяющиеся поездки берутся из кэша прогнозов, в модель уходят только новые
+            predictions = await asyncio.get_running_loop().run_in_executor(
+                None, self.predictor.predict_records, records
+            )
+            if predictions is None:
+                raise RuntimeError("Модель не загружена")
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats['requests'] += len(pending)
+        self.stats['rows'] += n_rows
+        self.stats['batches'] += 1
+
+        offset = 0
+        for rows, future in pending:
+            chunk = predictions[offset:offset + len(rows)]
+            offset += len(rows)
+            if not future.done():
+                # NaN и ±inf недопустимы в JSON — строки без прогноза возвращаются как null
+                future.set_result([float(value) if np.isfinite(value) else None for value in chunk])
+
+class PredictionServer:
+    """Минимальный asyncio HTTP/1.1 сервер предсказаний стоимости поездок"""
+
+    def __init__(self, predictor, host=SERVER_HOST, port=SERVER_PORT,
+                 window_ms=MICROBATCH_WINDOW_MS, max_rows=MICROBATCH_MAX_ROWS):
+        self.predictor = predictor
+        self.host = host
+        self.port = port
+        self.batcher = MicroBatcher(predictor, window_ms, max_rows)
+
+    async def serve(self):
+        """Запуск сервера и цикла микропакетов"""
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+
+        print(f"🌍 Сервис предсказаний слушает http://{self.host}:{self.port}")
+        print(f"   ⚙️  Микропакеты: окно {self.batcher.window * 1000:.1f} мс, до {self.batcher.max_rows} строк")
+        print("   📍 GET /health, POST /predict, POST /predict/batch")
+        if self.predictor.metrics is not None:
+            print("   📈 GET /metrics (Prometheus), GET /metrics/json")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+
+    async def handle_connection(self, reader, writer):
+        """Обработка соединения с поддержкой keep-alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Некорректная строка запроса'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (version == 'HTTP/1.1'
+                              and headers.get('connection', '').lower() != 'close')
+
+                length = parse_content_length(headers.get('content-length'))
+                if length is None:
+                    await self._respond(writer, 400, {'error': 'Некорректный заголовок Content-Length'}, False)
+                    break
+                if length > MAX_REQUEST_BYTES:
+                    await self._respond(writer, 413, {'error': 'Слишком большой запрос'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self.dispatch(method, target.split('?', 1)[0], body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        """Маршрутизация запросов"""
+        routes = {
+            '/health': ('GET', self.health),
+            '/metrics': ('GET', self.metrics_prometheus),
+            '/metrics/json': ('GET', self.metrics_json),
+            '/predict': ('POST', self.predict_single),
+            '/predict/batch': ('POST', self.predict_bulk)
+        }
+        if path not in routes:
+            return 404, {'error': f'Неизвестный путь: {path}'}
+
+        expected_method, handler = routes[path]
+        if method != expected_method:
+            return 405, {'error': f'Ожидается метод {expected_method}'}
+
+        if method == 'GET':
+            return await handler()
+
+        if self.predictor.model_data is None:
+            return 503, {'error': 'Модель не загружена. Выполните: python main.py train'}
+
+        try:
+            data = json.loads(body or b'null')
+        except ValueError as e:
+            return 400, {'error': f'Некорректный JSON: {e}'}
+
+        try:
+            return await handler(data)
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def health(self):
+        """Состояние сервиса и статистика микропакетов"""
+        stats = dict(self.batcher.stats)
+        stats['avg_batch_rows'] = stats['rows'] / stats['batches'] if stats['batches'] else 0.0
+        model_data = self.predictor.model_data or {}
+        return 200, {
+            'status': 'ok' if self.predictor.model_data is not None else 'no_model',
+            'model': model_data.get('model_name'),
+            'features': self.predictor.feature_names,
+            'microbatching': stats,
+            'prediction_cache': self.predictor.cache_stats()
+        }
+
+    async def metrics_prometheus(self):
+        """Метрики этапов предсказания в текстовом формате Prometheus"""
+        if self.predictor.metrics is None:
+            return 404, {'error': 'Метрики выключены. Запустите: python main.py serve --metrics'}
+        return 200, self.predictor.metrics.to_prometheus()
+
+    async def metrics_json(self):
+        """Метрики этапов предсказания в JSON"""
+        if self.predictor.metrics is None:
+            return 404, {'error': 'Метрики выключены. Запустите: python main.py serve --metrics'}
+        return 200, self.predictor.metrics.to_dict()
+
+    async def predict_single(self, data):
+        """Прогноз для одной поездки: {"Ride Distance": ..., ...}"""
+        if not isinstance(data, dict):
+            return 400, {'error': 'Ожидается JSON объект с параметрами поездки'}
+        predictions = await self.batcher.predict([data])
+        return 200, {'prediction': predictions[0]}
+
+    async def predict_bulk(self, data):
+        """Прогноз для списка поездок: [{...}, ...] или {"rides": [...]}"""
+        rides = data.get('rides') if isinstance(data, dict) else data
+        if not isinstance(rides, list) or not all(isinstance(ride, dict) for ride in rides):
+            return 400, {'error': 'Ожидается список JSON объектов или {"rides": [...]}'}
+        if not rides:
+            return 200, {'predictions': [], 'count': 0}
+        predictions = await self.batcher.predict(rides)
+        return 200, {'predictions': predictions, 'count': len(predictions)}
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        """Отправка ответа: JSON для объектов, text/plain для строк (формат Prometheus)"""
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {HTTP_STATUS.get(status, 'Unknown')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+def run_server(host=SERVER_HOST, port=SERVER_PORT,
+               window_ms=MICROBATCH_WINDOW_MS, max_rows=MICROBATCH_MAX_ROWS, metrics=METRICS_ENABLED):
+    """Загрузка модели один раз и запуск сервиса"""
+    predictor = TransportCostPredictor(metrics=Metrics() if metrics else None)
+    if predictor.model_data is None:
+        print("❌ Модель не загружена. Выполните: python main.py train")
+        return
+
+    async def serve():
+        # Сервер и очередь микропакетов создаются внутри цикла событий, в котором работают
+        await PredictionServer(predictor, host, port, window_ms, max_rows).serve()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n🛑 Сервис предсказаний остановлен")
+
+if __name__ == "__main__":
+    run_server()
@@ -1,6 +1,8 @@
 import sys
 import subprocess
 import os
+import importlib.util
+from importlib import metadata
 
 def check_requirements():
     required_packages = [
@@ -13,10 +15,9 @@ def check_requirements():
     ]
     missing_packages = []
 
+    # Поиск спецификации модуля вместо импорта: проверка занимает миллисекунды
     for name, import_name in required_packages:
-        try:
-            __import__(import_name)
-        except ImportError:
+        if importlib.util.find_spec(import_name) is None:
             missing_packages.append(name)
 
     if missing_packages:
@@ -27,7 +28,7 @@ def check_requirements():
         print("   pip install -r requirements.txt")
         return False
 
-    print("✅ Все зависимости успешно загружены")
+    print("✅ Все зависимости установлены")
     return True
 
 def check_model():
@@ -48,17 +49,15 @@ def system_diagnostics():
     print(f"   🐍 Версия Python: {sys.version.split()[0]}")
     print(f"   💻 Платформа: {sys.platform}")
     
-    # Проверка доступности основных модулей
+    # Версии из метаданных установленных пакетов, без импорта самих модулей
     try:
-        import streamlit
-        print(f"   🌐 Streamlit: {streamlit.__version__}")
-    except:
+        print(f"   🌐 Streamlit: {metadata.version('streamlit')}")
+    except metadata.PackageNotFoundError:
         print("   🌐 Streamlit: ❌ Не доступен")
     
     try:
-        import pandas
-        print(f"   📊 Pandas: {pandas.__version__}")
-    except:
+        print(f"   📊 Pandas: {metadata.version('pandas')}")
+    except metadata.PackageNotFoundError:
         print("   📊 Pandas: ❌ Не доступен")
 
 def main():
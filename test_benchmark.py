@@ -0,0 +1,51 @@
+import json
+import sys
+
+import pytest
+
+from tools import benchmark
+
+def _report(timings, commit='abc1234'):
+    return {'meta': {'commit': commit},
+            'results': {name: {'median_s': value} for name, value in timings.items()}}
+
+def test_measure_reports_timings():
+    result = benchmark.measure(lambda: sum(range(1000)), repeats=5)
+    assert result['repeats'] == 5
+    assert 0 < result['min_s'] <= result['median_s'] <= result['p95_s']
+    assert result['peak_mb'] >= 0
+
+def test_compare_results_threshold():
+    """Регрессия — только замедление медианы больше порога; новые замеры не считаются"""
+    baseline = _report({'load_data': 1.0, 'predict': 0.010, 'removed': 1.0})
+    current = _report({'load_data': 1.05, 'predict': 0.012, 'new_case': 5.0})
+    regressions = benchmark.compare_results(current, baseline, threshold=10.0)
+    assert [regression['name'] for regression in regressions] == ['predict']
+    assert regressions[0]['change_pct'] == pytest.approx(20.0)
+    assert benchmark.compare_results(current, baseline, threshold=25.0) == []
+
+def test_main_exit_code_and_output(monkeypatch, tmp_path):
+    """main сохраняет отчет и возвращает 1 при регрессии относительно базы"""
+    baseline_path = tmp_path / 'baseline.json'
+    baseline_path.write_text(json.dumps(_report({'predict': 0.010})), encoding='utf-8')
+    output_path = tmp_path / 'nested' / 'current.json'
+
+    monkeypatch.setattr(benchmark, 'run_benchmarks', lambda **kwargs: _report({'predict': 0.020}))
+    assert benchmark.main(output=str(output_path), baseline=str(baseline_path)) == 1
+    assert json.loads(output_path.read_text(encoding='utf-8'))['results']['predict']['median_s'] == 0.020
+
+    monkeypatch.setattr(benchmark, 'run_benchmarks', lambda **kwargs: _report({'predict': 0.0105}))
+    assert benchmark.main(output=str(output_path), baseline=str(baseline_path)) == 0
+
+def test_run_benchmarks_covers_all_stages(small_model_params):
+    """Небольшой полный прогон: замеры всех этапов и описание окружения"""
+    report = benchmark.run_benchmarks(rows=600, repeats=1, train_repeats=1, predict_sizes=[1, 50])
+    expected = {'load_data', 'preprocess_data', 'create_features', 'trainer.prepare_data', 'predictor.load_model',
+                'predict_booking_value[dict]', 'predict_booking_value[dict, cached]',
+                'predict_booking_value[1]', 'predict_booking_value[50]'}
+    expected.update(f'trainer.{method}' for method in benchmark.TRAIN_METHODS)
+    assert set(report['results']) == expected
+    assert report['meta']['rows'] == 600 and report['meta']['repeats'] == 1
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,36 @@
+import sys
+
+import numpy as np
+import pytest
+
+from datasets.data_fetcher import (TARGET_COLUMN, TRAINING_COLUMNS, USEFUL_FEATURES,
+                                   load_data, load_training_data, preprocess_data)
+
+def test_load_data_prunes_columns(training_csv):
+    """С columns читаются только нужные колонки компактных типов"""
+    df = load_data(training_csv, columns=TRAINING_COLUMNS)
+    assert sorted(df.columns) == sorted(TRAINING_COLUMNS)
+    assert all(df[column].dtype == np.float32 for column in USEFUL_FEATURES)
+    assert df[TARGET_COLUMN].dtype == np.float64
+
+    chunks = list(load_data(training_csv, columns=TRAINING_COLUMNS, chunksize=700))
+    assert [len(chunk) for chunk in chunks[:-1]] == [700] * (len(chunks) - 1)
+    assert sum(len(chunk) for chunk in chunks) == len(df)
+
+@pytest.mark.parametrize('chunksize', [None, 1, 257, 10 ** 6])
+def test_load_training_data_matches_preprocess(training_csv, chunksize):
+    """Потоковая загрузка дает то же, что preprocess_data(load_data()), при любом размере частей"""
+    expected_X, expected_y = preprocess_data(load_data(training_csv))
+    X, y, missing = load_training_data(training_csv, chunksize=chunksize, return_missing=True)
+
+    assert list(X.columns) == USEFUL_FEATURES
+    assert X.dtypes.eq(np.float32).all()
+    np.testing.assert_array_equal(y.to_numpy(), expected_y.to_numpy())
+    # Медианы считаются по float32, исходный путь — по float64
+    np.testing.assert_allclose(X.to_numpy(), expected_X.to_numpy(), rtol=1e-6)
+    raw = load_data(training_csv).dropna(subset=[TARGET_COLUMN])
+    np.testing.assert_array_equal(missing, raw[USEFUL_FEATURES].isna().to_numpy())
+    assert missing.any()
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,66 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from datasets.dataset_cache import SPLIT_ARRAYS, load_or_build_split
+
+def _make_split(seed):
+    rng = np.random.default_rng(seed)
+    split = {name: rng.random((20, 3)).astype(np.float32) for name in ('X_train', 'X_test')}
+    split.update(y_train=rng.random(20), y_test=rng.random(20),
+                 missing_train=np.zeros((20, 3), dtype=bool), missing_test=np.ones((20, 3), dtype=bool),
+                 feature_names=['a', 'b', 'c'], pipeline={'medians': [1.0, 2.0, 3.0]})
+    return split
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'rides.csv'
+    path.write_text('a,b\n1,2\n', encoding='utf-8')
+    return path
+
+def test_cache_hit_returns_same_split(source, tmp_path):
+    """Повторный вызов не строит разбиение заново и отдает те же данные через mmap"""
+    cache_dir = str(tmp_path / 'cache')
+    builds = []
+
+    def build():
+        builds.append(1)
+        return _make_split(0)
+
+    first = load_or_build_split(str(source), {'test_size': 0.2}, build, cache_dir)
+    second = load_or_build_split(str(source), {'test_size': 0.2}, build, cache_dir)
+    assert len(builds) == 1
+    assert not first['cache_hit'] and second['cache_hit']
+    assert first['cache_key'] == second['cache_key']
+    for name in SPLIT_ARRAYS:
+        assert isinstance(second[name], np.memmap)
+        np.testing.assert_array_equal(second[name], first[name])
+    assert second['feature_names'] == ['a', 'b', 'c']
+    assert second['pipeline'] == {'medians': [1.0, 2.0, 3.0]}
+    assert 'source' not in second and 'created' not in second
+
+def test_cache_invalidated_by_config_and_content(source, tmp_path):
+    """Другие параметры или измененный файл — промах; устаревшая запись файла удаляется"""
+    cache_dir = str(tmp_path / 'cache')
+    builds = []
+
+    def build():
+        builds.append(1)
+        return _make_split(len(builds))
+
+    first = load_or_build_split(str(source), {'test_size': 0.2}, build, cache_dir)
+    other_config = load_or_build_split(str(source), {'test_size': 0.3}, build, cache_dir)
+    assert len(builds) == 2 and other_config['cache_key'] != first['cache_key']
+
+    source.write_text('a,b\n1,2\n3,4\n', encoding='utf-8')
+    changed = load_or_build_split(str(source), {'test_size': 0.3}, build, cache_dir)
+    assert len(builds) == 3 and not changed['cache_hit']
+    np.testing.assert_array_equal(changed['X_train'], _make_split(3)['X_train'])
+
+    entries = sorted(name for name in os.listdir(cache_dir) if name != 'hashes.json')
+    assert entries == [changed['cache_key']]
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
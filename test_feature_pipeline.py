@@ -0,0 +1,66 @@
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasets.data_fetcher import USEFUL_FEATURES, create_features
+from datasets.feature_pipeline import CATEGORY_BUCKETS, DERIVED_FEATURES, FeatureTransformer
+
+# Значения на границах корзин, за их пределами и нулевое расстояние
+EDGE_ROWS = [
+    [10.0, 3.0, 4.5, 0.0, 0.0],
+    [0.0, 5.0, 0.0, 12.5, 30.0],
+    [50.0, 4.0, 5.5, 7.0, 1e-3],
+    [1e4, 6.0, -1.0, 99.0, 99.0],
+]
+
+@pytest.fixture(scope='module')
+def pipeline(rides):
+    return FeatureTransformer(USEFUL_FEATURES).fit(rides[USEFUL_FEATURES])
+
+def test_transform_matches_create_features(pipeline, rides):
+    """Матрица преобразования совпадает с признаками create_features, корзины — с их метками"""
+    X = rides[USEFUL_FEATURES].dropna().reset_index(drop=True)
+    matrix = pipeline.transform(X)
+    assert matrix.dtype == np.float32 and matrix.flags['F_CONTIGUOUS']
+    assert matrix.shape == (len(X), len(pipeline.feature_names))
+
+    frame = create_features(X, verbose=False)
+    for name in USEFUL_FEATURES + list(DERIVED_FEATURES):
+        np.testing.assert_allclose(matrix[:, pipeline.feature_names.index(name)], frame[name], rtol=1e-5, atol=1e-5)
+    for category, (_, _, labels) in CATEGORY_BUCKETS.items():
+        codes = matrix[:, pipeline.feature_names.index(category)].astype(int)
+        assert list(np.array(labels + ['nan'], dtype=object)[codes]) == list(frame[category])
+
+def test_transform_row_matches_transform(pipeline, rides):
+    """Построчное преобразование без numpy дает ровно те же float32, что и векторизованное"""
+    rows = rides[USEFUL_FEATURES].dropna().head(200).to_numpy(dtype=np.float64).tolist() + EDGE_ROWS
+    expected = pipeline.transform(np.asarray(rows))
+    out = np.empty(len(pipeline.feature_names), dtype=np.float32)
+    for row, expected_row in zip(rows, expected):
+        np.testing.assert_array_equal(pipeline.transform_row(row, out), expected_row)
+
+def test_state_round_trip(pipeline, rides):
+    """to_dict/from_dict и pickle восстанавливают то же преобразование"""
+    X = rides[USEFUL_FEATURES].head(300)
+    expected = pipeline.transform(X)
+    for restored in (FeatureTransformer.from_dict(pipeline.to_dict()), pickle.loads(pickle.dumps(pipeline))):
+        assert restored.feature_names == pipeline.feature_names
+        np.testing.assert_array_equal(restored.medians, pipeline.medians)
+        np.testing.assert_array_equal(restored.transform(X), expected)
+
+def test_impute_and_named_columns(pipeline):
+    """Пропуски заполняются медианами; one-hot и неизвестные колонки — как в прежнем reindex"""
+    X = np.array([[np.nan, 4.2, np.nan, 5.0, 10.0]], dtype=np.float32)
+    assert pipeline.impute(X) == {'Ride Distance': 1, 'Customer Rating': 1}
+    assert X[0, 0] == pipeline.medians[0] and X[0, 2] == pipeline.medians[2]
+
+    names = ['Ride Distance', 'distance_category_short', 'distance_category_nan', 'unknown']
+    legacy = FeatureTransformer(USEFUL_FEATURES, names)
+    values = pd.DataFrame([[5.0, 4.0, 4.0, 1.0, 1.0], [np.nan, 4.0, 4.0, 1.0, 1.0]], columns=USEFUL_FEATURES)
+    np.testing.assert_array_equal(legacy.transform(values), [[5.0, 1.0, 0.0, 0.0], [np.nan, 0.0, 1.0, 0.0]])
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
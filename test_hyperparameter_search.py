@@ -0,0 +1,39 @@
+import sys
+import time
+
+import pytest
+
+from configuration.settings import TUNE_SPACES, TUNE_VALIDATION_SIZE
+from algorithms.hyperparameter_search import halving_schedule, successive_halving
+
+def test_halving_schedule():
+    """Кандидатов в каждом раунде в factor раз меньше, строк — больше, последний раунд на всех строках"""
+    assert halving_schedule(27, 90000, factor=3, min_rows=1000) == [
+        (27, 3333), (9, 10000), (3, 30000), (1, 90000)]
+    assert halving_schedule(9, 3000, factor=3, min_rows=1000) == [(9, 1000), (3, 1000), (1, 3000)]
+
+def test_hist_gradient_boosting_is_tuned(training_data):
+    """Для Hist Gradient Boosting есть пространство поиска, и подбор возвращает параметры из него"""
+    _, X, y, _ = training_data
+    space = TUNE_SPACES['hist_gradient_boosting']
+    search = successive_halving(X, y, model_keys=['hist_gradient_boosting'], n_candidates=3,
+                                min_rows=500, time_budget=None, n_jobs=1)
+    result = search['models']['hist_gradient_boosting']
+    assert not search['timed_out']
+    assert result['rows'] == len(X) - int(len(X) * TUNE_VALIDATION_SIZE)
+    assert result['is_default'] or all(result['params'][name] in values for name, values in space.items())
+
+def test_time_budget_stops_running_candidates(training_data):
+    """При исчерпании бюджета начатые задачи прерываются, а не дожидаются завершения"""
+    _, X, y, _ = training_data
+    slow = {'random_forest': {'n_estimators': [3000, 4000], 'max_depth': [None]}}
+    budget = 1.0
+    start_time = time.perf_counter()
+    search = successive_halving(X, y, model_keys=['random_forest'], spaces=slow, n_candidates=2,
+                                min_rows=len(X), time_budget=budget, n_jobs=1)
+    assert search['timed_out']
+    assert search['models'] == {}
+    assert time.perf_counter() - start_time < budget + 5
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
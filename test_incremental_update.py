@@ -0,0 +1,84 @@
+import sys
+
+import numpy as np
+import pytest
+
+from datasets.data_fetcher import USEFUL_FEATURES, TARGET_COLUMN, data_watermark, load_training_data
+from datasets.feature_pipeline import FeatureTransformer
+from datasets.synthetic_data import generate_dataset
+from algorithms.model_store import load_model_artifact, save_model_artifact, linear_sufficient_stats
+from algorithms.incremental_update import update_model
+
+@pytest.fixture
+def linear_artifact(tmp_path):
+    """Файл данных и артефакт линейной модели, обученной на нем с отметкой данных"""
+    from sklearn.linear_model import LinearRegression
+
+    data_path = tmp_path / 'rides.csv'
+    model_path = str(tmp_path / 'model.joblib')
+    generate_dataset(3000).to_csv(data_path, index=False)
+
+    pipeline = FeatureTransformer(USEFUL_FEATURES)
+    X_raw, y = load_training_data(str(data_path), pipeline=pipeline)
+    X = pipeline.transform(X_raw)
+    model = LinearRegression().fit(X, y)
+    importance = {'features': pipeline.feature_names, 'importances_mean': np.ones(X.shape[1]),
+                  'importances_std': np.zeros(X.shape[1]), 'n_repeats': 1}
+    save_model_artifact({
+        'model': model,
+        'feature_names': pipeline.feature_names,
+        'feature_pipeline': pipeline,
+        'model_name': 'linear_regression',
+        # Низкий эталон: проверка качества на новых строках всегда проходит
+        'metrics': {'Test R2': 0.0, 'Test MAE': 50.0},
+        'data_watermark': data_watermark(str(data_path)),
+        'linear_stats': linear_sufficient_stats(X, y.to_numpy()),
+        'permutation_importance': importance
+    }, model_path)
+    return data_path, model_path
+
+def test_update_folds_all_rows_and_advances_watermark(linear_artifact):
+    """Все новые строки, включая отложенные, попадают в суммы; отметка сдвигается на конец файла"""
+    data_path, model_path = linear_artifact
+    before = dict(load_model_artifact(model_path, mmap_mode=None, use_registry=False))
+    appended = generate_dataset(1000, seed=7)
+    appended.to_csv(data_path, mode='a', header=False, index=False)
+    new_rows = int(appended[TARGET_COLUMN].notna().sum())
+
+    result = update_model(model_path, str(data_path))
+    assert result['status'] == 'updated' and result['rows'] == new_rows
+
+    after = dict(load_model_artifact(model_path, mmap_mode=None, use_registry=False))
+    assert after['linear_stats']['rows'] == before['linear_stats']['rows'] + new_rows
+    assert after['data_watermark'] == data_watermark(str(data_path))
+    solution = np.linalg.lstsq(after['linear_stats']['xtx'], after['linear_stats']['xty'], rcond=None)[0]
+    np.testing.assert_allclose(after['model'].coef_, solution[:-1])
+
+    # Важность полного обучения не заменяется важностью проверочной модели
+    np.testing.assert_array_equal(after['permutation_importance']['importances_mean'],
+                                  before['permutation_importance']['importances_mean'])
+    assert after['incremental']['holdout_permutation_importance']['n_rows'] < new_rows
+
+    # Повторный запуск без новых строк ничего не меняет
+    assert update_model(model_path, str(data_path))['status'] == 'no_data'
+
+def test_partial_fit_medians_match_full_fit():
+    """Медианы после дообучения по частям близки к медианам всех строк, а не к среднему медиан частей"""
+    first = generate_dataset(4000)[USEFUL_FEATURES].to_numpy(dtype=np.float32)
+    # Новые строки с другим распределением: среднее медиан частей было бы заметно смещено
+    second = generate_dataset(2000, seed=7)[USEFUL_FEATURES].to_numpy(dtype=np.float32) * 1.5
+    pipeline = FeatureTransformer(USEFUL_FEATURES).fit(first).partial_fit(second)
+    exact = FeatureTransformer(USEFUL_FEATURES).fit(np.concatenate([first, second]))
+    for index in range(len(USEFUL_FEATURES)):
+        column = np.concatenate([first, second])[:, index]
+        column = np.sort(column[~np.isnan(column)])
+        # Ошибка ранга эскиза порядка 1/size: медиана лежит между квантилями 0.49 и 0.51
+        low, high = column[int(len(column) * 0.49)], column[int(len(column) * 0.51)]
+        assert low <= pipeline.medians[index] <= high
+    np.testing.assert_array_equal(pipeline.counts, exact.counts)
+
+    restored = FeatureTransformer.from_dict(pipeline.to_dict())
+    np.testing.assert_array_equal(restored.sketches[0].means, pipeline.sketches[0].means)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
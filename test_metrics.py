@@ -0,0 +1,47 @@
+import sys
+import threading
+
+import pytest
+
+from tools.metrics import Metrics
+
+@pytest.fixture
+def metrics():
+    return Metrics(prefix='test', buckets=[0.001, 0.01, 0.1])
+
+def test_single_observation_quantiles(metrics):
+    """Один замер дает ровно его значение во всех квантилях"""
+    metrics.observe('predict', 0.00112)
+    stage = metrics.to_dict()['stages']['predict']
+    assert stage['count'] == 1
+    assert stage['p50_s'] == stage['p95_s'] == stage['p99_s'] == pytest.approx(0.00112)
+
+def test_quantiles_within_observed_range(metrics):
+    """Квантили монотонны и не выходят за наблюдавшиеся минимум и максимум, включая корзину +Inf"""
+    for seconds in (0.0004, 0.002, 0.003, 0.05, 0.4, 2.5):
+        metrics.observe('predict', seconds)
+    stage = metrics.to_dict()['stages']['predict']
+    assert stage['min_s'] == 0.0004 and stage['max_s'] == 2.5
+    assert stage['min_s'] <= stage['p50_s'] <= stage['p95_s'] <= stage['p99_s'] <= stage['max_s']
+    assert stage['buckets'] == {'0.001': 1, '0.01': 3, '0.1': 4, '+Inf': 6}
+
+def test_shards_are_summed(metrics):
+    """Замеры и счетчики из разных потоков суммируются при выгрузке"""
+    def work():
+        for _ in range(100):
+            metrics.observe('predict', 0.005)
+            metrics.count('requests', 'single')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = metrics.to_dict()
+    assert report['stages']['predict']['count'] == 400
+    assert report['counters'] == {'requests': {'single': 400}}
+    assert 'test_stage_seconds_count{stage="predict"} 400' in metrics.to_prometheus()
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
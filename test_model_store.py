@@ -0,0 +1,94 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import joblib
+import numpy as np
+import pytest
+
+from datasets.data_fetcher import USEFUL_FEATURES
+from algorithms.model_store import (ModelArtifact, clear_model_registry, load_model_artifact, model_registry_info,
+                                    save_model_artifact)
+from algorithms.transport_predictor import TransportCostPredictor
+
+def test_estimator_is_unpickled_on_first_access(model_path, training_data):
+    """Загрузка не распаковывает оценщик; распакованный дает те же прогнозы, что и обученный"""
+    _, X, _, _ = training_data
+    artifact = load_model_artifact(model_path, use_registry=False)
+    assert isinstance(artifact, ModelArtifact)
+    assert 'model' in artifact and not artifact.model_loaded
+    assert 'estimator' not in artifact and 'estimator' not in list(artifact)
+
+    model = artifact['model']
+    assert artifact.model_loaded and artifact['model'] is model
+    expected = joblib.load(model_path)['linear_coefficients']
+    if expected is not None:
+        np.testing.assert_allclose(model.predict(X), X @ expected['coef'] + expected['intercept'], rtol=1e-6)
+
+def test_estimator_arrays_are_memory_mapped(forest_model_path, forest, training_data):
+    """Массивы оценщика лежат в артефакте отдельными буферами и отображаются в память"""
+    _, X, _, _ = training_data
+    raw = joblib.load(forest_model_path, mmap_mode='r')
+    assert 'model' not in raw
+    buffers = raw['estimator']['buffers']
+    # Узлы деревьев вынесены из pickle: сам pickle много меньше буферов
+    assert sum(buffer.nbytes for buffer in buffers) > 10 * len(raw['estimator']['pickle'])
+    assert all(isinstance(buffer, np.memmap) for buffer in buffers if buffer.nbytes)
+
+    artifact = load_model_artifact(forest_model_path, mmap_mode='r', use_registry=False)
+    np.testing.assert_array_equal(artifact['model'].predict(X), forest.predict(X))
+
+def test_resave_and_legacy_format(forest_model_path, forest, training_data, tmp_path):
+    """dict(artifact) содержит сам оценщик и сохраняется снова; старый формат с 'model' тоже читается"""
+    _, X, _, _ = training_data
+    model_data = dict(load_model_artifact(forest_model_path, mmap_mode=None, use_registry=False))
+    assert 'estimator' not in model_data
+    resaved = str(tmp_path / 'resaved.joblib')
+    save_model_artifact(model_data, resaved)
+    np.testing.assert_array_equal(load_model_artifact(resaved, use_registry=False)['model'].predict(X),
+                                  forest.predict(X))
+
+    legacy = str(tmp_path / 'legacy.joblib')
+    joblib.dump({'model': forest, 'model_name': 'random_forest'}, legacy)
+    artifact = load_model_artifact(legacy, use_registry=False)
+    assert artifact.model_loaded and list(artifact) == ['model', 'model_name']
+
+def test_registry_reuses_artifact_until_file_changes(linear_model_path, tmp_path):
+    """Реестр отдает один и тот же артефакт всем загрузкам, пока файл не изменится"""
+    path = str(tmp_path / 'model.joblib')
+    shutil.copy(linear_model_path, path)
+    clear_model_registry()
+    try:
+        first = load_model_artifact(path)
+        assert load_model_artifact(path) is first
+        assert TransportCostPredictor(path, cache_size=0).model_data is first
+        assert load_model_artifact(path, use_registry=False) is not first
+        assert model_registry_info()[os.path.abspath(path)]['mmap_mode'] == 'r'
+
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        reloaded = load_model_artifact(path)
+        assert reloaded is not first and load_model_artifact(path) is reloaded
+        assert load_model_artifact(path, mmap_mode=None) is not reloaded
+    finally:
+        clear_model_registry()
+    assert model_registry_info() == {}
+
+def test_prediction_does_not_import_sklearn(model_path, rides):
+    """Загрузка артефакта и одиночный прогноз в новом процессе не импортируют sklearn"""
+    ride = {name: float(value) for name, value in rides[USEFUL_FEATURES].dropna().iloc[0].items()}
+    code = (
+        "import sys\n"
+        "from algorithms.transport_predictor import TransportCostPredictor\n"
+        f"predictor = TransportCostPredictor({model_path!r}, cache_size=0)\n"
+        f"print(predictor.predict_booking_value({ride!r})[0])\n"
+        "assert not predictor.model_data.model_loaded\n"
+        "assert 'sklearn' not in sys.modules, 'sklearn imported'\n"
+    )
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,56 @@
+import sys
+
+import numpy as np
+import pytest
+
+from datasets.quantile_sketch import QuantileSketch
+from datasets.out_of_core import stream_split_sample
+from datasets.synthetic_data import generate_dataset
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+def _rank_error(sorted_values, estimate, q):
+    """Расстояние от q до диапазона рангов оценки (доля значений)"""
+    low = np.searchsorted(sorted_values, estimate, 'left') / len(sorted_values)
+    high = np.searchsorted(sorted_values, estimate, 'right') / len(sorted_values)
+    return 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+
+@pytest.mark.parametrize('chunk_rows', [997, 20000, 200000])
+def test_sketch_rank_error_bound(chunk_rows):
+    """Ошибка ранга квантилей не больше 1/size при любом разбиении на части и слиянии эскизов частей"""
+    size = 200
+    values = np.random.default_rng(0).lognormal(3.0, 1.0, 200000)
+    values[::50] = np.nan
+    exact = np.sort(values[~np.isnan(values)])
+
+    updated = QuantileSketch(size)
+    merged = QuantileSketch(size)
+    for start in range(0, len(values), chunk_rows):
+        updated.update(values[start:start + chunk_rows])
+        merged.merge(QuantileSketch(size).update(values[start:start + chunk_rows]))
+
+    for sketch in (updated, merged):
+        assert sketch.count == len(exact) and len(sketch.means) <= size
+        for q in QUANTILES:
+            assert _rank_error(exact, sketch.quantile(q), q) <= 1.0 / size
+
+def test_sketch_small_and_empty():
+    """Пока значений не больше size, эскиз хранит их точно; пустой эскиз дает NaN"""
+    assert np.isnan(QuantileSketch().quantile(0.5))
+    sketch = QuantileSketch(10).update([3.0, 1.0, np.nan, 2.0])
+    assert sketch.count == 3 and sketch.quantile(0.5) == 2.0
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.size == 10 and restored.quantile(0.5) == 2.0
+
+def test_stream_sample_independent_of_chunk_size(tmp_path):
+    """Разбиение train/test и выборки по хэшу не зависят от размера читаемых частей"""
+    path = tmp_path / 'rides.csv'
+    generate_dataset(3000).to_csv(path, index=False)
+    results = [stream_split_sample(str(path), 500, 150, chunksize=chunksize) for chunksize in (3000, 257)]
+    for part in ('X_train', 'y_train', 'X_test', 'y_test'):
+        np.testing.assert_array_equal(results[0][part], results[1][part])
+    assert len(results[0]['y_train']) == 500 and len(results[0]['y_test']) == 150
+    assert results[0]['train_rows'] + results[0]['test_rows'] <= results[0]['rows'] == 3000
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,30 @@
+import sys
+
+import numpy as np
+import pytest
+
+from algorithms.permutation_importance import _worker, permutation_importance
+
+def test_parallel_matches_serial(forest, training_data):
+    """Результат не зависит от числа процессов: генератор задан признаком и повтором"""
+    _, X, y, pipeline = training_data
+    serial = permutation_importance(forest, X, y, pipeline.feature_names, n_repeats=3, n_jobs=1)
+    parallel = permutation_importance(forest, X, y, pipeline.feature_names, n_repeats=3, n_jobs=2)
+    np.testing.assert_array_equal(parallel['importances_mean'], serial['importances_mean'])
+    np.testing.assert_array_equal(parallel['importances_std'], serial['importances_std'])
+    assert parallel['baseline_score'] == serial['baseline_score']
+    assert serial['features'] == pipeline.feature_names and serial['n_rows'] == len(X)
+    # Модель вызывающего кода не меняется, данные рабочего процесса не остаются
+    assert forest.get_params()['n_jobs'] is None and not _worker
+
+def test_informative_feature_and_row_limit(forest, training_data):
+    """Расстояние важнее шумового признака; выборка ограничивается max_rows"""
+    _, X, y, pipeline = training_data
+    result = permutation_importance(forest, X, y, pipeline.feature_names, n_repeats=2, n_jobs=1, max_rows=500)
+    assert result['n_rows'] == 500
+    importance = dict(zip(result['features'], result['importances_mean']))
+    assert importance['Ride Distance'] == max(importance.values())
+    assert importance['Ride Distance'] > 0.1
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from configuration.settings import MAX_REQUEST_BYTES, PREDICTION_COLUMN
+from datasets.data_fetcher import USEFUL_FEATURES
+from algorithms.transport_predictor import TransportCostPredictor
+from prediction_server import PredictionServer, parse_content_length
+
+async def _exchange(predictor, raw_request):
+    """Один запрос к серверу на свободном порту: (код ответа, тело JSON)"""
+    server = PredictionServer(predictor, window_ms=1.0)
+    batcher_task = asyncio.create_task(server.batcher.run())
+    listener = await asyncio.start_server(server.handle_connection, '127.0.0.1', 0)
+    try:
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(raw_request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout=10)
+        writer.close()
+    finally:
+        listener.close()
+        batcher_task.cancel()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+def _post(path, body, content_length=None):
+    """Сырой HTTP-запрос POST с заданным (возможно, некорректным) Content-Length"""
+    length = len(body) if content_length is None else content_length
+    return (f"POST {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+            f"Content-Length: {length}\r\n\r\n").encode('latin-1') + body
+
+def test_predict_records_batch_mix(model_path, rides):
+    """Прогноз поездки не зависит от того, с какими поездками она попала в пакет"""
+    records = rides[USEFUL_FEATURES].head(40).to_dict('records')
+    # Поездки без части признаков и с None, как в запросах к сервису
+    del records[3]['Avg VTAT']
+    records[7]['Driver Ratings'] = None
+    del records[11]['Ride Distance'], records[11]['Customer Rating']
+
+    for cache_size in (0, 1000):
+        predictor = TransportCostPredictor(model_path, use_registry=False, cache_size=cache_size)
+        alone = np.array([predictor.predict_records([record])[0] for record in records])
+        together = np.asarray(predictor.predict_records(records), dtype=np.float64)
+        reversed_order = np.asarray(predictor.predict_records(records[::-1]), dtype=np.float64)[::-1]
+        np.testing.assert_allclose(together, alone, rtol=1e-9)
+        np.testing.assert_allclose(reversed_order, alone, rtol=1e-9)
+
+def test_predict_records_fills_missing_like_single_ride(model_path, rides):
+    """Отсутствующие признаки в пакете заполняются так же, как в одиночном прогнозе"""
+    complete = rides[USEFUL_FEATURES].dropna().head(3).to_dict('records')
+    del complete[1]['Ride Distance'], complete[1]['Customer Rating']
+    predictor = TransportCostPredictor(model_path, use_registry=False, cache_size=0)
+    single = predictor.predict_booking_value(complete[1])[0]
+    np.testing.assert_allclose(predictor.predict_records(complete)[1], single, rtol=1e-9)
+
+def test_fast_path_matches_predict_frame(model_path, rides):
+    """Одиночный прогноз без pandas совпадает с векторизованным, включая отсутствующие признаки"""
+    predictor = TransportCostPredictor(model_path, use_registry=False, cache_size=0)
+    frame = rides[USEFUL_FEATURES].dropna().head(50)
+    expected = predictor.predict_frame(frame, verbose=False)
+    fast = np.array([predictor.predict_one(record)[0] for record in frame.to_dict('records')])
+    np.testing.assert_allclose(fast, expected, rtol=1e-9)
+
+    ride = frame.iloc[0].to_dict()
+    del ride['Avg CTAT']
+    np.testing.assert_allclose(predictor.predict_one(ride),
+                               predictor.predict_frame(pd.DataFrame([dict(ride, **{'Avg CTAT': 0.0})]),
+                                                       verbose=False), rtol=1e-9)
+
+def test_float32_linear_coefficients_use_float64(linear_model_path, rides, tmp_path):
+    """Коэффициенты float32 из старых артефактов приводятся к float64: пакетный и одиночный прогнозы совпадают"""
+    model_data = joblib.load(linear_model_path)
+    model_data['linear_coefficients']['coef'] = model_data['linear_coefficients']['coef'].astype(np.float32)
+    legacy_path = str(tmp_path / 'legacy_linear.joblib')
+    joblib.dump(model_data, legacy_path)
+
+    predictor = TransportCostPredictor(legacy_path, use_registry=False, cache_size=0)
+    frame = rides[USEFUL_FEATURES].dropna().head(50)
+    fast = np.array([predictor.predict_one(record)[0] for record in frame.to_dict('records')])
+    np.testing.assert_allclose(predictor.predict_frame(frame, verbose=False), fast, rtol=1e-12)
+
+def test_fast_path_declines_invalid_values(linear_model_path, rides):
+    """NaN и нечисловые значения быстрый путь не обрабатывает — их обрабатывает путь через pandas"""
+    predictor = TransportCostPredictor(linear_model_path, use_registry=False, cache_size=0)
+    ride = rides[USEFUL_FEATURES].dropna().iloc[0].to_dict()
+    assert predictor.predict_one(dict(ride, **{'Avg VTAT': float('nan')})) is None
+    assert predictor.predict_one(dict(ride, **{'Avg VTAT': 'быстро'})) is None
+    assert predictor.predict_booking_value(dict(ride, **{'Avg VTAT': '7.5'}))[0] == \
+        pytest.approx(predictor.predict_one(dict(ride, **{'Avg VTAT': 7.5}))[0])
+
+def test_predict_batch_matches_predict_frame(model_path, rides, tmp_path):
+    """Потоковая обработка частями дает те же прогнозы, что и один вызов на весь файл"""
+    csv_path = tmp_path / 'rides.csv'
+    output_path = tmp_path / 'predictions.csv'
+    rides.head(101).to_csv(csv_path, index=False)
+
+    predictor = TransportCostPredictor(model_path, use_registry=False, cache_size=0)
+    result = predictor.predict_batch(str(csv_path), str(output_path), chunksize=17)
+    assert result['rows'] == 101 and result['output_file'] == str(output_path)
+
+    output = pd.read_csv(output_path)
+    expected = predictor.predict_frame(pd.read_csv(csv_path), verbose=False)
+    assert list(output.columns) == list(rides.columns) + [PREDICTION_COLUMN]
+    np.testing.assert_allclose(output[PREDICTION_COLUMN].to_numpy(), expected, rtol=1e-6)
+    assert result['failed_rows'] == int(np.isnan(expected).sum())
+    assert not os.path.exists(f"{output_path}.tmp")
+
+def test_predict_batch_refuses_to_overwrite_input(linear_model_path, rides, tmp_path, caplog):
+    """predict_batch не пишет результаты поверх входного файла и сообщает об ошибке в журнал"""
+    csv_path = tmp_path / 'rides.csv'
+    rides.head(50).to_csv(csv_path, index=False)
+    original = csv_path.read_bytes()
+
+    predictor = TransportCostPredictor(linear_model_path, use_registry=False, cache_size=0)
+    with caplog.at_level(logging.ERROR):
+        assert predictor.predict_batch(str(csv_path), str(csv_path)) is None
+        assert predictor.predict_batch(str(tmp_path / 'missing.csv')) is None
+    assert csv_path.read_bytes() == original
+    assert not os.path.exists(f"{csv_path}.tmp")
+    assert len([record for record in caplog.records if record.levelno == logging.ERROR]) == 2
+
+def test_predict_batch_header_only(linear_model_path, rides, tmp_path):
+    """Файл только с заголовком дает заголовок с колонкой прогноза"""
+    csv_path = tmp_path / 'empty.csv'
+    output_path = tmp_path / 'empty_predictions.csv'
+    rides.head(0).to_csv(csv_path, index=False)
+
+    predictor = TransportCostPredictor(linear_model_path, use_registry=False, cache_size=0)
+    assert predictor.predict_batch(str(csv_path), str(output_path))['rows'] == 0
+    assert list(pd.read_csv(output_path).columns) == list(rides.columns) + [PREDICTION_COLUMN]
+
+def test_parse_content_length():
+    """Content-Length — только неотрицательное десятичное число"""
+    assert parse_content_length(None) == 0
+    assert parse_content_length('42') == 42
+    for value in ('abc', '-1', '+5', '1_000', '4 2', '²', '0x10'):
+        assert parse_content_length(value) is None, value
+    assert parse_content_length('9' * 10000) > MAX_REQUEST_BYTES
+
+def test_server_rejects_invalid_content_length(linear_model_path, rides):
+    """Некорректная длина — 400, слишком большая — 413, корректный запрос — прогноз"""
+    predictor = TransportCostPredictor(linear_model_path, use_registry=False, cache_size=0)
+    ride = rides[USEFUL_FEATURES].dropna().iloc[0].to_dict()
+    body = json.dumps(ride).encode('utf-8')
+
+    status, payload = asyncio.run(_exchange(predictor, _post('/predict', body, 'abc')))
+    assert status == 400 and 'error' in payload
+    status, _ = asyncio.run(_exchange(predictor, _post('/predict', body, -5)))
+    assert status == 400
+    status, _ = asyncio.run(_exchange(predictor, _post('/predict', body, MAX_REQUEST_BYTES + 1)))
+    assert status == 413
+
+    status, payload = asyncio.run(_exchange(predictor, _post('/predict', body)))
+    assert status == 200
+    np.testing.assert_allclose(payload['prediction'], predictor.predict_booking_value(ride)[0], rtol=1e-9)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
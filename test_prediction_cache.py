@@ -0,0 +1,60 @@
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from datasets.data_fetcher import USEFUL_FEATURES
+from algorithms.prediction_cache import PredictionCache
+from algorithms.transport_predictor import TransportCostPredictor
+
+FEATURES = ['Ride Distance', 'Avg VTAT']
+
+def test_lru_bound_and_model_binding():
+    """Кэш не растет больше max_size, вытесняет давно не читанные записи и сбрасывается при смене модели"""
+    cache = PredictionCache(2)
+    cache.bind('a')
+    cache.put((1.0,), 10.0, 'a')
+    cache.put((2.0,), 20.0, 'a')
+    assert cache.get((1.0,)) == 10.0
+    cache.put((3.0,), 30.0, 'a')
+    assert cache.get((2.0,)) is None and cache.get((1.0,)) == 10.0
+    assert cache.stats()['size'] == 2 and cache.stats()['evictions'] == 1
+
+    # Прогноз, посчитанный прежней моделью, не сохраняется
+    cache.put((4.0,), 40.0, 'old')
+    assert cache.get((4.0,)) is None
+    cache.bind('b')
+    assert cache.stats()['size'] == 0 and cache.stats()['invalidations'] == 1
+
+def test_ttl_expires_entries():
+    cache = PredictionCache(10, ttl=0.05)
+    cache.bind('a')
+    cache.put((1.0,), 10.0, 'a')
+    assert cache.get((1.0,)) == 10.0
+    time.sleep(0.1)
+    assert cache.get((1.0,)) is None and cache.stats()['expirations'] == 1
+
+def test_normalize_quantizes_to_steps():
+    """Значения округляются до шага интерфейса; нечисловые значения и NaN не кэшируются"""
+    cache = PredictionCache(10, steps={'Ride Distance': 0.5})
+    key, values = cache.normalize(FEATURES, {'Ride Distance': '10.26', 'Avg VTAT': 7})
+    assert key == (10.5, 7.0) and values == {'Ride Distance': 10.5, 'Avg VTAT': 7.0}
+    assert cache.normalize(FEATURES, {'Ride Distance': 10.4})[0] == (10.5, None)
+    assert cache.normalize(FEATURES, {'Ride Distance': float('nan')}) == (None, None)
+    assert cache.normalize(FEATURES, {'Ride Distance': 'далеко'}) == (None, None)
+    assert PredictionCache(10).normalize(FEATURES, {'Ride Distance': 10.26})[1] is None
+
+def test_cached_predictions_match_model(model_path, rides):
+    """Прогноз из кэша совпадает с расчетом без кэша"""
+    records = rides[USEFUL_FEATURES].dropna().head(20).to_dict('records')
+    plain = TransportCostPredictor(model_path, use_registry=False, cache_size=0)
+    cached = TransportCostPredictor(model_path, use_registry=False, cache_size=100)
+    expected = np.asarray(plain.predict_records(records), dtype=np.float64)
+    for _ in range(2):
+        np.testing.assert_allclose(np.asarray(cached.predict_records(records), dtype=np.float64), expected,
+                                   rtol=1e-9)
+    assert cached.cache_stats()['hits'] == len(records)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,62 @@
+import sys
+
+import numpy as np
+import pytest
+
+from algorithms.price_lattice import LatticeLoader, PriceLattice, build_price_lattice
+from algorithms.transport_predictor import TransportCostPredictor
+
+# Небольшая сетка: узлы — значения слайдеров, как в PRICE_LATTICE_AXES
+TEST_AXES = {
+    'Ride Distance': [(1.0, 10.0, 1.0), (10.0, 50.0, 10.0)],
+    'Driver Ratings': (1.0, 5.0, 1.0),
+    'Customer Rating': (1.0, 5.0, 1.0),
+    'Avg VTAT': (0.0, 45.0, 15.0),
+    'Avg CTAT': (5.0, 180.0, 35.0)
+}
+
+@pytest.fixture(scope='module')
+def predictor(forest_model_path):
+    return TransportCostPredictor(forest_model_path, use_registry=False, cache_size=0)
+
+@pytest.fixture(scope='module')
+def lattice(predictor, tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('lattice'))
+    return build_price_lattice(predictor, axes=TEST_AXES, directory=directory, check_points=500)
+
+def _ride(features, values):
+    return dict(zip(features, values))
+
+def test_nodes_match_model(lattice, predictor):
+    """В узлах решетки цена совпадает с прогнозом модели"""
+    rng = np.random.default_rng(0)
+    nodes = np.column_stack([rng.choice(axis, 50) for axis in lattice.axes]).astype(np.float32)
+    expected = predictor.predict_inputs(nodes)
+    found = [lattice.lookup(_ride(lattice.features, row), exact_only=True) for row in nodes]
+    np.testing.assert_allclose(found, expected, rtol=1e-5)
+    assert lattice.meta['model_hash'] == predictor.model_hash
+
+def test_off_node_and_out_of_range(lattice):
+    """Между узлами exact_only дает None, вне сетки и без признака — всегда None"""
+    inside = _ride(lattice.features, [axis[0] + (axis[1] - axis[0]) / 2 for axis in lattice.axes])
+    assert lattice.lookup(inside, exact_only=True) is None
+    price = lattice.lookup(inside)
+    np.testing.assert_allclose(price, lattice.interpolate([list(inside.values())])[0], rtol=1e-9)
+
+    outside = dict(inside, **{lattice.features[0]: lattice.axes[0][-1] + 1})
+    assert lattice.lookup(outside) is None
+    del inside[lattice.features[-1]]
+    assert lattice.lookup(inside) is None
+
+def test_loader_builds_in_background(linear_model_path, tmp_path):
+    """Загрузчик не строит решетку в вызывающем потоке: сначала None, затем готовая решетка"""
+    loader = LatticeLoader(linear_model_path, directory=str(tmp_path))
+    assert loader.get() is None
+    lattice = loader.wait(timeout=120)
+    assert isinstance(lattice, PriceLattice)
+    assert loader.get() is lattice
+    # Новый загрузчик (перезапуск приложения) читает решетку с диска без перестроения
+    assert LatticeLoader(linear_model_path, directory=str(tmp_path)).get() is not None
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
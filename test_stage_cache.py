@@ -0,0 +1,68 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from algorithms import train_model
+from algorithms.stage_cache import StageCache, stage_key
+
+def test_stage_key():
+    """Ключ зависит от этапа и входов, но не от порядка ключей словаря"""
+    key = stage_key('fit', {'data': 'abc', 'params': {'a': 1, 'b': 2}})
+    assert key == stage_key('fit', {'params': {'b': 2, 'a': 1}, 'data': 'abc'})
+    assert key != stage_key('fit', {'data': 'abc', 'params': {'a': 1, 'b': 3}})
+    assert key != stage_key('save', {'data': 'abc', 'params': {'a': 1, 'b': 2}})
+
+def test_save_load_and_prune(tmp_path):
+    """Сохраняются max_entries последних по использованию записей; поврежденная запись — промах"""
+    cache = StageCache(str(tmp_path), max_entries=2)
+    assert cache.load('fit', 'a') is None
+    cache.save('fit', 'a', {'value': np.arange(3)})
+    cache.save('fit', 'b', 'b')
+    for age, key in ((200, 'a'), (100, 'b')):
+        path = tmp_path / 'fit' / f'{key}.joblib'
+        os.utime(path, (path.stat().st_atime - age, path.stat().st_mtime - age))
+
+    np.testing.assert_array_equal(cache.load('fit', 'a')['value'], np.arange(3))  # 'a' снова свежая
+    cache.save('fit', 'c', 'c')
+    assert sorted(os.listdir(tmp_path / 'fit')) == ['a.joblib', 'c.joblib']
+
+    (tmp_path / 'fit' / 'c.joblib').write_bytes(b'not a joblib file')
+    assert cache.load('fit', 'c') is None
+
+def test_is_current_tracks_file_content(tmp_path):
+    cache = StageCache(str(tmp_path / 'stages'))
+    path = tmp_path / 'model.joblib'
+    path.write_bytes(b'model v1')
+    assert not cache.is_current('save', 'k', str(path))
+    cache.mark_current('save', 'k', str(path))
+    assert cache.is_current('save', 'k', str(path))
+    assert not cache.is_current('save', 'other', str(path))
+    path.write_bytes(b'model v2, longer')
+    assert not cache.is_current('save', 'k', str(path))
+
+def test_trainer_reuses_unchanged_stages(prepared_trainer, monkeypatch, tmp_path):
+    """Повторное обучение берет модели из кэша; изменение параметров пересчитывает только свой этап"""
+    monkeypatch.setattr(train_model, 'DATASET_CACHE_DIR', str(tmp_path / 'datasets'))
+    monkeypatch.setattr(train_model, 'StageCache', lambda: StageCache(str(tmp_path / 'stages')))
+
+    def run():
+        trainer = prepared_trainer(use_cache=True)
+        trainer.train_linear_regression()
+        trainer.train_random_forest()
+        return trainer, {stage['title']: stage['hit'] for stage in trainer.stages.summary}
+
+    first, hits = run()
+    assert not any(hits.values())
+    second, hits = run()
+    assert all(hits.values())
+    for model_key in ('linear_regression', 'random_forest'):
+        np.testing.assert_array_equal(second.results[model_key]['test_pred'], first.results[model_key]['test_pred'])
+
+    monkeypatch.setitem(train_model.RF_PARAMS, 'max_depth', 4)
+    _, hits = run()
+    assert hits == {'Данные и разбиение': True, 'Linear Regression': True, 'Random Forest': False}
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
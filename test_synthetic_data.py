@@ -0,0 +1,54 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datasets.synthetic_data import (COLUMNS, SEED_BLOCK_ROWS, generate_chunk, generate_dataset, main,
+                                     write_synthetic_data)
+
+ROWS = SEED_BLOCK_ROWS + 5000  # данные из двух блоков генератора
+
+@pytest.fixture(scope='module')
+def reference():
+    return generate_dataset(ROWS, chunk_rows=ROWS)
+
+@pytest.mark.parametrize('chunk_rows', [1000, 7777, SEED_BLOCK_ROWS])
+def test_rows_do_not_depend_on_chunk_size(reference, chunk_rows):
+    """Строка с данным номером одна и та же при любом размере части"""
+    pd.testing.assert_frame_equal(generate_dataset(ROWS, chunk_rows=chunk_rows), reference)
+
+def test_chunk_is_reproducible_alone(reference):
+    """Часть на стыке блоков генерируется независимо от остальных"""
+    start = SEED_BLOCK_ROWS - 10
+    pd.testing.assert_frame_equal(generate_chunk(start, 30), reference.iloc[start:start + 30].reset_index(drop=True))
+    assert len(generate_chunk(5, 0)) == 0
+    assert not generate_dataset(500, seed=1).equals(generate_dataset(500, seed=2))
+
+def test_structure(reference):
+    """Колонки выгрузки и структурные пропуски: без поездки нет стоимости и расстояния"""
+    assert list(reference.columns) == COLUMNS
+    assert reference['Booking ID'].is_unique
+    rode = reference['Booking Status'].isin(['Completed', 'Incomplete'])
+    assert reference.loc[~rode, 'Booking Value'].isna().all()
+    assert reference.loc[rode, 'Booking Value'].notna().all()
+    assert reference.loc[~rode, 'Ride Distance'].isna().all()
+
+def test_write_refuses_to_overwrite(tmp_path):
+    """Существующий файл заменяется только с overwrite=True; запись атомарная"""
+    path = tmp_path / 'transport_data.csv'
+    path.write_text('real data\n', encoding='utf-8')
+    assert write_synthetic_data(str(path), 100, chunk_rows=30) is None
+    assert path.read_text(encoding='utf-8') == 'real data\n'
+    with pytest.raises(SystemExit):
+        main(['--rows', '100', '--output', str(path)])
+    assert path.read_text(encoding='utf-8') == 'real data\n'
+
+    assert write_synthetic_data(str(path), 100, chunk_rows=30, overwrite=True) == str(path)
+    written = pd.read_csv(path)
+    assert len(written) == 100 and list(written.columns) == COLUMNS
+    np.testing.assert_array_equal(written['Booking Value'], generate_dataset(100)['Booking Value'])
+    assert [item.name for item in tmp_path.iterdir()] == ['transport_data.csv']
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from algorithms import train_model
+from algorithms.train_model import MODEL_TITLES
+from tools.reporting import default_plot_mode
+
+def test_parallel_training_matches_sequential(prepared_trainer):
+    """Обучение в пуле процессов дает те же модели, что и последовательное"""
+    sequential = prepared_trainer()
+    sequential.train_linear_regression()
+    sequential.train_random_forest()
+    sequential.train_gradient_boosting()
+    sequential.train_hist_gradient_boosting()
+
+    parallel = prepared_trainer()
+    parallel.train_models_parallel(n_jobs=2)
+
+    assert list(parallel.results) == list(MODEL_TITLES)
+    for model_key in MODEL_TITLES:
+        np.testing.assert_allclose(parallel.results[model_key]['test_pred'],
+                                   sequential.results[model_key]['test_pred'], rtol=1e-9, err_msg=model_key)
+        assert parallel.results[model_key]['metrics'] == pytest.approx(sequential.results[model_key]['metrics'])
+    assert parallel.timings['parallel_total'] > 0
+
+def test_hist_gradient_boosting_native_missing(prepared_trainer, monkeypatch):
+    """Бустинг учится на пропусках как есть, с кодами корзин как категориальными признаками"""
+    trainer = prepared_trainer()
+    model = trainer.train_hist_gradient_boosting()
+    pipeline = trainer.feature_pipeline
+    data = trainer.data
+
+    X_native = data.X_train_native
+    positions = [pipeline.feature_names.index(name) for name in pipeline.input_features]
+    assert trainer.missing_train.any()
+    assert np.isnan(X_native[:, positions][trainer.missing_train]).all()
+    complete = ~trainer.missing_train.any(axis=1)
+    np.testing.assert_array_equal(X_native[complete], data.X_train[complete])
+    for category, (source, _, _) in pipeline.buckets.items():
+        rows = trainer.missing_train[:, pipeline.input_features.index(source)]
+        assert (X_native[rows, pipeline.feature_names.index(category)] == -1).all()
+
+    np.testing.assert_array_equal(model.is_categorical_, pipeline.categorical_mask())
+    np.testing.assert_allclose(trainer.results['hist_gradient_boosting']['test_pred'],
+                               model.predict(data.X_test_native))
+    assert trainer.results['hist_gradient_boosting']['metrics']['Test R2'] > 0.5
+
+    # Без нативных пропусков бустинг учится на матрицах с медианами
+    monkeypatch.setattr(train_model, 'HGB_NATIVE_MISSING', False)
+    imputed = prepared_trainer()
+    imputed_model = imputed.train_hist_gradient_boosting()
+    assert imputed.data.X_train_native is None
+    np.testing.assert_allclose(imputed.results['hist_gradient_boosting']['test_pred'],
+                               imputed_model.predict(imputed.data.X_test))
+
+def test_headless_report_files(prepared_trainer, tmp_path):
+    """Без дисплея графики рисуются в фоне в PNG и сводный HTML, обучение их не ждет"""
+    trainer = prepared_trainer(plots='files', report_dir=str(tmp_path))
+    trainer.train_linear_regression()
+    trainer.train_random_forest()
+    trainer.compare_models()
+    trainer.report.render_async()
+    files = trainer.finish_report()
+
+    assert files[-1] == str(tmp_path / 'report.html')
+    assert len([path for path in files if path.endswith('.png')]) == 3  # два прогноза и важность леса
+    assert all(os.path.getsize(path) > 0 for path in files)
+    assert 'Random Forest' in (tmp_path / 'report.html').read_text(encoding='utf-8')
+
+def test_default_plot_mode_without_display(monkeypatch):
+    monkeypatch.setattr(sys, 'platform', 'linux')
+    monkeypatch.delenv('DISPLAY', raising=False)
+    monkeypatch.delenv('WAYLAND_DISPLAY', raising=False)
+    assert default_plot_mode() == 'files'
+    monkeypatch.setenv('DISPLAY', ':0')
+    assert default_plot_mode() == 'show'
+
+def test_report_does_not_import_pyplot(tmp_path):
+    """Отчет рисуется объектным API matplotlib: pyplot и GUI backend не загружаются"""
+    code = (
+        "import sys\n"
+        "import numpy as np\n"
+        "from tools.reporting import TrainingReport\n"
+        f"report = TrainingReport({str(tmp_path)!r})\n"
+        "y = np.arange(10.0)\n"
+        "report.add_predictions('Linear', y, y, y, y)\n"
+        "report.add_feature_importance('Forest', ['a', 'b'], np.array([0.7, 0.3]))\n"
+        "report.render_async()\n"
+        "assert len(report.wait()) == 3\n"
+        "assert 'matplotlib.pyplot' not in sys.modules\n"
+    )
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from algorithms.model_store import linear_sufficient_stats
+from datasets.training_data import TrainingData
+
+@pytest.fixture
+def data(training_data):
+    _, X, y, pipeline = training_data
+    split = len(X) * 4 // 5
+    # Матрица преобразования хранится по столбцам и приводится к C-порядку один раз
+    return TrainingData(X[:split], X[split:], y[:split].astype(np.float32), y[split:], pipeline.feature_names)
+
+def test_arrays_layout(data, training_data):
+    """Матрицы — C-непрерывные float32, целевая переменная — float64"""
+    _, X, _, _ = training_data
+    assert not X.flags['C_CONTIGUOUS']
+    for name, array in data.arrays().items():
+        assert array.flags['C_CONTIGUOUS'], name
+        assert array.dtype == (np.float32 if name.startswith('X') else np.float64), name
+    assert set(data.arrays()) == {'X_train', 'X_test', 'y_train', 'y_test'}
+    data.set_native(data.X_train, data.X_test)
+    assert data.nbytes == 2 * (data.X_train.nbytes + data.X_test.nbytes) + data.y_train.nbytes + data.y_test.nbytes
+
+def test_share_and_attach(data):
+    """Опубликованные массивы отображаются в другом процессе только для чтения; release их удаляет"""
+    data.set_native(np.where(data.X_train > 1, np.nan, data.X_train), data.X_test)
+    with data:
+        handle = data.share()
+        assert data.share() == handle
+        attached = TrainingData.attach(handle)
+        assert attached.feature_names == data.feature_names
+        for name, array in data.arrays().items():
+            shared = getattr(attached, name)
+            # ascontiguousarray снимает обертку np.memmap, но не копирует отображение файла
+            assert isinstance(shared.base, np.memmap) and not shared.flags['WRITEABLE']
+            np.testing.assert_array_equal(shared, array)
+
+        code = (
+            "import json, sys\n"
+            "from datasets.training_data import TrainingData\n"
+            "data = TrainingData.attach(json.loads(sys.argv[1]))\n"
+            "print(float(data.y_test.sum()), data.X_train.shape[0])\n"
+        )
+        root = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run([sys.executable, '-c', code, json.dumps(handle)], cwd=root,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        total, rows = result.stdout.split()
+        assert float(total) == float(data.y_test.sum()) and int(rows) == len(data.X_train)
+    assert not os.path.exists(handle['directory'])
+
+def test_linear_stats_by_blocks(data):
+    """X'X и X'y по блокам совпадают с расчетом на всей матрице со столбцом свободного члена"""
+    X = np.hstack([data.X_train.astype(np.float64), np.ones((len(data.X_train), 1))])
+    stats = linear_sufficient_stats(data.X_train, data.y_train, block_rows=333)
+    assert stats['rows'] == len(X)
+    np.testing.assert_allclose(stats['xtx'], X.T @ X, rtol=1e-10)
+    np.testing.assert_allclose(stats['xty'], X.T @ data.y_train, rtol=1e-10)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,43 @@
+import sys
+
+import numpy as np
+import pytest
+
+from configuration.settings import RANDOM_STATE
+from algorithms.tree_engine import compile_tree_ensemble, predict_compiled
+
+@pytest.fixture(scope='module')
+def gradient_boosting(training_data):
+    from sklearn.ensemble import GradientBoostingRegressor
+    _, X, y, _ = training_data
+    return GradientBoostingRegressor(n_estimators=20, max_depth=4, random_state=RANDOM_STATE).fit(X, y)
+
+@pytest.fixture(params=['random_forest', 'gradient_boosting'])
+def ensemble(request, forest, gradient_boosting):
+    return forest if request.param == 'random_forest' else gradient_boosting
+
+@pytest.mark.parametrize('n_rows', [1, 7, 256, None])
+def test_compiled_matches_sklearn(ensemble, training_data, n_rows):
+    """Скомпилированный обход дает прогнозы sklearn для пакетов любого размера"""
+    _, X, _, _ = training_data
+    X = X[:n_rows]
+    engine = compile_tree_ensemble(ensemble)
+    np.testing.assert_allclose(predict_compiled(engine, X), ensemble.predict(X), rtol=1e-9, atol=1e-9)
+
+def test_compiled_blocks_and_dtypes(forest, training_data):
+    """Результат не зависит от размера блока и типа входной матрицы"""
+    _, X, _, _ = training_data
+    engine = compile_tree_ensemble(forest)
+    expected = forest.predict(X)
+    np.testing.assert_allclose(predict_compiled(engine, X, block_rows=13), expected, rtol=1e-9)
+    np.testing.assert_allclose(predict_compiled(engine, X.astype(np.float32)),
+                               forest.predict(X.astype(np.float32)), rtol=1e-9)
+
+def test_non_ensemble_is_not_compiled(training_data):
+    """Модели без деревьев не компилируются"""
+    from sklearn.linear_model import LinearRegression
+    _, X, y, _ = training_data
+    assert compile_tree_ensemble(LinearRegression().fit(X, y)) is None
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
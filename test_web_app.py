@@ -0,0 +1,44 @@
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip('streamlit')
+
+from algorithms.transport_predictor import TransportCostPredictor
+from web_app import predict_in_batches
+
+class FailingPredictor:
+    """Предсказатель, у которого пакеты, начинающиеся со строки fail_from и дальше, завершаются ошибкой"""
+
+    def __init__(self, predictor, fail_from):
+        self.predictor = predictor
+        self.fail_from = fail_from
+
+    def predict_frame(self, batch, verbose=True):
+        if batch.index[0] >= self.fail_from:
+            raise ValueError("Input contains infinity")
+        return self.predictor.predict_frame(batch, verbose=verbose)
+
+def test_batches_match_single_call(linear_model_path, rides):
+    predictor = TransportCostPredictor(linear_model_path, use_registry=False, cache_size=0)
+    frame = rides.head(95)
+    calls = []
+    predictions, failures = predict_in_batches(predictor, frame, 20, lambda *args: calls.append(args))
+    np.testing.assert_allclose(predictions, predictor.predict_frame(frame, verbose=False), rtol=1e-9)
+    assert failures == []
+    assert calls[-1] == (5, 5, 95)
+
+def test_failed_batches_are_reported(linear_model_path, rides):
+    """Пакет с ошибкой не прерывает обработку: его строки остаются NaN и попадают в список ошибок"""
+    predictor = FailingPredictor(TransportCostPredictor(linear_model_path, use_registry=False, cache_size=0), 40)
+    frame = rides.head(95).reset_index(drop=True)
+    predictions, failures = predict_in_batches(predictor, frame, 20)
+    assert [(start, rows) for start, rows, _ in failures] == [(40, 20), (60, 20), (80, 15)]
+    assert 'ValueError' in failures[0][2]
+    assert np.isnan(predictions[40:]).all()
+    complete = frame.head(40)[predictor.predictor.pipeline.input_features].notna().all(axis=1)
+    assert np.isfinite(predictions[:40]).sum() == complete.sum()
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,54 @@
+import sys
+
+import numpy as np
+import pytest
+
+from algorithms.transport_predictor import TransportCostPredictor
+from algorithms.what_if import build_what_if_matrix, evaluate_what_if, sensitivity_sweeps
+
+BASE = {'Avg VTAT': 10.0, 'Avg CTAT': 30.0, 'Ride Distance': 25.0, 'Driver Ratings': 4.5, 'Customer Rating': 4.7}
+SCENARIOS = {
+    'Короткая': {'Ride Distance': 3.0},
+    'Пробка': {'Avg CTAT': 80.0, 'Avg VTAT': 18.0},
+    'Низкий рейтинг': {'Driver Ratings': 3.2, 'Customer Rating': 3.5}
+}
+
+def _single(predictor, **changes):
+    return predictor.predict_booking_value(dict(BASE, **changes))[0]
+
+def test_matches_single_predictions(model_path):
+    """Сценарии и развертки одним вызовом совпадают с прогнозами по одной поездке"""
+    predictor = TransportCostPredictor(model_path, use_registry=False, cache_size=0)
+    sweeps = sensitivity_sweeps(predictor.pipeline.input_features, pair=('Ride Distance', 'Driver Ratings'),
+                                points=7, pair_points=4)
+    result = evaluate_what_if(predictor, BASE, SCENARIOS, sweeps)
+    assert result['rows'] == len(SCENARIOS) + sum(np.prod([len(v) for v in sweep.values()]) for sweep in sweeps)
+
+    for name, ride in SCENARIOS.items():
+        assert result['scenarios'][name] == pytest.approx(_single(predictor, **ride), rel=1e-6)
+
+    for sweep in result['sweeps'][:-1]:
+        feature, = sweep['features']
+        expected = [_single(predictor, **{feature: float(value)}) for value in sweep['values'][0]]
+        np.testing.assert_allclose(sweep['prices'], expected, rtol=1e-6)
+
+    pair = result['sweeps'][-1]
+    assert pair['prices'].shape == (4, 4)
+    distances, ratings = pair['values']
+    expected = [[_single(predictor, **{'Ride Distance': float(d), 'Driver Ratings': float(r)}) for r in ratings]
+                for d in distances]
+    np.testing.assert_allclose(pair['prices'], expected, rtol=1e-6)
+
+def test_matrix_layout():
+    """Недостающие признаки берутся из базовой поездки; без сценариев матрица пустая"""
+    features = list(BASE)
+    X, layout = build_what_if_matrix(features, BASE, {'a': {'Avg VTAT': 1.0, 'unknown': 5.0}},
+                                     [{'Avg CTAT': [1.0, 2.0]}])
+    assert X.flags['F_CONTIGUOUS'] and X.shape == (3, len(features))
+    np.testing.assert_array_equal(X[0], np.array([1.0, 30.0, 25.0, 4.5, 4.7], dtype=np.float32))
+    np.testing.assert_array_equal(X[1:, 1], [1.0, 2.0])
+    assert layout == [('scenarios', ['a'], (1,)), ('sweep', ['Avg CTAT'], (2,))]
+    assert build_what_if_matrix(features, BASE)[0].shape == (0, len(features))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, '-q']))
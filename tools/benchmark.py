@@ -0,0 +1,197 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Добавляем путь для импорта модулей при запуске как скрипта
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from configuration.settings import (RANDOM_STATE, BENCH_ROWS, BENCH_REPEATS, BENCH_TRAIN_REPEATS,
+                                    BENCH_PREDICT_SIZES, BENCH_REGRESSION_THRESHOLD)
+
+# Методы обучения TransportModelTrainer, которые замеряются
+TRAIN_METHODS = ['train_linear_regression', 'train_random_forest', 'train_gradient_boosting',
+                 'train_hist_gradient_boosting']
+# Минимум замеров одиночного предсказания: один вызов длится микросекунды
+SINGLE_ROW_REPEATS = 200
+
+def _quiet():
+    """Подавление печати замеряемых функций"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+def measure(func, repeats):
+    """Медиана и p95 времени выполнения плюс пиковая память отдельного прогона под tracemalloc"""
+    timings = []
+    for _ in range(repeats):
+        with _quiet():
+            start_time = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start_time)
+
+    # tracemalloc замедляет выполнение, поэтому память замеряется отдельным прогоном
+    tracemalloc.start()
+    try:
+        with _quiet():
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median_s': float(np.median(timings)),
+        'p95_s': float(np.percentile(timings, 95)),
+        'min_s': float(np.min(timings)),
+        'repeats': repeats,
+        'peak_mb': peak / 1024**2
+    }
+
+def _environment(rows, repeats, seed):
+    """Описание окружения и параметров запуска"""
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'rows': rows,
+        'repeats': repeats,
+        'seed': seed
+    }
+
+def run_benchmarks(rows=BENCH_ROWS, repeats=BENCH_REPEATS, train_repeats=BENCH_TRAIN_REPEATS,
+                   predict_sizes=BENCH_PREDICT_SIZES, seed=RANDOM_STATE):
+    """Замер загрузки, предобработки, обучения, загрузки модели и предсказаний"""
+    from datasets.data_fetcher import load_data, preprocess_data, create_features, USEFUL_FEATURES
+    from datasets.synthetic_data import write_synthetic_data, generate_dataset
+    from algorithms.train_model import TransportModelTrainer
+    from algorithms.transport_predictor import TransportCostPredictor
+
+    results = {}
+
+    def record(name, func, case_repeats=repeats):
+        results[name] = measure(func, case_repeats)
+        result = results[name]
+        print(f"   ⏱️  {name:<40} медиана {result['median_s'] * 1000:>10.3f} мс   "
+              f"p95 {result['p95_s'] * 1000:>10.3f} мс   пик {result['peak_mb']:>8.1f} МБ")
+
+    with tempfile.TemporaryDirectory(prefix='transport_bench_') as work_dir:
+        csv_path = os.path.join(work_dir, 'transport_data.csv')
+        model_path = os.path.join(work_dir, 'transport_model.joblib')
+
+        write_synthetic_data(csv_path, rows, seed=seed)
+
+        print("\n📁 Данные и признаки")
+        record('load_data', lambda: load_data(csv_path))
+        with _quiet():
+            df = load_data(csv_path)
+            X, _ = preprocess_data(df)
+        record('preprocess_data', lambda: preprocess_data(df))
+        record('create_features', lambda: create_features(X, verbose=False))
+
+        print("\n🏋️  Обучение")
+        trainer = TransportModelTrainer(plots='none', use_cache=False, data_path=csv_path)
+        record('trainer.prepare_data', trainer.prepare_data)
+        for method in TRAIN_METHODS:
+            record(f'trainer.{method}', getattr(trainer, method), train_repeats)
+        with _quiet():
+            trainer.compare_models()
+            trainer.save_best_model(model_path)
+
+        print("\n🔮 Загрузка модели и предсказания")
+        with _quiet():
+            # Без кэша прогнозов: замеряется сам расчет, а не попадания в кэш
+            predictor = TransportCostPredictor(model_path, use_registry=False, cache_size=0)
+            cached_predictor = TransportCostPredictor(model_path, use_registry=False)
+        record('predictor.load_model', predictor.load_model)
+
+        # Поездки для предсказания: пропуски заполнены медианами, как при обучении
+        rides = generate_dataset(max(predict_sizes), seed + 1)[USEFUL_FEATURES]
+        rides = rides.fillna(rides.median())
+        single_ride = rides.iloc[0].to_dict()
+        record('predict_booking_value[dict]', lambda: predictor.predict_booking_value(single_ride),
+               max(repeats, SINGLE_ROW_REPEATS))
+        record('predict_booking_value[dict, cached]', lambda: cached_predictor.predict_booking_value(single_ride),
+               max(repeats, SINGLE_ROW_REPEATS))
+        for size in predict_sizes:
+            batch = rides.iloc[:size]
+            record(f'predict_booking_value[{size}]', lambda: predictor.predict_booking_value(batch),
+                   max(repeats, SINGLE_ROW_REPEATS) if size == 1 else repeats)
+
+    return {'meta': _environment(rows, repeats, seed), 'results': results}
+
+def compare_results(current, baseline, threshold=BENCH_REGRESSION_THRESHOLD):
+    """Сравнение медиан с базовым запуском; возвращает список замедлившихся замеров"""
+    regressions = []
+    print("\n" + "📊" + "="*60 + "📊")
+    print(f"           СРАВНЕНИЕ С БАЗОЙ (порог {threshold:.0f}%)")
+    print("📊" + "="*60 + "📊")
+    base_commit = baseline.get('meta', {}).get('commit')
+    print(f"   База: {base_commit or 'неизвестно'}  →  текущий: {current['meta'].get('commit') or 'неизвестно'}")
+
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            print(f"   🆕 {name:<40} нет в базе")
+            continue
+        change = (result['median_s'] / base['median_s'] - 1) * 100 if base['median_s'] > 0 else 0.0
+        if change > threshold:
+            marker = '❌'
+            regressions.append({'name': name, 'baseline_s': base['median_s'],
+                                'current_s': result['median_s'], 'change_pct': change})
+        else:
+            marker = '✅'
+        print(f"   {marker} {name:<40} {base['median_s'] * 1000:>10.3f} → {result['median_s'] * 1000:>10.3f} мс  ({change:+.1f}%)")
+
+    return regressions
+
+def main(rows=BENCH_ROWS, repeats=BENCH_REPEATS, output=None, baseline=None,
+         threshold=BENCH_REGRESSION_THRESHOLD, seed=RANDOM_STATE):
+    """Запуск бенчмарка, сохранение JSON и проверка регрессий; возвращает код завершения"""
+    print("\n" + "⏱️ " + "="*60 + "⏱️")
+    print("           БЕНЧМАРК CITY TRANSPORT ANALYTICS")
+    print("⏱️ " + "="*60 + "⏱️")
+
+    report = run_benchmarks(rows=rows, repeats=repeats, seed=seed)
+
+    if output:
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2, ensure_ascii=False)
+        print(f"\n💾 Результаты сохранены: {output}")
+    else:
+        print("\n" + json.dumps(report, indent=2, ensure_ascii=False))
+
+    if baseline:
+        with open(baseline, encoding='utf-8') as baseline_file:
+            regressions = compare_results(report, json.load(baseline_file), threshold)
+        if regressions:
+            print(f"\n❌ Замедление больше {threshold:.0f}%: {len(regressions)} замер(ов)")
+            return 1
+        print("\n✅ Регрессий производительности не обнаружено")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
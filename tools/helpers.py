@@ -1,9 +1,10 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from sklearn.metrics import mean_squared_error, r2_score
 import numpy as np
 
+# matplotlib импортируется только при построении графиков: обучение без
+# визуализации не должно платить за его загрузку
+
 def evaluate_model(y_true, y_pred, model_name=""):
     """Оценка производительности модели"""
     mse = mean_squared_error(y_true, y_pred)
@@ -16,10 +17,8 @@ def evaluate_model(y_true, y_pred, model_name=""):
     
     return mse, r2
 
-def plot_predictions(y_train_true, y_train_pred, y_test_true, y_test_pred, model_name):
-    """Визуализация предсказаний модели"""
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
-    
+def draw_predictions(ax1, ax2, y_train_true, y_train_pred, y_test_true, y_test_pred, model_name):
+    """Отрисовка предсказаний модели на переданных осях"""
     # Обучающая выборка
     ax1.scatter(y_train_true, y_train_pred, alpha=0.7, color='blue', label='Train')
     ax1.plot([y_train_true.min(), y_train_true.max()], 
@@ -39,23 +38,35 @@ def plot_predictions(y_train_true, y_train_pred, y_test_true, y_test_pred, model
     ax2.set_title(f'{model_name} - Тестовая выборка')
     ax2.legend()
     ax2.grid(True, alpha=0.3)
+
+def plot_predictions(y_train_true, y_train_pred, y_test_true, y_test_pred, model_name):
+    """Визуализация предсказаний модели"""
+    import matplotlib.pyplot as plt
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+    draw_predictions(ax1, ax2, y_train_true, y_train_pred, y_test_true, y_test_pred, model_name)
     
     plt.tight_layout()
     plt.show()
 
+def draw_feature_importance(ax, feature_names, importance, model_name):
+    """Отрисовка важности признаков на переданных осях"""
+    feature_imp = pd.DataFrame({
+        'feature': feature_names,
+        'importance': importance
+    }).sort_values('importance', ascending=True)
+    
+    ax.barh(feature_imp['feature'], feature_imp['importance'])
+    ax.set_xlabel('Важность признака')
+    ax.set_title(f'Важность признаков - {model_name}')
+
 def plot_feature_importance(model, feature_names, model_name):
     """Визуализация важности признаков"""
     if hasattr(model, 'feature_importances_'):
-        importance = model.feature_importances_
-        feature_imp = pd.DataFrame({
-            'feature': feature_names,
-            'importance': importance
-        }).sort_values('importance', ascending=True)
-        
-        plt.figure(figsize=(10, 6))
-        plt.barh(feature_imp['feature'], feature_imp['importance'])
-        plt.xlabel('Важность признака')
-        plt.title(f'Важность признаков - {model_name}')
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(10, 6))
+        draw_feature_importance(ax, feature_names, model.feature_importances_, model_name)
         plt.tight_layout()
         plt.show()
 
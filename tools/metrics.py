@@ -0,0 +1,186 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from configuration.settings import LOGGER_NAME, METRICS_PREFIX, LATENCY_BUCKETS
+
+# Библиотечный логгер молчит, пока приложение не настроит вывод (python main.py -v)
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+def get_logger(name):
+    """Логгер подсистемы внутри общего логгера проекта"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+class _Shard:
+    """Метрики одного потока: пишет только поток-владелец, поэтому блокировки не нужны"""
+
+    def __init__(self, n_buckets):
+        self.n_buckets = n_buckets
+        self.histograms = {}  # этап -> [счетчики корзин..., минимум, максимум, сумма, количество]
+        self.counters = {}    # (метрика, метод) -> значение
+
+    def observe(self, stage, seconds, bounds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = [0] * self.n_buckets + [float('inf'), float('-inf'), 0.0, 0]
+        histogram[bisect_left(bounds, seconds)] += 1
+        if seconds < histogram[-4]:
+            histogram[-4] = seconds
+        if seconds > histogram[-3]:
+            histogram[-3] = seconds
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+class Metrics:
+    """Гистограммы времени этапов и счетчики с выгрузкой в JSON и формат Prometheus
+
+    Каждый поток пишет в свой шард (threading.local), общая блокировка берется
+    только при появлении нового потока. Выгрузка суммирует шарды; значения,
+    записанные во время выгрузки, попадут в следующую.
+    """
+
+    def __init__(self, prefix=METRICS_PREFIX, buckets=LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.bounds = [float(bound) for bound in buckets]
+        self.created = time.time()
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            # Последняя корзина — всё, что больше верхней границы (+Inf)
+            shard = self._local.shard = _Shard(len(self.bounds) + 1)
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, stage, seconds):
+        """Запись длительности этапа в секундах"""
+        self._shard().observe(stage, seconds, self.bounds)
+
+    def since(self, stage, start):
+        """Запись длительности этапа от start (time.perf_counter()); возвращает текущее время"""
+        now = time.perf_counter()
+        self._shard().observe(stage, now - start, self.bounds)
+        return now
+
+    def count(self, name, method='', value=1):
+        """Увеличение счетчика name с меткой method"""
+        counters = self._shard().counters
+        key = (name, method)
+        counters[key] = counters.get(key, 0) + value
+
+    def snapshot(self):
+        """Сумма шардов всех потоков: (гистограммы, счетчики)"""
+        with self._lock:
+            shards = list(self._shards)
+
+        histograms = {}
+        counters = {}
+        for shard in shards:
+            for stage, values in list(shard.histograms.items()):
+                values = list(values)
+                total = histograms.setdefault(stage, [0] * len(values[:-4]) + [float('inf'), float('-inf'), 0.0, 0])
+                for index, value in enumerate(values[:-4]):
+                    total[index] += value
+                total[-4] = min(total[-4], values[-4])
+                total[-3] = max(total[-3], values[-3])
+                total[-2] += values[-2]
+                total[-1] += values[-1]
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    def _quantile(self, histogram, quantile):
+        """Оценка квантиля по корзинам с линейной интерполяцией внутри корзины
+
+        Границы корзины сужаются до наблюдавшихся минимума и максимума этапа:
+        оценка не выходит за пределы реально измеренных длительностей (один
+        замер дает ровно его значение, корзина +Inf ограничена максимумом).
+        """
+        count = histogram[-1]
+        if count == 0:
+            return None
+        minimum, maximum = histogram[-4], histogram[-3]
+        rank = quantile * count
+        cumulative = 0
+        for index, bucket_count in enumerate(histogram[:-4]):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = max(self.bounds[index - 1] if index > 0 else 0.0, minimum)
+                upper = min(self.bounds[index] if index < len(self.bounds) else maximum, maximum)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return maximum
+
+    def to_dict(self):
+        """Метрики в виде словаря: этапы с квантилями и накопленными корзинами, счетчики"""
+        histograms, counters = self.snapshot()
+
+        stages = {}
+        for stage, histogram in sorted(histograms.items()):
+            cumulative = 0
+            buckets = {}
+            for bound, bucket_count in zip(self.bounds + [float('inf')], histogram[:-4]):
+                cumulative += bucket_count
+                buckets['+Inf' if bound == float('inf') else repr(bound)] = cumulative
+            count = histogram[-1]
+            stages[stage] = {
+                'count': count,
+                'sum_s': histogram[-2],
+                'mean_s': histogram[-2] / count if count else None,
+                'min_s': histogram[-4] if count else None,
+                'max_s': histogram[-3] if count else None,
+                'p50_s': self._quantile(histogram, 0.50),
+                'p95_s': self._quantile(histogram, 0.95),
+                'p99_s': self._quantile(histogram, 0.99),
+                'buckets': buckets
+            }
+
+        grouped = {}
+        for (name, method), value in sorted(counters.items()):
+            grouped.setdefault(name, {})[method or 'all'] = value
+
+        return {'uptime_s': time.time() - self.created, 'stages': stages, 'counters': grouped}
+
+    def print_report(self):
+        """Краткая таблица этапов и счетчиков"""
+        report = self.to_dict()
+        print(f"{'Этап':<24} {'вызовов':>9} {'среднее, мс':>12} {'p50, мс':>10} {'p95, мс':>10} {'p99, мс':>10}")
+        for stage, values in report['stages'].items():
+            print(f"{stage:<24} {values['count']:>9} {values['mean_s'] * 1000:>12.3f} {values['p50_s'] * 1000:>10.3f} "
+                  f"{values['p95_s'] * 1000:>10.3f} {values['p99_s'] * 1000:>10.3f}")
+        for name, methods in report['counters'].items():
+            print(f"   🔢 {name}: " + ", ".join(f"{method}={value}" for method, value in methods.items()))
+        return report
+
+    def to_json(self, indent=2):
+        """Метрики в JSON"""
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
+
+    def to_prometheus(self):
+        """Метрики в текстовом формате Prometheus"""
+        histograms, counters = self.snapshot()
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Длительность этапов предсказания",
+                 f"# TYPE {name} histogram"]
+        for stage, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.bounds + [float('inf')], histogram[:-4]):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram[-2]!r}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram[-1]}')
+
+        for counter in sorted({counter for counter, _ in counters}):
+            metric = f"{self.prefix}_{counter}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, method), value in sorted(counters.items()):
+                if counter_name == counter:
+                    lines.append(f'{metric}{{method="{method}"}} {value}')
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,106 @@
+import os
+import sys
+import html
+import threading
+
+import numpy as np
+
+from tools.helpers import draw_predictions, draw_feature_importance
+
+# Режимы визуализации при обучении
+PLOT_MODES = ('show', 'files', 'none')
+
+def default_plot_mode():
+    """Режим визуализации по умолчанию: окна только при наличии дисплея"""
+    if sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        return 'files'
+    return 'show'
+
+def _slug(title):
+    """Имя файла из заголовка графика"""
+    words = ''.join(ch.lower() if ch.isalnum() else ' ' for ch in title).split()
+    return '_'.join(words)
+
+class TrainingReport:
+    """Сбор результатов обучения и отложенная отрисовка графиков в файлы"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.predictions = []
+        self.importances = []
+        self.comparison = None
+        self.files = []
+        self._worker = None
+
+    def add_predictions(self, title, y_train_true, y_train_pred, y_test_true, y_test_pred):
+        """Сохранение предсказаний модели для графика"""
+        self.predictions.append((title, np.asarray(y_train_true), np.asarray(y_train_pred),
+                                 np.asarray(y_test_true), np.asarray(y_test_pred)))
+
+    def add_feature_importance(self, title, feature_names, importance):
+        """Сохранение важности признаков для графика"""
+        self.importances.append((title, list(feature_names), np.asarray(importance)))
+
+    def set_comparison(self, comparison_df):
+        """Таблица сравнения моделей для HTML отчета"""
+        self.comparison = comparison_df
+
+    def render(self):
+        """Отрисовка всех графиков в PNG и сводного HTML отчета"""
+        # Объектный API без pyplot: не нужен GUI backend, безопасно в фоновом потоке
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        images = []
+
+        for title, y_train_true, y_train_pred, y_test_true, y_test_pred in self.predictions:
+            fig = Figure(figsize=(15, 6))
+            FigureCanvasAgg(fig)
+            ax1, ax2 = fig.subplots(1, 2)
+            draw_predictions(ax1, ax2, y_train_true, y_train_pred, y_test_true, y_test_pred, title)
+            fig.tight_layout()
+            images.append((title, self._save(fig, f"predictions_{_slug(title)}.png")))
+
+        for title, feature_names, importance in self.importances:
+            fig = Figure(figsize=(10, 6))
+            FigureCanvasAgg(fig)
+            draw_feature_importance(fig.subplots(), feature_names, importance, title)
+            fig.tight_layout()
+            images.append((f"Важность признаков - {title}", self._save(fig, f"importance_{_slug(title)}.png")))
+
+        self.files.append(self._write_html(images))
+        return self.files
+
+    def render_async(self):
+        """Отрисовка отчета в фоновом потоке"""
+        self._worker = threading.Thread(target=self.render, name='training-report')
+        self._worker.start()
+        return self._worker
+
+    def wait(self):
+        """Ожидание завершения фоновой отрисовки"""
+        if self._worker is not None:
+            self._worker.join()
+        return self.files
+
+    def _save(self, fig, filename):
+        path = os.path.join(self.output_dir, filename)
+        fig.savefig(path, dpi=100)
+        self.files.append(path)
+        return filename
+
+    def _write_html(self, images):
+        parts = ['<html><head><meta charset="utf-8"><title>Отчет об обучении</title></head><body>',
+                 '<h1>Отчет об обучении моделей</h1>']
+        if self.comparison is not None:
+            parts.append('<h2>Сравнение моделей</h2>')
+            parts.append(self.comparison.to_html(float_format=lambda value: f"{value:.4f}"))
+        for title, filename in images:
+            parts.append(f'<h2>{html.escape(title)}</h2><img src="{html.escape(filename)}">')
+        parts.append('</body></html>')
+
+        path = os.path.join(self.output_dir, 'report.html')
+        with open(path, 'w', encoding='utf-8') as report_file:
+            report_file.write('\n'.join(parts))
+        return path
@@ -0,0 +1,67 @@
+import re
+import subprocess
+import sys
+import time
+
+# Пакеты, загрузка которых заметно замедляет старт команды
+HEAVY_PACKAGES = ['sklearn', 'scipy', 'matplotlib', 'seaborn', 'streamlit', 'pyarrow']
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+def parse_importtime(lines):
+    """Разбор вывода -X importtime: список (модуль, собственное время, полное время, уровень)"""
+    records = []
+    for line in lines:
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return records
+
+def print_import_report(records, wall_time, top=15):
+    """Отчет о времени импорта: итог, самые тяжелые импорты и тяжелые пакеты"""
+    total_import = sum(self_us for _, self_us, _, _ in records) / 1e6
+    loaded = {module.split('.')[0] for module, _, _, _ in records}
+
+    print("\n" + "⏱️ " + "="*60 + "⏱️")
+    print("           ОТЧЕТ О ВРЕМЕНИ ЗАПУСКА")
+    print("⏱️ " + "="*60 + "⏱️")
+    print(f"🕒 Время выполнения команды: {wall_time:.3f} с")
+    print(f"📦 Импорт модулей: {total_import:.3f} с ({len(records)} модулей)")
+
+    print(f"\n🔝 Самые тяжелые импорты верхнего уровня (топ-{top}):")
+    top_level = sorted((record for record in records if record[3] == 0), key=lambda record: -record[2])
+    for module, _, cumulative_us, _ in top_level[:top]:
+        print(f"   {cumulative_us / 1000:>9.1f} мс  {module}")
+
+    print("\n🏋️  Тяжелые пакеты:")
+    for package in HEAVY_PACKAGES:
+        cumulative = max((cumulative_us for module, _, cumulative_us, _ in records
+                          if module == package), default=None)
+        if package in loaded:
+            print(f"   ⚠️  {package}: загружен ({cumulative / 1000:.1f} мс)" if cumulative is not None
+                  else f"   ⚠️  {package}: загружен")
+        else:
+            print(f"   ✅ {package}: не загружен")
+
+    return {'wall_time': wall_time, 'import_time': total_import, 'modules': len(records)}
+
+def run_with_import_report(script_path, argv, top=15):
+    """Запуск команды с -X importtime и печать отчета о времени запуска"""
+    start_time = time.perf_counter()
+    importtime_lines = []
+    with subprocess.Popen([sys.executable, '-X', 'importtime', script_path] + list(argv),
+                          stderr=subprocess.PIPE, text=True, errors='replace') as process:
+        # stderr команды выводится по мере появления (ошибки и прогресс долгих команд видны сразу),
+        # отбираются только строки -X importtime
+        for line in process.stderr:
+            if line.startswith('import time:'):
+                importtime_lines.append(line.rstrip('\n'))
+            else:
+                sys.stderr.write(line)
+                sys.stderr.flush()
+        returncode = process.wait()
+    wall_time = time.perf_counter() - start_time
+
+    print_import_report(parse_importtime(importtime_lines), wall_time, top)
+    return returncode
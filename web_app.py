@@ -11,8 +11,15 @@ import os
 # Добавляем путь для импорта модулей
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+# Демо-режим: модули проекта не импортируются, расчеты моделью недоступны
+DEMO_MODE = False
+
 try:
     from algorithms.transport_predictor import TransportCostPredictor
+    from algorithms.price_lattice import LatticeLoader
+    from algorithms.model_store import artifact_fingerprint
+    from algorithms.what_if import evaluate_what_if, sensitivity_sweeps
+    from configuration.settings import PREDICTION_CACHE_STEPS, WHAT_IF_POINTS, WHAT_IF_PAIR_POINTS
     # Пробуем разные варианты импорта
     try:
         from datasets.data_fetcher import load_data, preprocess_data, get_feature_info
@@ -44,15 +51,27 @@ try:
                 }
 except ImportError as e:
     st.error(f"❌ Ошибка импорта модулей: {e}")
-    # Создаем заглушки для продолжения работы
+    DEMO_MODE = True
+    PREDICTION_CACHE_STEPS = None
+    # Создаем заглушки для продолжения работы: страницы с расчетами показывают сообщение
+    # о демо-режиме (model_unavailable) и не обращаются к решетке цен и важности признаков
     class TransportCostPredictor:
-        def __init__(self):
+        def __init__(self, *args, **kwargs):
             self.model_data = None
+            self.model_path = None
+            self.model_hash = None
+            self.pipeline = None
             self.feature_names = []
         
         def predict_booking_value(self, input_data):
             return [75.0]  # Демо-значение
 
+        def predict_frame(self, df_input, verbose=True):
+            return np.full(len(df_input), 75.0)  # Демо-значения
+
+        def feature_importance(self):
+            return None, None
+
 st.set_page_config(
     page_title="🌟 Transport Cost Calculator",
     page_icon="🚗",
@@ -244,7 +263,62 @@ st.markdown("""
 
 @st.cache_resource
 def load_predictor():
-    return TransportCostPredictor()
+    # Слайдеры выдают значения с фиксированным шагом: повторные расчеты берутся из кэша прогнозов
+    return TransportCostPredictor(cache_steps=PREDICTION_CACHE_STEPS)
+
+@st.cache_resource
+def load_price_lattice():
+    # Решетка проверяет версию файла модели сама и строится в фоне, а не в запросе
+    return LatticeLoader(load_predictor().model_path)
+
+@st.cache_data
+def load_feature_importance(model_hash, top):
+    # Таблица посчитана при обучении и хранится в артефакте; ключ — хэш файла модели
+    table, method = load_predictor().feature_importance()
+    if table is None:
+        return None, None
+    table = table.head(top).rename(columns={'feature': 'Признак', 'importance': 'Важность', 'std': 'Разброс'})
+    return table.dropna(axis=1, how='all'), method
+
+@st.cache_resource
+def importance_chart(model_hash, top, title, figsize):
+    # График строится один раз на версию модели, а не при каждом перезапуске страницы
+    importance_df, _ = load_feature_importance(model_hash, top)
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.barh(importance_df['Признак'], importance_df['Важность'],
+            xerr=importance_df.get('Разброс'), color='#4ecdc4')
+    ax.set_xlabel('Важность')
+    ax.set_title(title)
+    ax.invert_yaxis()
+    return fig
+
+def model_unavailable(predictor):
+    """Сообщение, если расчеты моделью недоступны; True — страница дальше не строится"""
+    if DEMO_MODE:
+        st.error("❌ Модули проекта не загружены (демо-режим): расчеты моделью недоступны")
+        return True
+    if not predictor.model_data:
+        st.error("❌ Модель не обучена. Запустите обучение командой: `python main.py train`")
+        return True
+    return False
+
+def calculator_price(predictor, input_data):
+    """Цена из решетки калькулятора, а вне сетки — расчет моделью
+
+    Между узлами решетка интерполирует, только если ошибка интерполяции в
+    пределах PRICE_LATTICE_MAX_ERROR; иначе из нее берутся лишь точные узлы.
+    Пока решетка для текущей модели строится в фоне, цену считает модель.
+    """
+    if predictor.model_data is not None and os.path.exists(predictor.model_path):
+        # Файл модели переобучен после загрузки предсказателя — сначала загружаем новую версию
+        if predictor.model_hash != artifact_fingerprint(predictor.model_path):
+            predictor.load_model()
+        lattice = load_price_lattice().get()
+        price = (lattice.lookup(input_data, exact_only=not lattice.interpolation_allowed())
+                 if lattice is not None else None)
+        if price is not None:
+            return np.array([price])
+    return predictor.predict_booking_value(input_data)
 
 def main():
     # Верхняя навигационная панель вместо боковой
@@ -371,8 +445,7 @@ def show_home_page():
 def show_calculator_page(predictor):
     st.markdown('<div class="main-header"><h1>💰 Калькулятор стоимости</h1><p>Быстрый и точный расчет транспортных услуг</p></div>', unsafe_allow_html=True)
 
-    if not predictor.model_data:
-        st.error("❌ Модель не обучена. Запустите обучение командой: `python main.py train`")
+    if model_unavailable(predictor):
         return
 
     # Создаем две колонки для ввода данных
@@ -443,8 +516,8 @@ def show_calculator_page(predictor):
 
                 input_data['Booking Status_Completed'] = 1
 
-                # Предсказание
-                prediction = predictor.predict_booking_value(input_data)
+                # Предсказание: значения слайдеров — узлы или точки внутри решетки цен
+                prediction = calculator_price(predictor, input_data)
 
                 if prediction is not None:
                     # Анимированный результат
@@ -510,8 +583,7 @@ def show_calculator_page(predictor):
 def show_analysis_page(predictor):
     st.markdown('<div class="main-header"><h1>📊 Комплексный анализ</h1><p>Подробное исследование факторов стоимости</p></div>', unsafe_allow_html=True)
 
-    if not predictor.model_data:
-        st.error("❌ Модель не обучена. Запустите обучение командой: `python main.py train`")
+    if model_unavailable(predictor):
         return
 
     # Создаем вкладки для разных аспектов анализа
@@ -648,10 +720,11 @@ def show_analysis_page(predictor):
                     'Driver Ratings': 4.5, 'Customer Rating': 4.7
                 }
 
-                results = {}
+                # Все сценарии собираются в одну матрицу и считаются одним вызовом модели
+                scenario_data = {}
 
                 for scenario in scenarios:
-                    data = base_data.copy()
+                    data = {}
 
                     if "Эконом" in scenario:
                         vehicle = "Bike"
@@ -677,9 +750,9 @@ def show_analysis_page(predictor):
                     for pm in ["Cash", "UPI", "Credit Card", "Debit Card", "Digital Wallet"]:
                         data[f'Payment Method_{pm}'] = 1 if pm == payment else 0
                     data['Booking Status_Completed'] = 1
+                    scenario_data[scenario] = data
 
-                    prediction = predictor.predict_booking_value(data)
-                    results[scenario] = prediction[0] if prediction is not None else 0
+                results = evaluate_what_if(predictor, base_data, scenario_data)['scenarios']
 
                 # Визуализация сравнения
                 fig, ax = plt.subplots(figsize=(10, 6))
@@ -704,30 +777,75 @@ def show_analysis_page(predictor):
                 })
                 st.dataframe(comparison_df, use_container_width=True)
 
+        st.markdown("---")
+        st.markdown("### 🔀 Анализ чувствительности")
+        st.markdown("Как меняется стоимость, если варьировать один или два параметра при остальных базовых:")
+
+        feature_labels = {
+            'Ride Distance': "Расстояние (км)",
+            'Avg VTAT': "Время ожидания (мин)",
+            'Avg CTAT': "Время в пути (мин)",
+            'Driver Ratings': "Рейтинг водителя",
+            'Customer Rating': "Рейтинг клиента"
+        }
+        sweep_features = [feature for feature in feature_labels if feature in predictor.pipeline.input_features]
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            x_feature = st.selectbox("Параметр по оси X", sweep_features,
+                                     format_func=feature_labels.get)
+        with col2:
+            y_options = [None] + [feature for feature in sweep_features if feature != x_feature]
+            y_feature = st.selectbox("Второй параметр (тепловая карта)", y_options,
+                                     format_func=lambda feature: "— нет —" if feature is None else feature_labels[feature])
+        with col3:
+            points = st.slider("Точек на параметр", 10, 200, WHAT_IF_POINTS, 10)
+
+        sensitivity_base = {
+            'Avg VTAT': 10, 'Avg CTAT': 30, 'Ride Distance': 25,
+            'Driver Ratings': 4.5, 'Customer Rating': 4.7,
+            'Vehicle Type_Standard': 1, 'Payment Method_Credit Card': 1, 'Booking Status_Completed': 1
+        }
+        pair = (x_feature, y_feature) if y_feature else None
+        # Кривые по всем параметрам и тепловая карта — один векторизованный прогноз
+        what_if = evaluate_what_if(predictor, sensitivity_base,
+                                   sweeps=sensitivity_sweeps(sweep_features, pair, points,
+                                                             min(points, WHAT_IF_PAIR_POINTS)))
+        st.caption(f"⚡ {what_if['rows']:,} точек посчитано за {what_if['seconds'] * 1000:.1f} мс")
+
+        curves = [sweep for sweep in what_if['sweeps'] if len(sweep['features']) == 1]
+        fig, axes = plt.subplots(1, len(curves), figsize=(4 * len(curves), 3.5), squeeze=False)
+        for ax, sweep in zip(axes[0], curves):
+            feature = sweep['features'][0]
+            ax.plot(sweep['values'][0], sweep['prices'], color='#ff6b6b' if feature == x_feature else '#4ecdc4')
+            ax.axvline(sensitivity_base[feature], color='gray', linestyle='--', linewidth=1)
+            ax.set_xlabel(feature_labels[feature])
+            ax.set_ylabel('Стоимость ($)')
+        fig.tight_layout()
+        st.pyplot(fig)
+
+        if pair:
+            heatmap = what_if['sweeps'][-1]
+            x_values, y_values = heatmap['values']
+            fig, ax = plt.subplots(figsize=(10, 6))
+            image = ax.imshow(heatmap['prices'].T, origin='lower', aspect='auto', cmap='viridis',
+                              extent=[x_values[0], x_values[-1], y_values[0], y_values[-1]])
+            fig.colorbar(image, ax=ax, label='Стоимость ($)')
+            ax.set_xlabel(feature_labels[x_feature])
+            ax.set_ylabel(feature_labels[y_feature])
+            ax.set_title('Стоимость при совместном изменении параметров')
+            st.pyplot(fig)
+
     with tab3:
         st.markdown("### 🎯 Анализ факторов влияния")
 
-        if predictor.model_data and hasattr(predictor.model_data['model'], 'feature_importances_'):
+        importance_df, method = load_feature_importance(predictor.model_hash, 15)
+        if importance_df is not None:
             st.markdown("#### 🔍 Важность признаков модели")
-
-            features = predictor.feature_names
-            importances = predictor.model_data['model'].feature_importances_
-
-            # Создаем DataFrame
-            importance_df = pd.DataFrame({
-                'Признак': features,
-                'Важность': importances
-            }).sort_values('Важность', ascending=False).head(15)
+            st.caption(f"Метод: {method}")
 
             # Визуализация
-            fig, ax = plt.subplots(figsize=(12, 8))
-            bars = ax.barh(importance_df['Признак'], importance_df['Важность'],
-                          color='#4ecdc4')
-            ax.set_xlabel('Важность')
-            ax.set_title('Топ-15 наиболее важных факторов')
-            ax.invert_yaxis()
-
-            st.pyplot(fig)
+            st.pyplot(importance_chart(predictor.model_hash, 15, 'Топ-15 наиболее важных факторов', (12, 8)))
 
             # Детальная таблица
             st.dataframe(importance_df, use_container_width=True)
@@ -750,11 +868,41 @@ def show_analysis_page(predictor):
         else:
             st.warning("ℹ️ Информация о важности признаков недоступна для данной модели")
 
+# Ошибки пакета при массовом анализе: строки пакета остаются без прогноза, обработка продолжается
+BATCH_ERRORS = (ValueError, TypeError, KeyError, MemoryError)
+# Сколько ошибок пакетов показывать подробно
+BATCH_ERRORS_SHOWN = 5
+
+def predict_in_batches(predictor, df, batch_size, progress=None):
+    """Прогнозы для DataFrame по пакетам: (прогнозы, ошибки пакетов)
+
+    Один векторизованный вызов модели на пакет. Пакет с ошибкой не прерывает
+    обработку: его строки остаются NaN, а в список ошибок попадает
+    (номер первой строки, число строк, сообщение). progress(пакет, всего
+    пакетов, обработано строк) вызывается после каждого пакета.
+    """
+    predictions = np.full(len(df), np.nan)
+    failures = []
+    n_chunks = (len(df) + batch_size - 1) // batch_size
+    for chunk_index, start in enumerate(range(0, len(df), batch_size)):
+        batch = df.iloc[start:start + batch_size]
+        try:
+            batch_predictions = predictor.predict_frame(batch, verbose=False)
+        except BATCH_ERRORS as error:
+            failures.append((start, len(batch), f"{type(error).__name__}: {error}"))
+        else:
+            if batch_predictions is None:
+                failures.append((start, len(batch), "модель не загружена"))
+            else:
+                predictions[start:start + len(batch)] = batch_predictions
+        if progress is not None:
+            progress(chunk_index + 1, n_chunks, start + len(batch))
+    return predictions, failures
+
 def show_batch_page(predictor):
     st.markdown('<div class="main-header"><h1>📁 Массовый анализ</h1><p>Обработка больших объемов данных о поездках</p></div>', unsafe_allow_html=True)
 
-    if not predictor.model_data:
-        st.error("❌ Модель не обучена. Запустите обучение командой: `python main.py train`")
+    if model_unavailable(predictor):
         return
 
     st.markdown("""
@@ -800,8 +948,11 @@ def show_batch_page(predictor):
 
             col1, col2 = st.columns(2)
             with col1:
-                max_records = st.slider("Максимум записей для обработки", 10, min(1000, len(df)), min(100, len(df)))
-                batch_size = st.slider("Размер пакета", 10, 100, 50)
+                max_records = st.number_input("Максимум записей для обработки", min_value=1,
+                                              max_value=len(df), value=len(df), step=1000)
+                batch_size = st.select_slider("Размер пакета",
+                                              options=[1000, 5000, 10000, 25000, 50000, 100000],
+                                              value=10000)
 
             with col2:
                 include_visualization = st.checkbox("Включить визуализацию", value=True)
@@ -813,34 +964,36 @@ def show_batch_page(predictor):
                     status_text = st.empty()
 
                     # Ограничение количества записей
-                    sample_df = df.head(max_records).copy()
-                    predictions = []
-                    errors = 0
-
-                    # Обработка по пакетам
-                    for i in range(0, len(sample_df), batch_size):
-                        batch = sample_df.iloc[i:i+batch_size]
-                        batch_progress = (i + len(batch)) / len(sample_df)
-                        progress_bar.progress(batch_progress)
-                        status_text.text(f"Обработано {i + len(batch)} из {len(sample_df)} записей...")
-
-                        for _, row in batch.iterrows():
-                            try:
-                                row_dict = row.to_dict()
-                                prediction = predictor.predict_booking_value(row_dict)
-                                predictions.append(prediction[0] if prediction is not None else np.nan)
-                            except Exception as e:
-                                predictions.append(np.nan)
-                                errors += 1
+                    sample_df = df.head(int(max_records)).copy()
+
+                    def show_progress(chunk, n_chunks, done):
+                        progress_bar.progress(chunk / n_chunks)
+                        status_text.text(f"Пакет {chunk} из {n_chunks}: "
+                                         f"обработано {done} из {len(sample_df)} записей...")
+
+                    predictions, failures = predict_in_batches(predictor, sample_df, batch_size, show_progress)
 
                     progress_bar.empty()
                     status_text.empty()
 
                     # Добавление результатов в DataFrame
                     sample_df['Predicted_Cost'] = predictions
-                    valid_predictions = [p for p in predictions if not np.isnan(p)]
-
-                    if valid_predictions:
+                    valid_predictions = predictions[~np.isnan(predictions)]
+                    errors = len(predictions) - len(valid_predictions)
+
+                    # Ошибки пакетов и строки без прогноза из-за входных данных показываются отдельно
+                    failed_rows = sum(rows for _, rows, _ in failures)
+                    for start, rows, message in failures[:BATCH_ERRORS_SHOWN]:
+                        st.error(f"❌ Пакет строк {start + 1}–{start + rows} не обработан: {message}")
+                    if len(failures) > BATCH_ERRORS_SHOWN:
+                        st.error(f"❌ И еще пакетов с ошибками: {len(failures) - BATCH_ERRORS_SHOWN}")
+                    if failures:
+                        st.warning(f"⚠️ Строк в пакетах с ошибками: {failed_rows} из {len(predictions)}")
+                    if errors > failed_rows:
+                        st.warning(f"⚠️ Строк без прогноза из-за пропусков или нечисловых значений: "
+                                   f"{errors - failed_rows}")
+
+                    if len(valid_predictions) > 0:
                         st.markdown("---")
                         st.markdown("## 📈 Результаты анализа")
 
@@ -884,9 +1037,8 @@ def show_batch_page(predictor):
                         # Детальная таблица результатов
                         st.markdown("### 📋 Детальные результаты")
                         results_df = sample_df[['Predicted_Cost']].copy()
-                        results_df['Status'] = results_df['Predicted_Cost'].apply(
-                            lambda x: '✅ Успешно' if not np.isnan(x) else '❌ Ошибка'
-                        )
+                        results_df['Status'] = np.where(results_df['Predicted_Cost'].notna(),
+                                                        '✅ Успешно', '❌ Ошибка')
                         st.dataframe(results_df.head(50), use_container_width=True)
 
                         # Скачивание результатов
@@ -922,8 +1074,7 @@ def show_batch_page(predictor):
 def show_stats_page(predictor):
     st.markdown('<div class="main-header"><h1>📈 Статистика модели</h1><p>Анализ производительности и метрик</p></div>', unsafe_allow_html=True)
 
-    if not predictor.model_data:
-        st.error("❌ Модель не обучена. Запустите обучение командой: `python main.py train`")
+    if model_unavailable(predictor):
         return
 
     model_info = predictor.model_data
@@ -989,27 +1140,13 @@ def show_stats_page(predictor):
                     st.info("ℹ️ Недообучение модели")
 
     # Важность признаков
-    if hasattr(model_info['model'], 'feature_importances_'):
+    importance_df, method = load_feature_importance(predictor.model_hash, 10)
+    if importance_df is not None:
         st.markdown("### 🔍 Важность признаков")
-
-        features = predictor.feature_names
-        importances = model_info['model'].feature_importances_
-
-        # Создаем DataFrame
-        importance_df = pd.DataFrame({
-            'Признак': features,
-            'Важность': importances
-        }).sort_values('Важность', ascending=False).head(10)
+        st.caption(f"Метод: {method}")
 
         # Визуализация
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bars = ax.barh(importance_df['Признак'], importance_df['Важность'],
-                      color='#4ecdc4')
-        ax.set_xlabel('Важность')
-        ax.set_title('Топ-10 наиболее важных признаков')
-        ax.invert_yaxis()
-
-        st.pyplot(fig)
+        st.pyplot(importance_chart(predictor.model_hash, 10, 'Топ-10 наиболее важных признаков', (10, 6)))
 
         # Таблица
         st.dataframe(importance_df, use_container_width=True)